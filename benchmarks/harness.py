@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+TOLERANCE = 1.5
+MIN_REGRESSION_SECONDS = 0.01
+
+
+class Result:
+    def __init__(self, **kwargs):
+        self.benchmark = kwargs["benchmark"]
+        self.size = kwargs["size"]
+        self.seconds = kwargs["seconds"]
+        self.metrics = kwargs.get("metrics", {})
+
+    def key(self) -> str:
+        return "%s[%s]" % (self.benchmark, self.size)
+
+    def to_dict(self) -> dict:
+        return {
+            "benchmark": self.benchmark,
+            "size": self.size,
+            "seconds": self.seconds,
+            "metrics": self.metrics,
+        }
+
+
+def measure(function, setup=None, repeat: int = 3) -> float:
+    """Best wall time of repeat calls of function, setup runs untimed before each."""
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def print_results(results: list):
+    header = "%-40s %12s  %s" % ("BENCHMARK", "TIME", "METRICS")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        metrics = ", ".join(
+            "%s %s" % (name, format_metric(value))
+            for name, value in sorted(result.metrics.items())
+        )
+        print("%-40s %11.1fms  %s" % (result.key(), result.seconds * 1000, metrics))
+
+
+def format_metric(value) -> str:
+    return "%.2f" % value if isinstance(value, float) else str(value)
+
+
+def save_results(results: list, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([result.to_dict() for result in results], f, indent=2)
+
+
+def regressions(results: list, baseline_path: str, tolerance: float = TOLERANCE):
+    """Results slower than tolerance times their baseline, as (result, baseline)."""
+    with open(baseline_path) as f:
+        baseline = {Result(**entry).key(): entry["seconds"] for entry in json.load(f)}
+    slower = []
+    for result in results:
+        previous = baseline.get(result.key())
+        if previous is None:
+            continue
+        if (
+            result.seconds > previous * tolerance
+            and result.seconds - previous > MIN_REGRESSION_SECONDS
+        ):
+            slower.append((result, previous))
+    return slower
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per benchmark, best is reported"
+    )
+    parser.add_argument("--save", metavar="FILE", help="Write results as JSON to FILE")
+    parser.add_argument(
+        "--baseline",
+        metavar="FILE",
+        help="Compare with results saved by --save, exit 1 on regressions",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="Slowdown ratio against the baseline reported as regression",
+    )
+
+
+def report(results: list, arguments) -> int:
+    print_results(results)
+    if arguments.save:
+        save_results(results, arguments.save)
+    if not arguments.baseline:
+        return 0
+    slower = regressions(results, arguments.baseline, arguments.tolerance)
+    for result, previous in slower:
+        print(
+            "REGRESSION %s %.1fms, baseline %.1fms"
+            % (result.key(), result.seconds * 1000, previous * 1000)
+        )
+    return 1 if slower else 0
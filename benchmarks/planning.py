@@ -0,0 +1,256 @@
+"""Benchmarks of startup and planning on synthetic module registries.
+
+A workspace with N modules is generated once per size: moduleRegistry.xml in
+shuffled order, compile.includes with commented entries and noise lines,
+and module directories with src, src_test and src_web trees of java files.
+Measured are building the modules config cold (no cache), warm (cache of a
+previous run) and fully preloaded as done by --serve, alias resolution and
+suite expansion in TaskBuilder, and the whole --plan pipeline. Nothing is
+executed.
+
+Run from the repository root:
+
+    python -m benchmarks.planning --modules 1000 10000 50000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from benchmarks.harness import Result, add_arguments, measure, report
+from src.config import AppConfig, Batching, Commands, Input, OOTBCommands
+from src.executor import ExecutionOptions, TaskBuilder
+from src.module import ModulesConfigBuilder
+from src.planner import Planner
+
+SIZES = [1000, 10000, 50000]
+TASKS = 200
+PREFIX = "com.ptc"
+GROUPS = ["core", "mpm", "ppb", "integration", "ui", "services"]
+ALIAS_EVERY = 10
+BENCH_SUITE = "bench"
+
+
+def generate_workspace(path: str, modules: int, files: int = 2, seed: int = 0):
+    """Writes registry, build order and module trees.
+
+    Returns module names in build order and in registry order.
+    """
+    rng = random.Random(seed)
+    names = ["Module%05d" % idx for idx in range(modules)]
+    locations = {
+        name: "modules/%s/%s" % (GROUPS[idx % len(GROUPS)], name)
+        for idx, name in enumerate(names)
+    }
+    registry_order = list(names)
+    rng.shuffle(registry_order)
+    with open(os.path.join(path, "moduleRegistry.xml"), "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<ModuleRegistry>\n')
+        for name in registry_order:
+            f.write(
+                '  <Module location="%s" name="%s/%s" description="%s module">'
+                "</Module>\n" % (locations[name], PREFIX, name, name)
+            )
+        f.write("</ModuleRegistry>\n")
+    with open(os.path.join(path, "compile.includes"), "w") as f:
+        f.write("# generated build order\n*****************\n")
+        for name in names:
+            comment = "#" if rng.random() < 0.1 else ""
+            f.write("%s%s/%s\n" % (comment, PREFIX, name))
+            if rng.random() < 0.01:
+                f.write("\n# %s\n" % ("-" * 20))
+    root = os.path.join(path, "root")
+    for idx, name in enumerate(names):
+        location = os.path.join(root, locations[name])
+        package = os.path.join("com", "ptc", GROUPS[idx % len(GROUPS)], name.lower())
+        write_tree(os.path.join(location, "src"), package, "Service", files)
+        if idx % 2 == 0:
+            write_tree(os.path.join(location, "src_test"), package, "Test", files)
+        if idx % 5 == 0:
+            write_tree(os.path.join(location, "src_web"), "web", "Page", 1)
+        os.makedirs(os.path.join(location, "lib"), exist_ok=True)
+    return names, registry_order
+
+
+def write_tree(src_dir: str, package: str, suffix: str, files: int):
+    directory = os.path.join(src_dir, package)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(src_dir, "build.xml"), "w") as f:
+        f.write('<project name="module" default="all"/>\n')
+    for idx in range(files):
+        with open(os.path.join(directory, "Class%d%s.java" % (idx, suffix)), "w") as f:
+            f.write(
+                "package %s;\n\npublic class Class%d%s {}\n" % (package, idx, suffix)
+            )
+
+
+def app_config(path: str, names: list, tasks: int) -> AppConfig:
+    selected = names[:: max(1, len(names) // tasks)][:tasks]
+    aliases = {"m%05d" % idx: name for idx, name in enumerate(names[::ALIAS_EVERY])}
+    dependencies = {
+        name: selected[max(0, idx - 2) : idx]
+        for idx, name in enumerate(selected)
+        if idx % 5 == 0 and idx
+    }
+    return AppConfig(
+        profile="prod",
+        root=os.path.join(path, "root"),
+        fail_on_error=True,
+        commands=Commands(ootb=OOTBCommands(restart="echo Restarting"), custom={}),
+        input=Input(
+            build_order=os.path.join(path, "compile.includes"),
+            module_registry=os.path.join(path, "moduleRegistry.xml"),
+        ),
+        aliases=aliases,
+        suites={
+            BENCH_SUITE: {
+                "restart": True,
+                "build": {name: "cst" for name in selected},
+                "custom": [],
+            }
+        },
+        dependencies=dependencies,
+        batching=Batching(enabled=True, default_target="all"),
+    )
+
+
+def arguments(**kwargs) -> dict:
+    result = {
+        "build": None,
+        "test_unit": None,
+        "test_integration": None,
+        "suite": None,
+        "custom": None,
+        "restart": False,
+    }
+    result.update(kwargs)
+    return result
+
+
+def module_specs(app_cfg: AppConfig, names: list, tasks: int) -> list:
+    """Build arguments mixing aliases and module names spread over the registry."""
+    by_name = {name: alias for alias, name in app_cfg.aliases.items()}
+    specs = []
+    for name in names[:: max(1, len(names) // tasks)][:tasks]:
+        specs.append("%s_s" % by_name.get(name, name))
+    return specs
+
+
+def run_size(path: str, modules: int, tasks: int, files: int, repeat: int) -> list:
+    names, registry_order = generate_workspace(path, modules, files)
+    app_cfg = app_config(path, names, tasks)
+    cache_path = os.path.join(path, "modules_cache.json")
+    options = ExecutionOptions(jobs=8)
+    # found only after streaming the whole registry
+    registry_last = registry_order[-1]
+
+    def build_config():
+        return ModulesConfigBuilder(app_cfg, cache_path).build()
+
+    def resolve_last():
+        return build_config().modules[registry_last]
+
+    def remove_cache():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    def preload():
+        builder = ModulesConfigBuilder(app_cfg, cache_path)
+        builder.build()
+        builder.preload()
+
+    specs = module_specs(app_cfg, names, tasks)
+
+    def resolve_aliases():
+        return TaskBuilder(app_cfg, build_config(), options).build_tasks(
+            arguments(build=specs)
+        )
+
+    def expand_suite():
+        return TaskBuilder(app_cfg, build_config(), options).build_tasks(
+            arguments(suite=[BENCH_SUITE])
+        )
+
+    def plan():
+        task_builder = TaskBuilder(app_cfg, build_config(), options)
+        suite_tasks = task_builder.build_tasks(arguments(suite=[BENCH_SUITE]))
+        task_builder.coalesce_commands(suite_tasks)
+        return Planner(app_cfg, options).plan(suite_tasks)
+
+    results = [
+        Result(
+            benchmark="modules_config_cold",
+            size=modules,
+            seconds=measure(resolve_last, remove_cache, repeat),
+        ),
+        Result(
+            benchmark="modules_config_warm",
+            size=modules,
+            seconds=measure(resolve_last, repeat=repeat),
+        ),
+        Result(
+            benchmark="modules_config_preload",
+            size=modules,
+            seconds=measure(preload, remove_cache, repeat),
+        ),
+    ]
+    resolve_last()
+    results.append(
+        Result(
+            benchmark="alias_resolution",
+            size=modules,
+            seconds=measure(resolve_aliases, repeat=repeat),
+            metrics={"tasks": len(resolve_aliases())},
+        )
+    )
+    results.append(
+        Result(
+            benchmark="suite_expansion",
+            size=modules,
+            seconds=measure(expand_suite, repeat=repeat),
+            metrics={"tasks": len(expand_suite())},
+        )
+    )
+    results.append(
+        Result(
+            benchmark="plan",
+            size=modules,
+            seconds=measure(plan, repeat=repeat),
+            metrics={"tasks": len(plan()["tasks"])},
+        )
+    )
+    return results
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of planning on synthetic registries"
+    )
+    parser.add_argument(
+        "--modules", type=int, nargs="+", default=SIZES, help="Registry sizes"
+    )
+    parser.add_argument(
+        "--tasks", type=int, default=TASKS, help="Modules requested by -b and suite"
+    )
+    parser.add_argument(
+        "--files", type=int, default=2, help="Java files per module src directory"
+    )
+    parser.add_argument("--workdir", help="Directory for generated workspaces")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    results = []
+    for modules in args.modules:
+        path = tempfile.mkdtemp(prefix="wc_bench_%d_" % modules, dir=args.workdir)
+        try:
+            results += run_size(path, modules, args.tasks, args.files, args.repeat)
+        finally:
+            shutil.rmtree(path)
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Benchmarks of executor overhead, concurrency and output handling with a fake ant.
+
+A shell script named ant is put first on PATH. It reads fake_ant.profile
+next to the build file it is called with and sleeps, burns CPU, writes
+OUTPUT bytes of javac-like lines to stdout and exits with EXIT. Task graphs
+of synthetic modules with explicit dependencies run through
+Executor.run_tasks, output of the executed commands is discarded.
+
+Reported are wall time against the ideal schedule of the same graph (list
+scheduling of the profile durations on -j slots) and its critical path,
+executor overhead per command and output throughput in MB/s.
+
+Run from the repository root:
+
+    python -m benchmarks.throughput --jobs 1 4 8
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import Result, add_arguments, report
+from src.config import AppConfig, Commands, Input, OOTBCommands
+from src.executor import (
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    TaskBuilder,
+    command_records,
+)
+from src.events import count_statuses
+from src.module import ModuleInfo, ModulesConfig
+from src.scheduler import TaskGraph
+
+FAKE_ANT = """#!/bin/sh
+build=""
+while [ $# -gt 0 ]; do
+    if [ "$1" = "-f" ]; then build="$2"; shift; fi
+    shift
+done
+SLEEP=0; CPU=0; OUTPUT=0; EXIT=0
+profile="$(dirname "$build")/fake_ant.profile"
+[ -f "$profile" ] && . "$profile"
+if [ "$OUTPUT" -gt 0 ]; then
+    yes "    [javac] Compiling 1 source file to /codebase/module/classes" \\
+        | head -c "$OUTPUT"
+fi
+if [ "$CPU" != 0 ]; then timeout "$CPU" sh -c 'while :; do :; done'; fi
+if [ "$SLEEP" != 0 ]; then sleep "$SLEEP"; fi
+exit "$EXIT"
+"""
+PROFILE = "fake_ant.profile"
+EXECUTED = [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED]
+JOBS = [1, 4, 8]
+MB = 1024 * 1024
+
+
+class Profile:
+    def __init__(self, **kwargs):
+        self.sleep = kwargs.get("sleep", 0)
+        self.cpu = kwargs.get("cpu", 0)
+        self.output = kwargs.get("output", 0)
+        self.exit = kwargs.get("exit", 0)
+
+    def duration(self) -> float:
+        return self.sleep + self.cpu
+
+    def write(self, src_dir: str):
+        os.makedirs(src_dir, exist_ok=True)
+        with open(os.path.join(src_dir, PROFILE), "w") as f:
+            f.write(
+                "SLEEP=%s\nCPU=%s\nOUTPUT=%d\nEXIT=%d\n"
+                % (self.sleep, self.cpu, self.output, self.exit)
+            )
+
+
+class Workload:
+    """Modules with profiles of their src directories and explicit dependencies."""
+
+    def __init__(self, name: str, path: str, modules: int, targets: str, seed=0):
+        self.name = name
+        self.targets = targets
+        self.rng = random.Random(seed)
+        self.modules = {}
+        self.dependencies = {}
+        self.profiles = {}
+        names = ["Module%03d" % idx for idx in range(modules)]
+        for idx, module in enumerate(names):
+            self.modules[module] = ModuleInfo(
+                name=module,
+                location=os.path.join(path, "root", module),
+                order=idx + 1,
+                srcs=["src", "src_test", "src_web"],
+            )
+            # layered graph, every module depends on up to 3 earlier ones
+            upstream = names[max(0, idx - 8) : idx]
+            self.dependencies[module] = self.rng.sample(
+                upstream, min(len(upstream), self.rng.randint(0, 3))
+            )
+
+    def profile(self, module: str, src: str, profile: Profile):
+        profile.write(os.path.join(self.modules[module].location, src))
+        self.profiles[(module, src)] = profile
+
+    def app_config(self, root: str) -> AppConfig:
+        return AppConfig(
+            profile="test",
+            root=root,
+            fail_on_error=False,
+            commands=Commands(ootb=OOTBCommands(restart="true"), custom={}),
+            input=Input(build_order="unused", module_registry="unused"),
+            aliases={},
+            suites={},
+            dependencies=self.dependencies,
+        )
+
+    def build_tasks(self, app_cfg: AppConfig) -> list:
+        arguments = {
+            "build": ["%s_%s" % (module, self.targets) for module in self.modules],
+            "test_unit": None,
+            "test_integration": None,
+            "suite": None,
+            "custom": None,
+            "restart": False,
+        }
+        return TaskBuilder(app_cfg, ModulesConfig(self.modules)).build_tasks(arguments)
+
+    def ideal(self, app_cfg: AppConfig, tasks: list, jobs: int) -> tuple:
+        """Wall time of an overhead-free schedule and the critical path.
+
+        Only commands that were executed count, skipped ones take no time.
+        """
+        graph = TaskGraph(tasks, app_cfg.dependencies, app_cfg.aliases)
+        graph.set_estimates(
+            {
+                task: sum(
+                    self.profiles[(task.module.name, command.src)].duration()
+                    for command in task.commands
+                    if command.status in EXECUTED
+                )
+                for task in tasks
+            }
+        )
+        return float(graph.predict_wall_time(jobs)), float(graph.critical_path())
+
+    def output_bytes(self) -> int:
+        return sum(profile.output for profile in self.profiles.values())
+
+
+def workloads(path: str, modules: int, output_mb: int) -> list:
+    result = []
+
+    overhead = Workload("overhead", os.path.join(path, "overhead"), modules, "st")
+    for module in overhead.modules:
+        overhead.profile(module, "src", Profile())
+        overhead.profile(module, "src_test", Profile())
+    result.append(overhead)
+
+    sleep = Workload("sleep", os.path.join(path, "sleep"), modules, "st", seed=1)
+    for module in sleep.modules:
+        sleep.profile(module, "src", Profile(sleep=sleep.rng.choice([0.05, 0.1, 0.3])))
+        sleep.profile(module, "src_test", Profile(sleep=0.05))
+    result.append(sleep)
+
+    cpu = Workload("cpu", os.path.join(path, "cpu"), max(4, modules // 4), "s")
+    for module in cpu.modules:
+        cpu.profile(module, "src", Profile(cpu=0.2))
+    result.append(cpu)
+
+    output = Workload("output", os.path.join(path, "output"), 4, "s")
+    for module in output.modules:
+        output.profile(module, "src", Profile(output=output_mb * MB))
+    result.append(output)
+
+    failure = Workload("failure", os.path.join(path, "failure"), modules, "s", 2)
+    for idx, module in enumerate(failure.modules):
+        exit_code = 1 if idx == len(failure.modules) // 3 else 0
+        failure.profile(module, "src", Profile(sleep=0.02, exit=exit_code))
+    result.append(failure)
+    return result
+
+
+def install_fake_ant(path: str) -> str:
+    bin_dir = os.path.join(path, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    ant = os.path.join(bin_dir, "ant")
+    with open(ant, "w") as f:
+        f.write(FAKE_ANT)
+    os.chmod(ant, 0o755)
+    return bin_dir
+
+
+@contextlib.contextmanager
+def discarded_output():
+    """Redirects stdout and stderr of this process and its children to /dev/null."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    null = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(null, 1)
+        os.dup2(null, 2)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in saved + [null]:
+            os.close(fd)
+
+
+def run_workload(workload: Workload, path: str, jobs: int, backend, repeat: int):
+    app_cfg = workload.app_config(os.path.join(path, "root"))
+    best = None
+    for run in range(repeat):
+        tasks = workload.build_tasks(app_cfg)
+        options = ExecutionOptions(
+            jobs=jobs,
+            backend=backend,
+            log_dir=os.path.join(path, "logs", "%s-%d-%d" % (workload.name, jobs, run)),
+        )
+        with discarded_output():
+            start = time.perf_counter()
+            Executor(app_cfg, ModulesConfig(workload.modules), options).run_tasks(tasks)
+            wall = time.perf_counter() - start
+        if best is None or wall < best[0]:
+            best = (wall, tasks)
+    wall, tasks = best
+    commands = sum(len(task.commands) for task in tasks)
+    ideal, critical_path = workload.ideal(app_cfg, tasks, jobs)
+    metrics = {
+        "commands": commands,
+        "ideal_s": ideal,
+        "critical_path_s": critical_path,
+        "overhead_ms": max(0.0, wall - ideal) / commands * 1000,
+    }
+    if ideal:
+        metrics["efficiency"] = ideal / wall
+    if workload.output_bytes():
+        metrics["mb_per_s"] = workload.output_bytes() / MB / wall
+    statuses = count_statuses(command_records(tasks))
+    if set(statuses) != {ExecutionStatus.COMPLETED.value}:
+        metrics["statuses"] = " ".join(
+            "%s=%d" % item for item in sorted(statuses.items())
+        )
+    return Result(
+        benchmark="%s/%s" % (workload.name, backend or "sequential"),
+        size=jobs,
+        seconds=wall,
+        metrics=metrics,
+    )
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of the executor with a fake ant"
+    )
+    parser.add_argument(
+        "--jobs", type=int, nargs="+", default=JOBS, help="Values of -j to run"
+    )
+    parser.add_argument(
+        "--modules", type=int, default=24, help="Modules of the task graphs"
+    )
+    parser.add_argument(
+        "--backend",
+        nargs="+",
+        default=["async", "subprocess"],
+        help="Backends used for -j > 1, -j 1 runs sequentially",
+    )
+    parser.add_argument(
+        "--workload",
+        nargs="+",
+        choices=["overhead", "sleep", "cpu", "output", "failure"],
+        help="Workloads to run, all by default",
+    )
+    parser.add_argument(
+        "--output-mb",
+        type=int,
+        default=16,
+        help="Output written by every command of the output workload",
+    )
+    parser.add_argument("--workdir", help="Directory for generated workspaces")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    path = tempfile.mkdtemp(prefix="wc_bench_executor_", dir=args.workdir)
+    saved_path = os.environ["PATH"]
+    os.environ["PATH"] = install_fake_ant(path) + os.pathsep + saved_path
+    results = []
+    try:
+        for workload in workloads(path, args.modules, args.output_mb):
+            if args.workload and workload.name not in args.workload:
+                continue
+            for jobs in args.jobs:
+                for backend in [None] if jobs == 1 else args.backend:
+                    results.append(
+                        run_workload(workload, path, jobs, backend, args.repeat)
+                    )
+    finally:
+        os.environ["PATH"] = saved_path
+        shutil.rmtree(path)
+    return report(results, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
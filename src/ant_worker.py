@@ -0,0 +1,317 @@
+"""Java source of the resident ant worker started by --backend daemon.
+
+The worker runs ant in-process through org.apache.tools.ant.Main, so JVM
+startup and loading of the ant classes are paid once per worker instead of
+once per command. It speaks the protocol described in src/daemon.py on a
+unix socket (JDK 16 or newer), serves one build at a time and exits after
+being idle for the given minutes or after the given number of builds. When
+the client disconnects during a build, processes forked by the build are
+killed and the worker exits.
+
+Arguments: socket path, idle minutes, maximum builds.
+"""
+
+ANT_WORKER_CLASS = "AntWorker"
+
+ANT_WORKER_SOURCE = r"""
+import java.io.ByteArrayOutputStream;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.net.StandardProtocolFamily;
+import java.net.UnixDomainSocketAddress;
+import java.nio.ByteBuffer;
+import java.nio.channels.ServerSocketChannel;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.attribute.PosixFilePermissions;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.concurrent.LinkedBlockingQueue;
+
+import org.apache.tools.ant.Main;
+
+public class AntWorker {
+    private static final int LINE_LIMIT = 1024 * 1024;
+    private static final String EOF = new String("EOF");
+    private static final Forwarder STDOUT =
+            new Forwarder("stdout", new FileOutputStream(FileDescriptor.out));
+    private static final Forwarder STDERR =
+            new Forwarder("stderr", new FileOutputStream(FileDescriptor.err));
+    private static volatile boolean busy = false;
+    private static volatile long lastActivity = System.currentTimeMillis();
+
+    public static void main(String[] args) throws Exception {
+        Path socket = Paths.get(args[0]);
+        long idleMillis = (long) (Double.parseDouble(args[1]) * 60000);
+        int maxBuilds = Integer.parseInt(args[2]);
+        // ant Main keeps the streams set at its class initialization
+        System.setOut(new PrintStream(STDOUT, true, "UTF-8"));
+        System.setErr(new PrintStream(STDERR, true, "UTF-8"));
+        Files.deleteIfExists(socket);
+        ServerSocketChannel server = ServerSocketChannel.open(StandardProtocolFamily.UNIX);
+        server.bind(UnixDomainSocketAddress.of(socket));
+        Files.setPosixFilePermissions(socket, PosixFilePermissions.fromString("rw-------"));
+        watchIdle(socket, idleMillis);
+        int builds = 0;
+        while (builds < maxBuilds) {
+            try (SocketChannel channel = server.accept()) {
+                builds += serve(channel, socket);
+            } catch (IOException e) {
+                // client gone between builds
+            }
+            lastActivity = System.currentTimeMillis();
+        }
+        Files.deleteIfExists(socket);
+        System.exit(0);
+    }
+
+    private static int serve(SocketChannel channel, Path socket) throws IOException {
+        LinkedBlockingQueue<String> requests = new LinkedBlockingQueue<>();
+        Thread reader = new Thread(() -> readLines(channel, requests, socket));
+        reader.setDaemon(true);
+        reader.start();
+        Connection connection = new Connection(channel);
+        int builds = 0;
+        while (true) {
+            String line = take(requests);
+            if (line == EOF) {
+                return builds;
+            }
+            busy = true;
+            int code;
+            STDOUT.connect(connection);
+            STDERR.connect(connection);
+            try {
+                code = runAnt(parseArgs(line));
+            } catch (RuntimeException e) {
+                System.err.println("Invalid request: " + line);
+                code = 2;
+            } finally {
+                STDOUT.disconnect();
+                STDERR.disconnect();
+                busy = false;
+                lastActivity = System.currentTimeMillis();
+            }
+            connection.send("{\"exit\": " + code + "}");
+            builds++;
+        }
+    }
+
+    private static int runAnt(List<String> args) {
+        ResidentMain main = new ResidentMain();
+        main.startAnt(args.toArray(new String[0]), null, null);
+        return main.exitCode;
+    }
+
+    private static void readLines(
+            SocketChannel channel, LinkedBlockingQueue<String> requests, Path socket) {
+        ByteBuffer buffer = ByteBuffer.allocate(64 * 1024);
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        try {
+            while (channel.read(buffer) >= 0) {
+                buffer.flip();
+                while (buffer.hasRemaining()) {
+                    byte value = buffer.get();
+                    if (value == '\n') {
+                        requests.add(new String(line.toByteArray(), StandardCharsets.UTF_8));
+                        line.reset();
+                    } else {
+                        line.write(value);
+                    }
+                }
+                buffer.clear();
+            }
+        } catch (IOException e) {
+            // closed by the worker or reset by the client
+        }
+        if (busy) {
+            abort(socket);
+        }
+        requests.add(EOF);
+    }
+
+    private static void abort(Path socket) {
+        // the client cancelled the build, processes forked by it go down too
+        ProcessHandle.current().descendants().forEach(ProcessHandle::destroyForcibly);
+        deleteQuietly(socket);
+        Runtime.getRuntime().halt(1);
+    }
+
+    private static void watchIdle(Path socket, long idleMillis) {
+        Thread thread = new Thread(() -> {
+            while (true) {
+                try {
+                    Thread.sleep(1000);
+                } catch (InterruptedException e) {
+                    return;
+                }
+                if (!busy && System.currentTimeMillis() - lastActivity > idleMillis) {
+                    deleteQuietly(socket);
+                    System.exit(0);
+                }
+            }
+        });
+        thread.setDaemon(true);
+        thread.start();
+    }
+
+    private static void deleteQuietly(Path path) {
+        try {
+            Files.deleteIfExists(path);
+        } catch (IOException e) {
+            // a stale socket is replaced by the next worker
+        }
+    }
+
+    private static String take(LinkedBlockingQueue<String> queue) {
+        while (true) {
+            try {
+                return queue.take();
+            } catch (InterruptedException e) {
+                // keep waiting
+            }
+        }
+    }
+
+    static List<String> parseArgs(String request) {
+        List<String> args = new ArrayList<>();
+        int idx = request.indexOf('[') + 1;
+        if (idx == 0) {
+            throw new IllegalArgumentException("args missing");
+        }
+        while (true) {
+            char current = request.charAt(idx++);
+            if (current == ']') {
+                return args;
+            }
+            if (current != '"') {
+                continue;
+            }
+            StringBuilder value = new StringBuilder();
+            while ((current = request.charAt(idx++)) != '"') {
+                if (current != '\\') {
+                    value.append(current);
+                    continue;
+                }
+                current = request.charAt(idx++);
+                switch (current) {
+                    case 'b': value.append('\b'); break;
+                    case 'f': value.append('\f'); break;
+                    case 'n': value.append('\n'); break;
+                    case 'r': value.append('\r'); break;
+                    case 't': value.append('\t'); break;
+                    case 'u':
+                        value.append((char) Integer.parseInt(request.substring(idx, idx + 4), 16));
+                        idx += 4;
+                        break;
+                    default: value.append(current);
+                }
+            }
+            args.add(value.toString());
+        }
+    }
+
+    static String quote(String text) {
+        StringBuilder result = new StringBuilder("\"");
+        for (int idx = 0; idx < text.length(); idx++) {
+            char current = text.charAt(idx);
+            if (current == '"' || current == '\\') {
+                result.append('\\').append(current);
+            } else if (current < 0x20) {
+                result.append(String.format("\\u%04x", (int) current));
+            } else {
+                result.append(current);
+            }
+        }
+        return result.append('"').toString();
+    }
+
+    private static class ResidentMain extends Main {
+        private int exitCode = 1;
+
+        @Override
+        protected void exit(int exitCode) {
+            this.exitCode = exitCode;
+        }
+    }
+
+    private static class Connection {
+        private final SocketChannel channel;
+
+        Connection(SocketChannel channel) {
+            this.channel = channel;
+        }
+
+        synchronized void send(String message) throws IOException {
+            ByteBuffer buffer = ByteBuffer.wrap((message + "\n").getBytes(StandardCharsets.UTF_8));
+            while (buffer.hasRemaining()) {
+                channel.write(buffer);
+            }
+        }
+    }
+
+    /** Sends output lines of a build to its client, output between builds to the log. */
+    private static class Forwarder extends OutputStream {
+        private final String stream;
+        private final OutputStream idle;
+        private final ByteArrayOutputStream line = new ByteArrayOutputStream();
+        private Connection connection;
+
+        Forwarder(String stream, OutputStream idle) {
+            this.stream = stream;
+            this.idle = idle;
+        }
+
+        synchronized void connect(Connection connection) {
+            this.connection = connection;
+        }
+
+        synchronized void disconnect() {
+            if (line.size() > 0) {
+                sendLine();
+            }
+            connection = null;
+        }
+
+        @Override
+        public synchronized void write(int value) throws IOException {
+            if (connection == null) {
+                idle.write(value);
+            } else if (value == '\n' || line.size() >= LINE_LIMIT) {
+                sendLine();
+                if (value != '\n') {
+                    line.write(value);
+                }
+            } else {
+                line.write(value);
+            }
+        }
+
+        @Override
+        public synchronized void write(byte[] bytes, int offset, int length) throws IOException {
+            for (int idx = offset; idx < offset + length; idx++) {
+                write(bytes[idx]);
+            }
+        }
+
+        private void sendLine() {
+            String text = new String(line.toByteArray(), StandardCharsets.UTF_8);
+            line.reset();
+            if (text.endsWith("\r")) {
+                text = text.substring(0, text.length() - 1);
+            }
+            try {
+                connection.send("{\"stream\": " + quote(stream) + ", \"line\": " + quote(text) + "}");
+            } catch (IOException e) {
+                // the reader notices the disconnected client
+            }
+        }
+    }
+}
+"""
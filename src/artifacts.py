@@ -0,0 +1,261 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+FICLONE = 0x40049409
+LINK_MODES = ["reflink", "hardlink", "copy"]
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class ArtifactCache:
+    """Content addressed store of build outputs shared between workspaces.
+
+    Entries are keyed by the content of the module source directory and the
+    build command with the module location stripped, so identical revisions
+    in different roots share them. Files are stored once per content hash,
+    least recently used entries are evicted above max_size bytes.
+
+    Outputs are restored as reflinks falling back to copies, or as hardlinks
+    to read-only objects with link mode hardlink.
+    """
+
+    def __init__(self, path: str, max_size: int, link: str = "reflink"):
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.link = link
+        self.lock = threading.Lock()
+        self.store_lock = threading.Lock()
+        self.hashes_path = os.path.join(self.path, "hashes.json")
+        self.hashes = self.__load_hashes()
+        self.hashes_dirty = False
+
+    def key(self, location: str, src: str, command: str, outputs: list) -> str:
+        digest = hashlib.sha256()
+        digest.update(command.replace(location, "<module>").encode())
+        for output in outputs:
+            digest.update(("\0" + output).encode())
+        src_dir = os.path.join(location, src)
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(("\0%s\0" % os.path.relpath(path, src_dir)).encode())
+                digest.update(self.file_hash(path).encode())
+        self.__save_hashes()
+        return digest.hexdigest()
+
+    def file_hash(self, path: str) -> str:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return ""
+        with self.lock:
+            cached = self.hashes.get(path)
+        if cached is not None and cached[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        with self.lock:
+            self.hashes[path] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+            self.hashes_dirty = True
+        return digest.hexdigest()
+
+    def restore(self, key: str, location: str) -> bool:
+        manifest_path = self.__manifest_path(key)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for files in manifest["outputs"].values():
+            for _, digest, _ in files:
+                if not os.path.exists(self.__object_path(digest)):
+                    return False
+        for output, files in manifest["outputs"].items():
+            target = os.path.join(location, output)
+            remove_path(target)
+            for rel, digest, mode in files:
+                destination = os.path.join(target, rel) if rel else target
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                self.__place(self.__object_path(digest), destination, mode)
+        os.utime(manifest_path)
+        return True
+
+    def store(self, key: str, location: str, outputs: list):
+        with self.store_lock:
+            self.__store(key, location, outputs)
+            self.__evict()
+
+    def evict(self):
+        """Removes least recently used entries above max size and unused objects."""
+        with self.store_lock:
+            self.__evict()
+
+    def __store(self, key: str, location: str, outputs: list):
+        manifest = {"outputs": {}}
+        for output in outputs:
+            target = os.path.join(location, output)
+            files = []
+            if os.path.isfile(target):
+                files.append(["", self.__store_object(target), file_mode(target)])
+            for root, dirs, names in os.walk(target):
+                for name in names:
+                    path = os.path.join(root, name)
+                    rel = os.path.relpath(path, target)
+                    files.append([rel, self.__store_object(path), file_mode(path)])
+            manifest["outputs"][output] = files
+        manifest_path = self.__manifest_path(key)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = temporary_path(manifest_path)
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    def __evict(self):
+        entries = []
+        entries_dir = os.path.join(self.path, "entries")
+        for name in os.listdir(entries_dir) if os.path.isdir(entries_dir) else []:
+            path = os.path.join(entries_dir, name)
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+                accessed = os.stat(path).st_mtime
+            except (OSError, ValueError):
+                continue
+            digests = {
+                digest
+                for files in manifest["outputs"].values()
+                for _, digest, _ in files
+            }
+            entries.append((accessed, path, digests))
+        entries.sort()
+        sizes = {}
+        for _, _, digests in entries:
+            for digest in digests:
+                if digest not in sizes:
+                    sizes[digest] = object_size(self.__object_path(digest))
+        referenced = {}
+        for _, _, digests in entries:
+            for digest in digests:
+                referenced[digest] = referenced.get(digest, 0) + 1
+        total = sum(sizes.values())
+        while entries and total > self.max_size:
+            _, path, digests = entries.pop(0)
+            os.remove(path)
+            for digest in digests:
+                referenced[digest] -= 1
+                if not referenced[digest]:
+                    total -= sizes[digest]
+        # objects never referenced may belong to an entry being stored by
+        # another process, they are removed only after a grace period
+        expired = time.time() - ORPHAN_GRACE_SECONDS
+        objects_dir = os.path.join(self.path, "objects")
+        for root, dirs, names in os.walk(objects_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if referenced.get(name, 0) > 0:
+                    continue
+                try:
+                    if name in referenced or os.stat(path).st_mtime < expired:
+                        os.remove(path)
+                except OSError:
+                    continue
+
+    def size(self) -> int:
+        total = 0
+        for root, dirs, names in os.walk(os.path.join(self.path, "objects")):
+            for name in names:
+                total += object_size(os.path.join(root, name))
+        return total
+
+    def __store_object(self, path: str) -> str:
+        digest = self.file_hash(path)
+        object_path = self.__object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = temporary_path(object_path)
+            clone_file(path, tmp_path, self.link != "copy")
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, object_path)
+        return digest
+
+    def __place(self, object_path: str, destination: str, mode: int):
+        if self.link == "hardlink":
+            try:
+                os.link(object_path, destination)
+                return
+            except OSError:
+                pass
+        clone_file(object_path, destination, self.link != "copy")
+        os.chmod(destination, mode)
+
+    def __object_path(self, digest: str) -> str:
+        return os.path.join(self.path, "objects", digest[:2], digest)
+
+    def __manifest_path(self, key: str) -> str:
+        return os.path.join(self.path, "entries", key + ".json")
+
+    def __load_hashes(self) -> dict:
+        try:
+            with open(self.hashes_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __save_hashes(self):
+        with self.lock:
+            if not self.hashes_dirty:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = temporary_path(self.hashes_path)
+            with open(tmp_path, "w") as f:
+                json.dump(self.hashes, f, separators=(",", ":"))
+            os.replace(tmp_path, self.hashes_path)
+            self.hashes_dirty = False
+
+
+def module_outputs(outputs: dict, aliases: dict, name: str, src: str) -> list:
+    """Output paths configured for a module source directory, keyed by name or alias."""
+    for key, by_src in outputs.items():
+        if aliases.get(key, key) == name:
+            return list((by_src or {}).get(src) or [])
+    return []
+
+
+def clone_file(source: str, destination: str, reflink: bool = True):
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        if reflink:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def temporary_path(path: str) -> str:
+    return "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+
+
+def remove_path(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def file_mode(path: str) -> int:
+    return os.stat(path).st_mode & 0o777
+
+
+def object_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
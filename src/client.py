@@ -0,0 +1,51 @@
+"""Client forwarding wc_builder invocations to a build server started with --serve.
+
+The client passes its stdin, stdout and stderr to the server over the unix
+socket together with a single request line {"argv": [...], "cwd": "...",
+"env": {...}}. The server answers with {"pid": N} of the process group
+executing the request followed by {"exit": code}. Output is written by the
+server directly to the passed descriptors. Ctrl+C is forwarded to the
+executing process group.
+
+Only the standard library is imported so forwarding stays cheap.
+"""
+
+import array
+import json
+import os
+import signal
+import socket
+
+STD_FDS = [0, 1, 2]
+
+
+def forward(path: str, argv: list):
+    """Executes argv in the server, returns the exit code or None without server."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    with client:
+        request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        client.sendmsg(
+            [(json.dumps(request) + "\n").encode()],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", STD_FDS))],
+        )
+        stream = client.makefile("rb")
+        pid = None
+        while True:
+            try:
+                line = stream.readline()
+            except KeyboardInterrupt:
+                if pid is not None:
+                    # like a terminal, interrupt the whole process group
+                    os.killpg(pid, signal.SIGINT)
+                continue
+            if not line:
+                return 1
+            response = json.loads(line.decode())
+            if "exit" in response:
+                return response["exit"]
+            pid = response.get("pid", pid)
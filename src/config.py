@@ -23,6 +23,44 @@ class Input(BaseModel):
     module_registry: str
 
 
+class Incremental(BaseModel):
+    enabled: bool = True
+    content_hash: bool = False
+
+
+class Batching(BaseModel):
+    enabled: bool = True
+    default_target: str = "all"
+
+
+class Daemon(BaseModel):
+    sockets: list = []
+    workers: int = 1
+    java_home: Optional[str] = None
+    ant_home: Optional[str] = None
+    jvm_options: list = []
+    idle_minutes: float = 30
+
+
+class Workers(BaseModel):
+    addresses: list
+    slots: int = 1
+    token: Optional[str] = None
+
+
+class Resources(BaseModel):
+    pools: dict
+    costs: dict = {}
+
+
+class Artifacts(BaseModel):
+    enabled: bool = True
+    path: str = "~/.wc_builder/artifacts"
+    max_size_gb: float = 10
+    link: str = "reflink"
+    outputs: dict = {}
+
+
 class AppConfig(BaseModel):
     profile: str
     root: str
@@ -31,3 +69,10 @@ class AppConfig(BaseModel):
     input: Input
     aliases: dict
     suites: dict
+    dependencies: Optional[dict] = None
+    incremental: Optional[Incremental] = None
+    daemon: Optional[Daemon] = None
+    batching: Optional[Batching] = None
+    workers: Optional[Workers] = None
+    resources: Optional[Resources] = None
+    artifacts: Optional[Artifacts] = None
@@ -0,0 +1,87 @@
+"""Validated app config stored as JSON, restored without yaml and pydantic.
+
+The cache is keyed by size and modification time of cfg.yml and of the
+program defining the config models, so a changed config or an updated
+wc_builder validates cfg.yml again.
+"""
+
+import json
+import os
+import sys
+
+MODEL = "__model__"
+
+
+class ConfigView:
+    """Attribute access to a cached config, mirroring the validated models."""
+
+    def __init__(self, fields: dict):
+        self.__dict__.update(fields)
+
+    def __repr__(self) -> str:
+        return "ConfigView(%s)" % ", ".join(
+            "%s=%r" % (name, value) for name, value in self.__dict__.items()
+        )
+
+
+def cache_key(cfg_path: str) -> list:
+    if getattr(sys, "frozen", False):
+        program = sys.executable
+    else:
+        program = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.py")
+    key = [os.path.abspath(cfg_path)]
+    for path in [cfg_path, program]:
+        stat = os.stat(path)
+        key += [stat.st_mtime_ns, stat.st_size]
+    return key
+
+
+def load(path: str, key: list):
+    """Cached config for key, None when missing or stale."""
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get("key") != key:
+        return None
+    return decode(cache["config"])
+
+
+def store(path: str, key: list, config):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump({"key": key, "config": encode(config)}, f)
+    os.replace(tmp_path, path)
+
+
+def encode(value):
+    fields = model_fields(value)
+    if fields is not None:
+        return {MODEL: {name: encode(getattr(value, name)) for name in fields}}
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+
+def decode(value):
+    if isinstance(value, dict):
+        if list(value) == [MODEL]:
+            return ConfigView(
+                {name: decode(item) for name, item in value[MODEL].items()}
+            )
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+def model_fields(value):
+    # model_fields on pydantic 2, __fields__ on pydantic 1
+    fields = getattr(type(value), "model_fields", None)
+    if fields is None:
+        fields = getattr(type(value), "__fields__", None)
+    return fields
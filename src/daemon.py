@@ -0,0 +1,372 @@
+"""Execution backend submitting ant invocations to long-lived ant workers.
+
+Workers listen on unix sockets and speak a JSON lines protocol. A request is
+a single line {"args": [...]} with ant command line arguments. The worker
+answers with any number of {"stream": "stdout"|"stderr", "line": "..."}
+lines followed by {"exit": code}. Each connection executes one request at a
+time.
+
+Resident workers are JVMs running ant in-process (see src/ant_worker.py),
+started on demand by the backend and kept running between builds. Workers
+started by other means are listed in daemon/sockets.
+
+Running this module starts a stand-in worker that executes requests with a
+regular ant process, which is used for local testing of the protocol.
+"""
+
+import argparse
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import socket as socket_module
+import subprocess
+import sys
+import time
+
+from src.ant_worker import ANT_WORKER_CLASS, ANT_WORKER_SOURCE
+from src.runner import LINE_LIMIT, AsyncRunner, kill_process_group, start_command
+
+PROTOCOL_LIMIT = 2 * LINE_LIMIT
+DEFAULT_WORKERS = 1
+DEFAULT_IDLE_MINUTES = 30
+# ant classes of taskdefs are loaded by every build, a fresh JVM frees them
+MAX_BUILDS = 100
+START_TIMEOUT = 60
+
+
+class DaemonRunner:
+    """Sends ant commands to a pool of workers, other commands run locally.
+
+    Resident workers that are not running are started on first use. Commands
+    fall back to the local runner when no worker is reachable.
+    """
+
+    def __init__(self, sockets: list, fallback: AsyncRunner, resident=None):
+        self.sockets = [os.path.expanduser(socket) for socket in sockets]
+        self.resident = resident
+        if resident is not None:
+            self.sockets += resident.sockets()
+        self.fallback = fallback
+        self.available = None
+        self.started = set()
+
+    async def run(self, command, prefix: str, started=None) -> int:
+        if command.module is None or not command.command.startswith("ant "):
+            return await self.fallback.run(command, prefix, started)
+        if self.available is None:
+            self.available = asyncio.Queue()
+            for socket in self.sockets:
+                self.available.put_nowait(socket)
+            if not self.sockets:
+                self.available.put_nowait(None)
+        while True:
+            socket = await self.available.get()
+            if socket is None:
+                self.available.put_nowait(None)
+                return await self.fallback.run(command, prefix, started)
+            returncode = await self.__submit(socket, command, prefix, started)
+            if returncode is not None:
+                self.available.put_nowait(socket)
+                return returncode
+            print(f"Ant worker {socket} is not available, falling back")
+            self.sockets.remove(socket)
+            if not self.sockets:
+                self.available.put_nowait(None)
+
+    def close(self):
+        self.fallback.close()
+
+    async def __connect(self, socket: str):
+        try:
+            return await asyncio.open_unix_connection(socket, limit=PROTOCOL_LIMIT)
+        except OSError:
+            if self.resident is None or socket in self.started:
+                raise
+        # resident worker not running, it is started once per run
+        self.started.add(socket)
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(None, self.resident.start, socket):
+            raise ConnectionRefusedError(socket)
+        return await asyncio.open_unix_connection(socket, limit=PROTOCOL_LIMIT)
+
+    async def __submit(self, socket: str, command, prefix: str, started):
+        try:
+            reader, writer = await self.__connect(socket)
+        except OSError:
+            return None
+        capture = self.fallback.open_capture(command, prefix)
+        try:
+            request = {"args": shlex.split(command.command)[1:]}
+            writer.write((json.dumps(request) + "\n").encode())
+            # the ant process runs in the worker, its pid is not known here
+            start_command(command, None, started)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return None
+                response = json.loads(line.decode())
+                if "exit" in response:
+                    return response["exit"]
+                output = sys.stderr if response["stream"] == "stderr" else sys.stdout
+                AsyncRunner.write_lines(
+                    [response["line"].encode()], prefix, capture, output
+                )
+        except (OSError, ValueError):
+            return None
+        finally:
+            writer.close()
+            capture.close()
+
+
+class ResidentWorkers:
+    """Ant workers started by the daemon backend and kept running between builds.
+
+    Worker i listens on directory/ant-i.sock and logs to ant-i.sock.log. A
+    worker is started by the launcher when its socket is not reachable and
+    exits on its own once idle, a lock file keeps concurrent runs from
+    starting the same worker twice.
+    """
+
+    def __init__(self, directory: str, count: int, launcher):
+        self.directory = os.path.expanduser(directory)
+        self.count = count
+        self.launcher = launcher
+
+    def sockets(self) -> list:
+        return [
+            os.path.join(self.directory, "ant-%d.sock" % idx)
+            for idx in range(1, self.count + 1)
+        ]
+
+    def start(self, socket: str) -> bool:
+        """Starts the worker of socket unless it is running, True once it listens."""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        with open(socket + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if is_listening(socket):
+                return True
+            try:
+                args = self.launcher.command(socket)
+            except (OSError, subprocess.CalledProcessError) as error:
+                print(f"Cannot start resident ant worker: {error}")
+                return False
+            print(f"Starting resident ant worker {socket}")
+            with open(socket + ".log", "ab") as log:
+                process = subprocess.Popen(
+                    args,
+                    cwd=self.directory,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                    start_new_session=True,
+                )
+            deadline = time.time() + START_TIMEOUT
+            while process.poll() is None and time.time() < deadline:
+                if is_listening(socket):
+                    return True
+                time.sleep(0.1)
+            if process.poll() is None:
+                process.kill()
+            print(f"Resident ant worker {socket} did not start, see {socket}.log")
+            return False
+
+
+class JavaLauncher:
+    """Command line of a resident ant worker JVM.
+
+    The worker is compiled with javac against ant.jar of ant_home on first
+    use, into a directory named by the hash of its source. java_home and
+    ant_home default to JAVA_HOME and ANT_HOME or to java and ant on PATH.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        self.directory = os.path.expanduser(directory)
+        self.java_home = kwargs.get("java_home") or os.environ.get("JAVA_HOME")
+        self.ant_home = kwargs.get("ant_home") or os.environ.get("ANT_HOME")
+        self.jvm_options = list(kwargs.get("jvm_options") or [])
+        self.idle_minutes = kwargs.get("idle_minutes") or DEFAULT_IDLE_MINUTES
+
+    def command(self, socket: str) -> list:
+        ant_home = self.__ant_home()
+        classes = self.__compile(os.path.join(ant_home, "lib", "ant.jar"))
+        return (
+            [self.__tool("java")]
+            + self.jvm_options
+            + [
+                "-Dant.home=%s" % ant_home,
+                "-Dant.library.dir=%s" % os.path.join(ant_home, "lib"),
+                "-cp",
+                os.pathsep.join([classes, os.path.join(ant_home, "lib", "*")]),
+                ANT_WORKER_CLASS,
+                socket,
+                str(self.idle_minutes),
+                str(MAX_BUILDS),
+            ]
+        )
+
+    def __compile(self, ant_jar: str) -> str:
+        digest = hashlib.sha1(ANT_WORKER_SOURCE.encode()).hexdigest()[:12]
+        classes = os.path.join(self.directory, "classes-" + digest)
+        if os.path.exists(os.path.join(classes, ANT_WORKER_CLASS + ".class")):
+            return classes
+        build_dir = "%s.%d.tmp" % (classes, os.getpid())
+        os.makedirs(build_dir, exist_ok=True)
+        source = os.path.join(build_dir, ANT_WORKER_CLASS + ".java")
+        with open(source, "w") as f:
+            f.write(ANT_WORKER_SOURCE)
+        javac = [self.__tool("javac"), "-encoding", "UTF-8", "-cp", ant_jar]
+        subprocess.run(javac + ["-d", build_dir, source], check=True)
+        try:
+            os.rename(build_dir, classes)
+        except OSError:
+            # compiled by a concurrent run meanwhile
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return classes
+
+    def __tool(self, name: str) -> str:
+        if self.java_home:
+            path = os.path.join(os.path.expanduser(self.java_home), "bin", name)
+        else:
+            path = shutil.which(name)
+        if path is None or not os.access(path, os.X_OK):
+            raise FileNotFoundError(f"{name} of a JDK 16 or newer not found")
+        return path
+
+    def __ant_home(self) -> str:
+        ant_home = self.ant_home
+        if not ant_home and shutil.which("ant"):
+            # ant on PATH is ANT_HOME/bin/ant
+            ant = os.path.realpath(shutil.which("ant"))
+            ant_home = os.path.dirname(os.path.dirname(ant))
+        ant_home = os.path.expanduser(ant_home or "")
+        if not os.path.isfile(os.path.join(ant_home, "lib", "ant.jar")):
+            raise FileNotFoundError("ant.jar not found, set daemon/ant_home")
+        return ant_home
+
+
+def resident_workers(daemon, directory: str):
+    """Resident workers configured by the daemon block of CFG, defaults without it."""
+    count = DEFAULT_WORKERS if daemon is None else daemon.workers
+    if not count or directory is None:
+        return None
+    launcher = JavaLauncher(
+        directory,
+        java_home=getattr(daemon, "java_home", None),
+        ant_home=getattr(daemon, "ant_home", None),
+        jvm_options=getattr(daemon, "jvm_options", None),
+        idle_minutes=getattr(daemon, "idle_minutes", None),
+    )
+    return ResidentWorkers(directory, count, launcher)
+
+
+def is_listening(socket: str) -> bool:
+    with socket_module.socket(socket_module.AF_UNIX) as connection:
+        try:
+            connection.connect(socket)
+        except OSError:
+            return False
+    return True
+
+
+class StandInWorker:
+    def __init__(self, ant: str):
+        self.ant = ant
+        self.lock = None
+
+    async def handle(self, reader, writer):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        # the next line is read while a request executes to notice disconnects
+        next_line = asyncio.ensure_future(reader.readline())
+        try:
+            while True:
+                line = await next_line
+                if not line:
+                    break
+                request = json.loads(line.decode())
+                next_line = asyncio.ensure_future(reader.readline())
+                async with self.lock:
+                    code = await self.__execute(request["args"], writer, next_line)
+                if code is None:
+                    break
+                writer.write((json.dumps({"exit": code}) + "\n").encode())
+                await writer.drain()
+        except (OSError, ValueError):
+            pass
+        finally:
+            next_line.cancel()
+            writer.close()
+
+    async def __execute(self, args: list, writer, next_line):
+        """Runs ant in its own process group.
+
+        The group is killed and None returned when the client disconnects,
+        e.g. when it cancels the command after another failure.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.ant),
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=LINE_LIMIT,
+            start_new_session=True,
+        )
+        forward = asyncio.ensure_future(
+            asyncio.gather(
+                self.__forward(process.stdout, "stdout", writer),
+                self.__forward(process.stderr, "stderr", writer),
+            )
+        )
+        try:
+            await asyncio.wait(
+                [forward, next_line], return_when=asyncio.FIRST_COMPLETED
+            )
+            if not forward.done() and not next_line.result():
+                raise ConnectionResetError("Client disconnected")
+            await forward
+            return await process.wait()
+        except (OSError, ValueError):
+            kill_process_group(process.pid)
+            await process.wait()
+            return None
+        finally:
+            forward.cancel()
+
+    @staticmethod
+    async def __forward(stream, name: str, writer):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace").rstrip("\r\n")
+            writer.write((json.dumps({"stream": name, "line": text}) + "\n").encode())
+            await writer.drain()
+
+
+def serve(socket: str, ant: str):
+    if os.path.exists(socket):
+        os.remove(socket)
+    loop = asyncio.get_event_loop()
+    worker = StandInWorker(ant)
+    # created private, other users cannot connect before the chmod
+    umask = os.umask(0o077)
+    try:
+        loop.run_until_complete(asyncio.start_unix_server(worker.handle, path=socket))
+    finally:
+        os.umask(umask)
+    os.chmod(socket, 0o600)
+    print(f"Ant worker listening on {socket}")
+    sys.stdout.flush()
+    loop.run_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in ant worker")
+    parser.add_argument("--socket", required=True, help="Unix socket path")
+    parser.add_argument("--ant", default="ant", help="Ant executable")
+    args = parser.parse_args()
+    serve(args.socket, args.ant)
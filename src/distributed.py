@@ -0,0 +1,274 @@
+"""Execution backend dispatching module commands to build workers over TCP.
+
+Workers run on the same host or on other hosts sharing the code root and
+speak a JSON lines protocol. A request is a single line {"command": "...",
+"token": "..."}, one request per connection, commands use absolute paths and
+run in the working directory of the worker. The worker answers
+with any number of {"stream": "stdout"|"stderr", "line": "..."} and
+{"heartbeat": true} lines followed by {"exit": code}, or with {"error": "..."}
+when the token does not match its own. A worker that closes the connection or
+stays silent for HEARTBEAT_TIMEOUT seconds is considered dead, its command is
+reassigned to another worker.
+
+Running this module starts a worker. Workers execute any shell command they
+receive, so a worker listening on a non-loopback interface requires a token.
+"""
+
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sys
+
+from src.runner import LINE_LIMIT, AsyncRunner, kill_process_group, start_command
+
+PROTOCOL_LIMIT = 2 * LINE_LIMIT
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+
+
+def parse_address(address: str) -> tuple:
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+class RemoteRunner:
+    """Sends module commands to a pool of build workers, other commands run locally.
+
+    Every worker accepts up to slots concurrent commands. Commands of dead
+    workers are reassigned to the remaining ones and run locally once no
+    worker is left.
+    """
+
+    def __init__(
+        self, addresses: list, slots: int, fallback: AsyncRunner, token: str = None
+    ):
+        self.addresses = list(addresses)
+        self.slots = slots
+        self.fallback = fallback
+        self.token = token
+        self.available = None
+
+    async def run(self, command, prefix: str, started=None) -> int:
+        if command.module is None:
+            return await self.fallback.run(command, prefix, started)
+        if self.available is None:
+            self.available = asyncio.Queue()
+            for _ in range(self.slots):
+                for address in self.addresses:
+                    self.available.put_nowait(address)
+            if not self.addresses:
+                self.available.put_nowait(None)
+        while True:
+            address = await self.available.get()
+            if address is None:
+                self.available.put_nowait(None)
+                return await self.fallback.run(command, prefix, started)
+            if address not in self.addresses:
+                continue
+            returncode = await self.__submit(address, command, prefix, started)
+            if returncode is not None:
+                self.available.put_nowait(address)
+                return returncode
+            self.__remove(address)
+
+    def close(self):
+        self.fallback.close()
+
+    def __remove(self, address: str):
+        if address not in self.addresses:
+            return
+        self.addresses.remove(address)
+        if self.addresses:
+            print(f"Build worker {address} is not available, reassigning its work")
+        else:
+            print(f"Build worker {address} is not available, falling back")
+            self.available.put_nowait(None)
+
+    async def __submit(self, address: str, command, prefix: str, started):
+        try:
+            reader, writer = await asyncio.open_connection(
+                *parse_address(address), limit=PROTOCOL_LIMIT
+            )
+        except OSError:
+            return None
+        capture = self.fallback.open_capture(command, prefix)
+        try:
+            request = {"command": command.command, "token": self.token}
+            writer.write((json.dumps(request) + "\n").encode())
+            # the process runs on the worker host, its pid is not known here
+            start_command(command, None, started)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HEARTBEAT_TIMEOUT)
+                if not line:
+                    return None
+                response = json.loads(line.decode())
+                if "exit" in response:
+                    return response["exit"]
+                if "error" in response:
+                    error = response["error"]
+                    print(f"Build worker {address} refused the command: {error}")
+                    return None
+                if "heartbeat" in response:
+                    continue
+                output = sys.stderr if response["stream"] == "stderr" else sys.stdout
+                AsyncRunner.write_lines(
+                    [response["line"].encode()], prefix, capture, output
+                )
+        except (OSError, ValueError, asyncio.TimeoutError):
+            return None
+        finally:
+            writer.close()
+            capture.close()
+
+
+class BuildWorker:
+    def __init__(self, slots: int, token: str = None):
+        self.slots = slots
+        self.token = token
+        self.semaphore = None
+
+    async def handle(self, reader, writer):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.slots)
+        line = await reader.readline()
+        if not line:
+            writer.close()
+            return
+        request = json.loads(line.decode())
+        if not self.__authorized(request):
+            writer.write((json.dumps({"error": "invalid token"}) + "\n").encode())
+            await writer.drain()
+            writer.close()
+            return
+        # queued requests send heartbeats too, the coordinator keeps waiting
+        heartbeat = asyncio.ensure_future(self.__heartbeat(writer))
+        # nothing follows the request, reading ends when the coordinator is gone
+        disconnect = asyncio.ensure_future(reader.read())
+        code = None
+        try:
+            async with self.semaphore:
+                # a coordinator gone while queued does not wait for the result
+                if not disconnect.done():
+                    code = await self.__execute(request, disconnect, writer)
+        finally:
+            heartbeat.cancel()
+            disconnect.cancel()
+        if code is not None:
+            writer.write((json.dumps({"exit": code}) + "\n").encode())
+            await writer.drain()
+        writer.close()
+
+    def __authorized(self, request: dict) -> bool:
+        if self.token is None:
+            return True
+        token = request.get("token") or ""
+        return hmac.compare_digest(token.encode(), self.token.encode())
+
+    async def __execute(self, request: dict, disconnect, writer):
+        """Runs the command in its own process group.
+
+        The group is killed when the coordinator disconnects, e.g. when it
+        cancels the command after another failure.
+        """
+        try:
+            process = await asyncio.create_subprocess_shell(
+                request["command"],
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=LINE_LIMIT,
+                start_new_session=True,
+            )
+        except OSError as error:
+            # reported as a failed command, the worker itself is healthy
+            text = "Cannot execute command: %s" % error
+            writer.write(
+                (json.dumps({"stream": "stderr", "line": text}) + "\n").encode()
+            )
+            return 127
+        forward = asyncio.ensure_future(
+            asyncio.gather(
+                self.__forward(process.stdout, "stdout", writer),
+                self.__forward(process.stderr, "stderr", writer),
+            )
+        )
+        try:
+            await asyncio.wait(
+                [forward, disconnect], return_when=asyncio.FIRST_COMPLETED
+            )
+            if not forward.done():
+                raise ConnectionResetError("Coordinator disconnected")
+            forward.result()
+            return await process.wait()
+        except (OSError, ValueError):
+            # coordinator is gone, nobody waits for the result
+            kill_process_group(process.pid)
+            await process.wait()
+            return None
+        finally:
+            forward.cancel()
+
+    @staticmethod
+    async def __heartbeat(writer):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            writer.write((json.dumps({"heartbeat": True}) + "\n").encode())
+
+    @staticmethod
+    async def __forward(stream, name: str, writer):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace").rstrip("\r\n")
+            writer.write((json.dumps({"stream": name, "line": text}) + "\n").encode())
+            await writer.drain()
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def read_token(path: str) -> str:
+    with open(os.path.expanduser(path)) as f:
+        return f.read().strip()
+
+
+def serve(host: str, port: int, slots: int, token: str = None):
+    if token is None and not is_loopback(host):
+        sys.exit(f"Build worker on {host} requires --token-file")
+    loop = asyncio.get_event_loop()
+    worker = BuildWorker(slots, token)
+    server = loop.run_until_complete(
+        asyncio.start_server(worker.handle, host, port, limit=PROTOCOL_LIMIT)
+    )
+    address = server.sockets[0].getsockname()
+    print(f"Build worker listening on {address[0]}:{address[1]}")
+    sys.stdout.flush()
+    loop.run_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build worker")
+    parser.add_argument("--host", default="localhost", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=0, help="Port, 0 picks a free one")
+    parser.add_argument("--slots", type=int, default=1, help="Concurrent commands")
+    parser.add_argument(
+        "--token-file",
+        help="File with the token of workers/token in CFG, required by requests. "
+        "Mandatory when listening on a non-loopback interface",
+    )
+    args = parser.parse_args()
+    serve(
+        args.host,
+        args.port,
+        args.slots,
+        read_token(args.token_file) if args.token_file else None,
+    )
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+import time
+
+
+class EventLog:
+    """Writes lifecycle events of commands as JSON lines.
+
+    Target is a file path or fd:N for an already open file descriptor. Every
+    event carries its type and a timestamp, command events carry the new
+    status of the command.
+    """
+
+    def __init__(self, target: str):
+        self.lock = threading.Lock()
+        if target.startswith("fd:"):
+            self.stream = os.fdopen(int(target[3:]), "w", closefd=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            self.stream = open(target, "w")
+
+    def emit(self, event: str, **fields):
+        record = {"event": event, "timestamp": time.time()}
+        record.update(fields)
+        with self.lock:
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+def count_statuses(records: list) -> dict:
+    counts = {}
+    for record in records:
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+    return counts
+
+
+def run_report(records: list, start_time: float, end_time: float) -> dict:
+    """Builds the machine readable report of a finished run from command records."""
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration": end_time - start_time,
+        "statuses": count_statuses(records),
+        "commands": records,
+    }
+
+
+def write_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
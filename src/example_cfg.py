@@ -6,6 +6,12 @@ commands:
     restart: echo "Restarting"
   custom:
     full: echo "Full"
+incremental:
+  enabled: true
+  content_hash: false
+batching:
+  enabled: true
+  default_target: all
 input:
   build_order: ignored/compile.includes
   module_registry: ignored/moduleRegistry.xml
@@ -1,11 +1,30 @@
+import asyncio
 import subprocess
 import time
 from enum import Enum
+from typing import TYPE_CHECKING
 
 import src.constants as const
-from src.config import AppConfig
 from src.constants import Target
+from src.artifacts import module_outputs
+from src.daemon import DaemonRunner, resident_workers
+from src.distributed import RemoteRunner
+from src.events import count_statuses
+from src.impact import DependencyIndex
 from src.module import ModuleInfo, ModulesConfig
+from src.output import MAX_ERRORS
+from src.runner import AsyncRunner, SubprocessRunner, start_command, wait_process
+from src.scheduler import ResourcePool, TaskGraph, module_key
+from src.sharding import (
+    discover_test_classes,
+    includes,
+    parse_test_durations,
+    partition,
+)
+from src.usage import USAGE_FIELDS
+
+if TYPE_CHECKING:
+    from src.config import AppConfig
 
 
 class ExecutorException(Exception):
@@ -18,11 +37,21 @@ class ExecutionStatus(str, Enum):
     RUNNING = "RUNNING"
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
+    UP_TO_DATE = "UP_TO_DATE"
+    SKIPPED = "SKIPPED"
+    CANCELLED = "CANCELLED"
+    CACHED = "CACHED"
 
 
 class Command:
     def __init__(
-        self, command: str, status: ExecutionStatus = None
+        self,
+        command: str,
+        status: ExecutionStatus = None,
+        module: ModuleInfo = None,
+        src: str = None,
+        ant_target: str = None,
+        properties: str = None,
     ):
         self.command = command
         if status is None:
@@ -30,11 +59,87 @@ class Command:
         else:
             self.status = status
         self.time = -1
+        self.module = module
+        self.src = src
+        self.ant_target = ant_target
+        self.properties = properties
+        self.log_path = None
+        self.start_time = None
+        self.parts = []
+        self.shards = []
+        self.test_classes = []
+        self.selection = None
+        self.pid = None
+        self.usage = None
+        self.returncode = None
+        self.artifact_key = None
+        self.tail = []
+        self.errors = []
+
+    def fingerprint_key(self):
+        if self.module is None or self.src is None:
+            return None
+        return "%s/%s" % (self.module.location, self.src)
+
+    def build_file(self):
+        if self.module is None or self.src is None:
+            return None
+        return "%s/%s/build.xml" % (self.module.location, self.src)
+
+    def update_parts(self):
+        for part in self.parts:
+            part.status = self.status
+            part.time = self.time
+            part.start_time = self.start_time
+            part.log_path = self.log_path
+            part.pid = self.pid
+            part.usage = self.usage
+            part.returncode = self.returncode
+            part.tail = self.tail
+            part.errors = self.errors
 
     def __repr__(self):
         return f"Command(command={self.command}, status={self.status})"
 
 
+class BatchCommand(Command):
+    """Single ant invocation executing targets of consecutive commands.
+
+    Status and time of the batch are propagated to the merged commands.
+    """
+
+    def __init__(self, parts: list, default_target: str):
+        first = parts[0]
+        targets = [part.ant_target or default_target for part in parts]
+        command = "ant %s -f %s" % (" ".join(targets), first.build_file())
+        if first.properties:
+            command = command + " " + first.properties
+        super().__init__(
+            command,
+            module=first.module,
+            src=first.src,
+            ant_target="+".join(targets),
+            properties=first.properties,
+        )
+        self.parts = parts
+
+
+class ExecutionOptions:
+    def __init__(self, **kwargs):
+        self.jobs = kwargs.get("jobs") or 1
+        self.fingerprints = kwargs.get("fingerprints")
+        self.force = kwargs.get("force", False)
+        self.backend = kwargs.get("backend")
+        self.log_dir = kwargs.get("log_dir")
+        self.history = kwargs.get("history")
+        self.shards = kwargs.get("shards") or 1
+        self.impact_dir = kwargs.get("impact_dir")
+        self.events = kwargs.get("events")
+        self.tracer = kwargs.get("tracer")
+        self.artifacts = kwargs.get("artifacts")
+        self.daemon_dir = kwargs.get("daemon_dir")
+
+
 class Task:
     def __init__(self, target: Target, module: ModuleInfo = None, targets: str = None):
         self.commands = []
@@ -49,9 +154,15 @@ class Task:
 
 
 class TaskBuilder:
-    def __init__(self, app_cfg: AppConfig, config: ModulesConfig):
+    def __init__(
+        self,
+        app_cfg: "AppConfig",
+        config: ModulesConfig,
+        options: ExecutionOptions = None,
+    ):
         self.app_cfg = app_cfg
         self.config = config
+        self.options = options or ExecutionOptions()
 
     def build_tasks(self, arguments: dict) -> list:
         if arguments[Target.SUITE] is not None:
@@ -97,10 +208,53 @@ class TaskBuilder:
             tasks.append(self.build_single_task(Target.RESTART))
         return tasks
 
+    def coalesce_commands(self, tasks: list) -> list:
+        """Merges consecutive prepared ant commands using the same build file.
+
+        Commands of consecutive tasks of the same module are merged into the
+        batch of the former task.
+        """
+        default_target = self.app_cfg.batching.default_target
+        previous_task = None
+        previous = None
+        for task in tasks:
+            commands = []
+            for command in task.commands:
+                if self.__can_merge(previous_task, previous, task, command):
+                    parts = previous.parts or [previous]
+                    batch = BatchCommand(parts + [command], default_target)
+                    owner = (
+                        commands if previous_task is task else previous_task.commands
+                    )
+                    owner[owner.index(previous)] = batch
+                    previous = batch
+                else:
+                    commands.append(command)
+                    previous = command
+                    previous_task = task
+            task.commands = commands
+        return tasks
+
+    @staticmethod
+    def __can_merge(previous_task, previous, task, command) -> bool:
+        if previous is None or command.build_file() is None:
+            return False
+        if previous_task is not task and previous_task.module is not task.module:
+            return False
+        return (
+            previous.status is ExecutionStatus.PREPARED
+            and command.status is ExecutionStatus.PREPARED
+            and previous.build_file() == command.build_file()
+            and previous.properties == command.properties
+            and not previous.shards
+            and not command.shards
+            and command.command.startswith("ant ")
+        )
+
     def __get_task_spec(self, module_spec: str) -> tuple:
-        spec = module_spec.split("_")
+        spec = module_spec.split("_", 1)
         module_alias = spec[0]
-        targets = spec[1]
+        targets = spec[1] if len(spec) > 1 else ""
         module = self.__get_module_by_alias(module_alias)
         return module, targets
 
@@ -120,9 +274,18 @@ class TaskBuilder:
         if task.target == Target.BUILD:
             commands.extend(TaskBuilder.__build_commands(task.module, task.targets))
         elif task.target in [Target.TEST_UNIT, Target.TEST_INTEGRATION]:
-            commands.append(
-                TaskBuilder.__test_commands(task.target, task.module, task.targets)
+            command = TaskBuilder.__test_commands(
+                task.target, task.module, task.targets
             )
+            if not task.targets and self.options.impact_dir is not None:
+                command = self.__select_impacted(command, task.target, task.module)
+            if (
+                command.properties is None
+                and command.status is ExecutionStatus.PREPARED
+                and self.options.shards > 1
+            ):
+                self.__shard(command, task.target, task.module)
+            commands.append(command)
         elif task.target == Target.RESTART:
             commands.append(Command(self.app_cfg.commands.ootb.restart))
         elif task.target == Target.CUSTOM:
@@ -144,86 +307,583 @@ class TaskBuilder:
         commands = []
         if "s" in targets:
             if "c" in targets:
-                commands.append(
-                    Command(
-                        "ant clobber -f %s/%s/build.xml"
-                        % (module.location, const.SRC_ALIASES["s"])
-                    )
-                )
-            commands.append(
-                Command(
-                    "ant -f %s/%s/build.xml" % (module.location, const.SRC_ALIASES["s"])
-                )
-            )
+                commands.append(TaskBuilder.__ant_command(module, "s", "clobber"))
+            commands.append(TaskBuilder.__ant_command(module, "s"))
         if "t" in targets:
             if "c" in targets:
-                commands.append(
-                    Command(
-                        "ant clobber -f %s/%s/build.xml"
-                        % (module.location, const.SRC_ALIASES["t"])
-                    )
-                )
-            commands.append(
-                Command(
-                    "ant -f %s/%s/build.xml" % (module.location, const.SRC_ALIASES["t"])
-                )
-            )
+                commands.append(TaskBuilder.__ant_command(module, "t", "clobber"))
+            commands.append(TaskBuilder.__ant_command(module, "t"))
         if "w" in targets:
-            commands.append(
-                Command(
-                    "ant -f %s/%s/build.xml" % (module.location, const.SRC_ALIASES["w"])
-                )
-            )
+            commands.append(TaskBuilder.__ant_command(module, "w"))
         return commands
 
+    @staticmethod
+    def __ant_command(module: ModuleInfo, src_alias: str, ant_target: str = None):
+        src = const.SRC_ALIASES[src_alias]
+        command = "ant -f %s/%s/build.xml" % (module.location, src)
+        if ant_target is not None:
+            command = "ant %s -f %s/%s/build.xml" % (ant_target, module.location, src)
+        return Command(command, module=module, src=src, ant_target=ant_target)
+
     @staticmethod
     def __test_commands(test_type: Target, module: ModuleInfo, targets: str) -> Command:
+        test_includes = None
+        if targets:
+            test_includes = "**/%s" % targets
+        return TaskBuilder.__test_command(test_type, module, test_includes)
+
+    @staticmethod
+    def __test_command(
+        test_type: Target, module: ModuleInfo, test_includes: str = None
+    ) -> Command:
         test_cmd = "ant %s -f %s/%s/build.xml" % (
             test_type.replace("_", "."),
             module.location,
             const.SRC_ALIASES["t"],
         )
-        if targets:
-            test_cmd = test_cmd + " -Dtest.includes=**/%s" % targets
-        return Command(test_cmd)
+        properties = None
+        if test_includes:
+            properties = "-Dtest.includes=%s" % test_includes
+            test_cmd = test_cmd + " " + properties
+        return Command(
+            test_cmd,
+            module=module,
+            src=const.SRC_ALIASES["t"],
+            ant_target=test_type.replace("_", "."),
+            properties=properties,
+        )
+
+    def __select_impacted(
+        self, command: Command, test_type: Target, module: ModuleInfo
+    ) -> Command:
+        index = DependencyIndex(self.options.impact_dir, module.location)
+        selection = index.select(test_type.value)
+        if selection.tests is None:
+            print(f"Executing all {test_type.value} tests of {module_key(module)}")
+        elif not selection.tests:
+            print(f"No {test_type.value} tests of {module_key(module)} affected")
+            command.status = ExecutionStatus.UP_TO_DATE
+            command.time = 0
+        else:
+            command = TaskBuilder.__test_command(
+                test_type, module, includes(selection.tests)
+            )
+        command.selection = selection
+        return command
+
+    def __shard(self, command: Command, test_type: Target, module: ModuleInfo):
+        classes = discover_test_classes(
+            "%s/%s" % (module.location, const.SRC_ALIASES["t"])
+        )
+        if len(classes) < 2:
+            return
+        durations = {}
+        if self.options.history is not None:
+            durations = self.options.history.test_durations(module_key(module))
+        for shard_classes in partition(classes, self.options.shards, durations):
+            shard = TaskBuilder.__test_command(
+                test_type, module, includes(shard_classes)
+            )
+            shard.test_classes = shard_classes
+            command.shards.append(shard)
 
 
 class Executor:
-    def __init__(self, app_cfg: AppConfig, config: ModulesConfig):
+    def __init__(
+        self,
+        app_cfg: "AppConfig",
+        config: ModulesConfig,
+        options: ExecutionOptions = None,
+    ):
         self.tasks = []
         self.app_cfg = app_cfg
         self.config = config
+        self.options = options or ExecutionOptions()
+        self.runner = None
+        self.slots = None
+        self.resources = None
+        self.owners = {}
+        self.lanes = {}
 
     def run_tasks(self, tasks: list):
+        self.owners = {}
+        self.lanes = {}
         for task in tasks:
-            self.run_commands(task)
+            for command in task.commands:
+                for owned in [command] + command.shards:
+                    self.owners[owned] = task
+        start_time = time.time()
+        self.__emit_run(
+            "run_started",
+            jobs=self.options.jobs,
+            backend=self.options.backend,
+            commands=len(self.owners),
+        )
+        for command in self.owners:
+            self.__emit(command)
+        try:
+            if self.options.jobs > 1 or self.options.backend is not None:
+                self.__run_with_event_loop(tasks)
+            else:
+                for task in tasks:
+                    self.run_commands(task)
+        finally:
+            self.__record_history(tasks)
+            self.__emit_run(
+                "run_finished",
+                duration=time.time() - start_time,
+                statuses=count_statuses(command_records(tasks)),
+            )
+
+    def __emit(self, command: Command):
+        if self.options.events is None or command not in self.owners:
+            return
+        self.options.events.emit(
+            "command", **command_record(self.owners[command], command)
+        )
+
+    def __started(self, command: Command):
+        command.update_parts()
+        self.__emit(command)
+
+    def __emit_run(self, event: str, **fields):
+        if self.options.events is not None:
+            self.options.events.emit(event, **fields)
+
+    def __record_history(self, tasks: list):
+        if self.options.history is None:
+            return
+        entries = []
+        for task in tasks:
+            for command in task.commands:
+                if command.start_time is None or command.status not in [
+                    ExecutionStatus.COMPLETED,
+                    ExecutionStatus.FAILED,
+                ]:
+                    continue
+                history = self.options.history
+                for part, share in part_shares(history, task, command):
+                    module, target = command_key(task, part)
+                    entry = {
+                        "timestamp": command.start_time,
+                        "command": part.command,
+                        "module": module,
+                        "target": target,
+                        "duration": command.time * share,
+                        "status": command.status.value,
+                    }
+                    for field, value in (command.usage or {}).items():
+                        if value is not None and field != "max_rss":
+                            value = value * share
+                        entry[field] = value
+                    entries.append(entry)
+        self.options.history.record(entries)
+
+    def __run_with_event_loop(self, tasks: list):
+        self.runner = self.__create_runner()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.__run_graph(tasks))
+        finally:
+            self.runner.close()
+            loop.close()
+            asyncio.set_event_loop(None)
+
+    def __create_runner(self):
+        if self.options.backend == "subprocess":
+            return SubprocessRunner(self.options.jobs)
+        if self.options.backend == "daemon":
+            daemon = self.app_cfg.daemon
+            return DaemonRunner(
+                daemon.sockets if daemon else [],
+                AsyncRunner(self.options.log_dir),
+                resident_workers(daemon, self.options.daemon_dir),
+            )
+        if self.options.backend == "remote":
+            workers = self.app_cfg.workers
+            return RemoteRunner(
+                workers.addresses if workers else [],
+                workers.slots if workers else 1,
+                AsyncRunner(self.options.log_dir),
+                workers.token if workers else None,
+            )
+        return AsyncRunner(self.options.log_dir)
+
+    async def __run_graph(self, tasks: list):
+        """Runs ready tasks concurrently until all are done.
+
+        With fail_on_error the first failure cancels running commands and kills
+        their process groups, commands not started yet are skipped, otherwise tasks downstream of a failed task are
+        skipped and everything else keeps going.
+        """
+        graph = TaskGraph(tasks, self.app_cfg.dependencies, self.app_cfg.aliases)
+        self.__estimate(graph)
+        self.__hint_sequential(graph)
+        self.slots = asyncio.Semaphore(self.options.jobs)
+        if self.app_cfg.resources is not None:
+            self.resources = ResourcePool(self.app_cfg.resources.pools)
+        pending = list(tasks)
+        done = set()
+        running = {}
+        free_lanes = list(range(self.options.jobs, 0, -1))
+        error = None
+        while (pending and error is None) or running:
+            if error is None:
+                for task in graph.ready(pending, done):
+                    if len(running) >= self.options.jobs:
+                        break
+                    pending.remove(task)
+                    self.lanes[task] = free_lanes.pop()
+                    running[asyncio.ensure_future(self.__run_task(task))] = task
+            finished, _ = await asyncio.wait(
+                list(running), return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                task = running.pop(future)
+                done.add(task)
+                free_lanes.append(self.lanes[task])
+                free_lanes.sort(reverse=True)
+                if future.cancelled():
+                    continue
+                if future.exception() is not None and error is None:
+                    error = future.exception()
+                    await cancel_all(list(running))
+                elif is_failed(task):
+                    self.__skip_downstream(graph, task, pending, done)
+        if error is not None:
+            # commands not started before the failure never will be
+            for task in tasks:
+                for command in task.commands:
+                    if command.status is ExecutionStatus.PREPARED:
+                        skip_command(command)
+                        self.__emit(command)
+            raise error
+
+    def __skip_downstream(self, graph: TaskGraph, failed: Task, pending, done):
+        stack = graph.dependents(failed)
+        while stack:
+            task = stack.pop()
+            if task not in pending:
+                continue
+            pending.remove(task)
+            done.add(task)
+            for command in task.commands:
+                skip_command(command)
+                self.__emit(command)
+            print(f"Skipping {task} after failure of {failed}")
+            stack.extend(graph.dependents(task))
+
+    def __hint_sequential(self, graph: TaskGraph):
+        modules = {module_key(task.module) for task in graph.tasks if task.module}
+        if self.options.jobs > 1 and len(modules) > 1 and graph.is_sequential():
+            print(
+                f"Hint: -j {self.options.jobs} runs nothing concurrently, every "
+                "module depends on the modules before it in compile.includes. "
+                "List independent modules under dependencies in CFG to build "
+                "them in parallel."
+            )
+
+    def __estimate(self, graph: TaskGraph):
+        if self.options.history is None:
+            return
+        estimates = {}
+        for task in graph.tasks:
+            estimates[task] = 0
+            for command in task.commands:
+                estimates[task] += estimate_command(self.options.history, task, command)
+        if not any(estimates.values()):
+            return
+        graph.set_estimates(estimates)
+        print(
+            "Predicted wall time %.2fs (critical path %.2fs, sequential %.2fs)"
+            % (
+                graph.predict_wall_time(self.options.jobs),
+                graph.critical_path(),
+                sum(estimates.values()),
+            )
+        )
+
+    async def __run_task(self, task: Task):
+        start_time = time.time()
+        try:
+            for command in task.commands:
+                if is_failed(task):
+                    skip_command(command)
+                    self.__emit(command)
+                elif command.shards:
+                    await self.__run_shards(task, command)
+                else:
+                    await self.__run_command(task, command)
+        finally:
+            self.__trace_task(task, start_time)
+
+    async def __run_command(self, task: Task, command: Command):
+        loop = asyncio.get_event_loop()
+        fingerprint = await loop.run_in_executor(None, self.__prepare, command)
+        if command.status is not ExecutionStatus.RUNNING:
+            return
+        acquired = {}
+        start_time = time.time()
+        try:
+            if self.resources is not None:
+                cost = self.resources.admit(
+                    command_cost(self.app_cfg.resources.costs, task, command)
+                )
+                await self.resources.acquire(cost)
+                acquired = cost
+            async with self.slots:
+                start_time = time.time()
+                command.start_time = None
+                returncode = await self.runner.run(
+                    command, command_label(task, command), self.__started
+                )
+                start_time = command.start_time or start_time
+        except asyncio.CancelledError:
+            command.start_time = command.start_time or start_time
+            command.time = time.time() - command.start_time
+            command.status = ExecutionStatus.CANCELLED
+            command.update_parts()
+            self.__emit(command)
+            self.__trace_command(command)
+            raise
+        finally:
+            if acquired:
+                await self.resources.release(acquired)
+        try:
+            self.__finish(command, returncode, start_time, fingerprint)
+        finally:
+            self.__trace_command(command)
+        # hashing and copying outputs must not stall the other running commands
+        await loop.run_in_executor(None, self.__store_artifacts, command)
+
+    async def __run_shards(self, task: Task, command: Command):
+        start_time = time.time()
+        lane = self.lanes.get(task, 1)
+        for idx, shard in enumerate(command.shards):
+            self.lanes[shard] = lane * 100 + idx + 1
+        futures = [
+            asyncio.ensure_future(self.__run_command(task, shard))
+            for shard in command.shards
+        ]
+        try:
+            await asyncio.gather(*futures)
+        except (Exception, asyncio.CancelledError):
+            await cancel_all(futures)
+            raise
+        finally:
+            self.__complete_shards(command, start_time)
+            self.__trace_command(command)
+            if self.options.history is not None:
+                # shard logs can be large, they are read outside the event loop
+                durations = await asyncio.get_event_loop().run_in_executor(
+                    None, shard_durations, command
+                )
+                self.__record_test_durations(command, durations)
 
     def run_commands(self, task):
-        for command in task.commands:
-            self.run_command(command)
+        start_time = time.time()
+        try:
+            for command in task.commands:
+                self.run_command(command)
+        finally:
+            self.__trace_task(task, start_time)
 
     def run_command(self, command):
+        if command.shards:
+            start_time = time.time()
+            try:
+                for shard in command.shards:
+                    self.run_command(shard)
+            finally:
+                self.__complete_shards(command, start_time)
+                self.__trace_command(command)
+                if self.options.history is not None:
+                    self.__record_test_durations(command, shard_durations(command))
+            return
+        fingerprint = self.__prepare(command)
+        if command.status is not ExecutionStatus.RUNNING:
+            return
+        process = subprocess.Popen(command.command, shell=True)
+        start_command(command, process.pid, self.__started)
+        try:
+            self.__finish(
+                command,
+                wait_process(process, command),
+                command.start_time,
+                fingerprint,
+            )
+        finally:
+            self.__trace_command(command)
+        self.__store_artifacts(command)
+
+    def __trace_task(self, task: Task, start_time: float):
+        tracer = self.options.tracer
+        if tracer is None:
+            return
+        lane = self.lanes.get(task, 1)
+        tracer.name_lane(lane, "job %d" % lane)
+        name = " ".join(
+            part
+            for part in [
+                task.target.value,
+                module_key(task.module) if task.module else None,
+                task.targets,
+            ]
+            if part
+        )
+        tracer.span(name, "task", start_time, time.time(), lane)
+
+    def __trace_command(self, command: Command):
+        tracer = self.options.tracer
+        if tracer is None or command.start_time is None or command not in self.owners:
+            return
+        task = self.owners[command]
+        lane = self.lanes.get(command, self.lanes.get(task, 1))
+        if command in self.lanes:
+            tracer.name_lane(lane, "job %d shard %d" % (lane // 100, lane % 100))
+        record = command_record(task, command)
+        tracer.span(
+            record["label"],
+            "command",
+            command.start_time,
+            command.start_time + max(command.time, 0),
+            lane,
+            record,
+        )
+
+    def __prepare(self, command: Command):
         self.__print_header(command.command)
         if command.status is not ExecutionStatus.PREPARED:
-            return
+            return None
+        fingerprint = self.__check_fingerprint(command)
+        if command.status is ExecutionStatus.UP_TO_DATE:
+            command.time = 0
+            command.update_parts()
+            print(f"Command {command.command} is up to date, skipping")
+            self.__emit(command)
+            return None
+        if self.__restore_artifacts(command):
+            if fingerprint is not None:
+                self.options.fingerprints.update(command.fingerprint_key(), fingerprint)
+            command.status = ExecutionStatus.CACHED
+            command.time = 0
+            command.update_parts()
+            print(f"Command {command.command} outputs restored from artifact cache")
+            self.__emit(command)
+            return None
         command.status = ExecutionStatus.RUNNING
-        start_time = time.time()
-        completed_process = subprocess.run(command.command, shell=True)
+        return fingerprint
+
+    def __restore_artifacts(self, command: Command) -> bool:
+        outputs = self.__artifact_outputs(command)
+        if not outputs:
+            return False
+        builds = [part for part in command.parts or [command] if not part.ant_target]
+        command.artifact_key = self.options.artifacts.key(
+            command.module.location, command.src, builds[0].command, outputs
+        )
+        return self.options.artifacts.restore(
+            command.artifact_key, command.module.location
+        )
+
+    def __store_artifacts(self, command: Command):
+        if (
+            command.status is ExecutionStatus.COMPLETED
+            and command.artifact_key is not None
+        ):
+            self.options.artifacts.store(
+                command.artifact_key,
+                command.module.location,
+                self.__artifact_outputs(command),
+            )
+
+    def __artifact_outputs(self, command: Command) -> list:
+        if self.options.artifacts is None or command.fingerprint_key() is None:
+            return []
+        targets = [part.ant_target for part in command.parts or [command]]
+        if None not in targets or set(targets) - {None, "clobber"}:
+            return []
+        return module_outputs(
+            self.app_cfg.artifacts.outputs,
+            self.app_cfg.aliases,
+            module_key(command.module),
+            command.src,
+        )
+
+    def __finish(self, command: Command, returncode: int, start_time, fingerprint):
+        command.start_time = start_time
         command.time = time.time() - start_time
-        if completed_process.returncode != 0:
+        command.returncode = returncode
+        if returncode != 0:
             command.status = ExecutionStatus.FAILED
-            print(
-                f"Command {command.command} failed with code {completed_process.returncode}"
-            )
+            command.update_parts()
+            self.__emit(command)
+            print(f"Command {command.command} failed with code {returncode}")
             if self.app_cfg.fail_on_error:
                 raise ExecutorException(
-                    f"Command {command.command} failed with code {completed_process.returncode}"
+                    f"Command {command.command} failed with code {returncode}"
                 )
         else:
             command.status = ExecutionStatus.COMPLETED
+            if fingerprint is not None:
+                self.options.fingerprints.update(command.fingerprint_key(), fingerprint)
+            command.update_parts()
+            for part in command.parts or [command]:
+                if part.selection is not None:
+                    part.selection.commit()
+            self.__emit(command)
             print(f"Command {command.command} completed successfully")
         self.__print_footer()
 
+    def __complete_shards(self, command: Command, start_time):
+        command.start_time = start_time
+        command.time = time.time() - start_time
+        statuses = [shard.status for shard in command.shards]
+        if all(status is ExecutionStatus.COMPLETED for status in statuses):
+            command.status = ExecutionStatus.COMPLETED
+            if command.selection is not None:
+                command.selection.commit()
+        elif ExecutionStatus.FAILED in statuses:
+            command.status = ExecutionStatus.FAILED
+        else:
+            command.status = ExecutionStatus.CANCELLED
+        command.errors = [error for shard in command.shards for error in shard.errors][
+            :MAX_ERRORS
+        ]
+        self.__emit(command)
+        print(
+            f"Command {command.command} {command.status.value} "
+            f"in {len(command.shards)} shards"
+        )
+
+    def __record_test_durations(self, command: Command, durations: dict):
+        if self.options.history is not None:
+            self.options.history.record_test_durations(
+                module_key(command.module), durations
+            )
+
+    def __check_fingerprint(self, command: Command):
+        store = self.options.fingerprints
+        key = command.fingerprint_key()
+        if store is None or key is None:
+            return None
+        parts = command.parts or [command]
+        clobber = any(part.ant_target == "clobber" for part in parts)
+        if clobber:
+            store.invalidate(key)
+        builds = [part for part in parts if part.ant_target is None]
+        if not builds:
+            return None
+        fingerprint = store.compute(key, builds[0].command)
+        # other targets merged into the batch, e.g. tests, run on every call
+        others = {part.ant_target for part in parts} - {None, "clobber"}
+        if clobber or others or self.options.force:
+            return fingerprint
+        if store.is_up_to_date(key, fingerprint):
+            command.status = ExecutionStatus.UP_TO_DATE
+        return fingerprint
+
     @staticmethod
     def __print_header(command):
         print("-" * const.COMMAND_SIZE)
@@ -236,3 +896,131 @@ class Executor:
     def __print_footer():
         # print("-" * const.COMMAND_SIZE)
         pass
+
+
+def is_failed(task: Task) -> bool:
+    return any(
+        command.status in [ExecutionStatus.FAILED, ExecutionStatus.CANCELLED]
+        for command in task.commands
+    )
+
+
+def shard_durations(command: Command) -> dict:
+    """Durations of test classes of executed shards.
+
+    Read from the shard logs, classes of shards without junit output share
+    the shard time equally.
+    """
+    durations = {}
+    for shard in command.shards:
+        if shard.status not in [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED]:
+            continue
+        parsed = parse_test_durations(shard.log_path) if shard.log_path else {}
+        if not parsed and shard.test_classes:
+            share = shard.time / len(shard.test_classes)
+            parsed = {name: share for name in shard.test_classes}
+        durations.update(parsed)
+    return durations
+
+
+def skip_command(command: Command):
+    if command.status is not ExecutionStatus.PREPARED:
+        return
+    command.status = ExecutionStatus.SKIPPED
+    command.time = 0
+    command.update_parts()
+    for shard in command.shards:
+        skip_command(shard)
+
+
+async def cancel_all(futures: list):
+    for future in futures:
+        future.cancel()
+    await asyncio.gather(*futures, return_exceptions=True)
+
+
+def command_key(task: Task, command: Command) -> tuple:
+    if task.module is None:
+        target = ":".join(
+            str(part) for part in [task.target.value, task.targets] if part
+        )
+        return "", target
+    target = ":".join(part for part in [command.src, command.ant_target] if part)
+    return module_key(task.module), target
+
+
+def command_cost(costs: dict, task: Task, command: Command) -> dict:
+    """Resources needed by a command according to costs configured per target.
+
+    Custom commands are looked up by alias, merged commands need the maximum
+    of their parts for every resource.
+    """
+    if task.target == Target.CUSTOM:
+        return dict((costs.get(Target.CUSTOM.value) or {}).get(task.targets) or {})
+    if task.module is None:
+        return dict(costs.get(task.target.value) or {})
+    cost = {}
+    for part in command.parts or [command]:
+        target = Target.BUILD
+        for test_type in [Target.TEST_UNIT, Target.TEST_INTEGRATION]:
+            if part.ant_target == test_type.replace("_", "."):
+                target = test_type
+        for name, amount in (costs.get(target.value) or {}).items():
+            cost[name] = max(cost.get(name, 0), amount)
+    return cost
+
+
+def command_record(task: Task, command: Command) -> dict:
+    module, target = command_key(task, command)
+    usage = command.usage or {}
+    record = {
+        "command": command.command,
+        "label": command_label(task, command),
+        "module": module,
+        "target": target,
+        "status": command.status.value,
+        "start_time": command.start_time,
+        "duration": command.time if command.time >= 0 else None,
+        "returncode": command.returncode,
+        "pid": command.pid,
+        "errors": command.errors,
+    }
+    for field in USAGE_FIELDS:
+        record[field] = usage.get(field)
+    return record
+
+
+def command_records(tasks: list) -> list:
+    return [
+        command_record(task, part)
+        for task in tasks
+        for command in task.commands
+        for part in command.parts or [command]
+    ]
+
+
+def command_label(task: Task, command: Command) -> str:
+    return ":".join(part for part in command_key(task, command) if part)
+
+
+def estimate_command(history, task: Task, command: Command) -> float:
+    if command.status is not ExecutionStatus.PREPARED:
+        return 0
+    return sum(
+        history.estimate(*command_key(task, part)) or 0
+        for part in command.parts or [command]
+    )
+
+
+def part_shares(history, task: Task, command: Command) -> list:
+    """Parts of a command with their share of its duration and usage.
+
+    Merged commands are recorded per part to match unmerged runs, the parts
+    are weighted by their estimates when all of them have history.
+    """
+    parts = command.parts or [command]
+    estimates = [history.estimate(*command_key(task, part)) or 0 for part in parts]
+    if not all(estimates):
+        estimates = [1] * len(parts)
+    total = sum(estimates)
+    return [(part, estimate / total) for part, estimate in zip(parts, estimates)]
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class FingerprintStore:
+    """Fingerprints of module source directories recorded after successful builds.
+
+    A fingerprint covers relative path, mtime and size of every file in the
+    source directory (optionally its content) together with the command string.
+    """
+
+    def __init__(self, path: str, content_hash: bool = False):
+        self.path = path
+        self.content_hash = content_hash
+        self.lock = threading.Lock()
+        self.fingerprints = self.__load()
+
+    def compute(self, location: str, command: str) -> str:
+        digest = hashlib.sha1(command.encode())
+        for root, dirs, files in os.walk(location):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entry = "%s|%d|%d" % (
+                    os.path.relpath(path, location),
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                )
+                digest.update(entry.encode())
+                if self.content_hash:
+                    digest.update(self.__file_hash(path).encode())
+        return digest.hexdigest()
+
+    def is_up_to_date(self, key: str, fingerprint: str) -> bool:
+        with self.lock:
+            return self.fingerprints.get(key) == fingerprint
+
+    def contains(self, key: str) -> bool:
+        with self.lock:
+            return key in self.fingerprints
+
+    def update(self, key: str, fingerprint: str):
+        with self.lock:
+            self.fingerprints[key] = fingerprint
+            self.__save()
+
+    def invalidate(self, key: str):
+        with self.lock:
+            if self.fingerprints.pop(key, None) is not None:
+                self.__save()
+
+    def __load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # unique per writer, concurrent builds replace the file atomically
+        tmp_path = "%s.%d.%d.tmp" % (self.path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(self.fingerprints, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def __file_hash(path: str) -> str:
+        digest = hashlib.sha1()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            pass
+        return digest.hexdigest()
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import time
+
+from src.usage import USAGE_FIELDS
+
+BASELINE_WINDOW = 10
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_SECONDS = 5
+
+
+class CommandStats:
+    def __init__(self, **kwargs):
+        self.module = kwargs["module"]
+        self.target = kwargs["target"]
+        self.runs = kwargs["runs"]
+        self.failures = kwargs["failures"]
+        self.p50 = kwargs["p50"]
+        self.p95 = kwargs["p95"]
+        self.last = kwargs["last"]
+        self.baseline = kwargs["baseline"]
+        self.cpu = kwargs.get("cpu")
+        self.io = kwargs.get("io")
+
+    def is_regression(self) -> bool:
+        if self.baseline is None or self.last is None:
+            return False
+        return (
+            self.last > self.baseline * REGRESSION_RATIO
+            and self.last - self.baseline > REGRESSION_MIN_SECONDS
+        )
+
+
+class History:
+    """SQLite store of every executed command with its duration, status and usage."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id INTEGER PRIMARY KEY, timestamp REAL, command TEXT, module TEXT, "
+            "target TEXT, duration REAL, status TEXT)"
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        for field in USAGE_FIELDS:
+            if field not in columns:
+                self.connection.execute("ALTER TABLE runs ADD COLUMN %s REAL" % field)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS runs_command ON runs (module, target)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS test_classes ("
+            "id INTEGER PRIMARY KEY, timestamp REAL, module TEXT, class TEXT, "
+            "duration REAL)"
+        )
+
+    def record(self, entries: list):
+        columns = ["timestamp", "command", "module", "target", "duration", "status"]
+        columns += USAGE_FIELDS
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO runs (%s) VALUES (%s)"
+                % (", ".join(columns), ", ".join("?" * len(columns))),
+                [
+                    [entry.get("timestamp", time.time())]
+                    + [entry.get(column) for column in columns[1:]]
+                    for entry in entries
+                ],
+            )
+
+    def durations(self, module: str, target: str, limit: int = BASELINE_WINDOW):
+        rows = self.connection.execute(
+            "SELECT duration FROM runs WHERE module = ? AND target = ? "
+            "AND status = 'COMPLETED' ORDER BY id DESC LIMIT ?",
+            (module, target, limit),
+        )
+        return [row[0] for row in rows]
+
+    def estimate(self, module: str, target: str):
+        return percentile(self.durations(module, target), 50)
+
+    def record_test_durations(self, module: str, durations: dict):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO test_classes (timestamp, module, class, duration) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (time.time(), module, name, value)
+                    for name, value in durations.items()
+                ],
+            )
+
+    def test_durations(self, module: str) -> dict:
+        rows = self.connection.execute(
+            "SELECT class, duration FROM test_classes WHERE module = ? ORDER BY id",
+            (module,),
+        )
+        return {name: duration for name, duration in rows}
+
+    def stats(self) -> list:
+        grouped = {}
+        rows = self.connection.execute(
+            "SELECT module, target, duration, status, user_time + system_time, "
+            "read_bytes + write_bytes FROM runs ORDER BY id"
+        )
+        for module, target, duration, status, cpu_time, io in rows:
+            grouped.setdefault((module, target), []).append(
+                (duration, status, cpu_time, io)
+            )
+        result = []
+        for (module, target), runs in sorted(grouped.items()):
+            completed = [run for run in runs if run[1] == "COMPLETED"]
+            durations = [run[0] for run in completed]
+            previous = durations[-BASELINE_WINDOW - 1 : -1]
+            result.append(
+                CommandStats(
+                    module=module,
+                    target=target,
+                    runs=len(runs),
+                    failures=len(runs) - len(durations),
+                    p50=percentile(durations, 50),
+                    p95=percentile(durations, 95),
+                    last=durations[-1] if durations else None,
+                    baseline=percentile(previous, 50),
+                    cpu=percentile(
+                        [
+                            cpu_time / duration
+                            for duration, _, cpu_time, _ in completed
+                            if cpu_time is not None and duration > 0
+                        ],
+                        50,
+                    ),
+                    io=percentile(
+                        [io for _, _, _, io in completed if io is not None], 50
+                    ),
+                )
+            )
+        return result
+
+    def close(self):
+        self.connection.close()
+
+
+def percentile(values: list, rank: int):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[index]
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+
+import src.constants as const
+from src.sharding import TEST_CLASS_SUFFIX
+
+package_pattern = re.compile("^\\s*package\\s+([\\w.]+)\\s*;", re.MULTILINE)
+import_pattern = re.compile(
+    "^\\s*import\\s+(static\\s+)?([\\w.]+(?:\\.\\*)?)\\s*;", re.MULTILINE
+)
+
+
+class Selection:
+    """Test classes impacted by changes since the last successful run.
+
+    tests is None when the whole suite has to be executed.
+    """
+
+    def __init__(self, index, test_type: str, tests, snapshot: dict):
+        self.index = index
+        self.test_type = test_type
+        self.tests = tests
+        self.snapshot = snapshot
+
+    def commit(self):
+        self.index.save_baseline(self.test_type, self.snapshot)
+
+
+class DependencyIndex:
+    """Class level dependency index of module src and src_test java sources.
+
+    Dependencies are read from import statements, classes of the same package
+    are considered dependent on each other. Sources are parsed again only when
+    their mtime or size changed.
+    """
+
+    def __init__(self, cache_dir: str, location: str):
+        self.location = location
+        self.path = os.path.join(
+            cache_dir, hashlib.sha1(location.encode()).hexdigest() + ".json"
+        )
+        self.data = self.__load()
+
+    def select(self, test_type: str) -> Selection:
+        removed = self.refresh()
+        snapshot = {rel: entry[:2] for rel, entry in self.data["files"].items()}
+        baseline = self.data["baselines"].get(test_type)
+        if baseline is None:
+            return Selection(self, test_type, None, snapshot)
+        changed = [
+            rel
+            for rel in set(snapshot) | set(baseline)
+            if snapshot.get(rel) != baseline.get(rel)
+        ]
+        if any(not rel.endswith(".java") for rel in changed):
+            return Selection(self, test_type, None, snapshot)
+        changed_classes = set(removed)
+        for rel in changed:
+            if rel in self.data["files"]:
+                changed_classes.add(self.data["files"][rel][2])
+        impacted = self.__impacted(changed_classes)
+        tests = sorted(
+            {
+                entry[2].split(".")[-1]
+                for rel, entry in self.data["files"].items()
+                if rel.startswith(const.SRC_TEST + "/")
+                and rel.endswith(TEST_CLASS_SUFFIX)
+                and entry[2] in impacted
+            }
+        )
+        return Selection(self, test_type, tests, snapshot)
+
+    def refresh(self) -> list:
+        files = {}
+        removed = []
+        previous = self.data["files"]
+        for src in [const.SRC, const.SRC_TEST]:
+            src_dir = os.path.join(self.location, src)
+            for root, dirs, names in os.walk(src_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    rel = os.path.relpath(path, self.location).replace(os.sep, "/")
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    key = [stat.st_mtime_ns, stat.st_size]
+                    entry = previous.get(rel)
+                    if entry is None or entry[:2] != key:
+                        entry = key + self.__parse(path, rel)
+                    files[rel] = entry
+        for rel, entry in previous.items():
+            if rel not in files and entry[2] is not None:
+                removed.append(entry[2])
+        self.data["files"] = files
+        self.__save()
+        return removed
+
+    def save_baseline(self, test_type: str, snapshot: dict):
+        self.data["baselines"][test_type] = snapshot
+        self.__save()
+
+    def __impacted(self, changed_classes: set) -> set:
+        dependents = {}
+        packages = {}
+        for entry in self.data["files"].values():
+            if entry[2] is not None:
+                packages.setdefault(entry[2].rpartition(".")[0], set()).add(entry[2])
+        for entry in self.data["files"].values():
+            name = entry[2]
+            if name is None:
+                continue
+            dependencies = set(packages.get(name.rpartition(".")[0], []))
+            for imported in entry[3]:
+                if imported.endswith(".*"):
+                    dependencies |= packages.get(imported[:-2], set())
+                    dependencies.add(imported[:-2])
+                else:
+                    dependencies.add(imported)
+            for dependency in dependencies:
+                dependents.setdefault(dependency, set()).add(name)
+        impacted = set()
+        stack = list(changed_classes)
+        while stack:
+            name = stack.pop()
+            if name in impacted:
+                continue
+            impacted.add(name)
+            stack.extend(dependents.get(name, []))
+        return impacted
+
+    @staticmethod
+    def __parse(path: str, rel: str) -> list:
+        if not rel.endswith(".java"):
+            return [None, []]
+        try:
+            with open(path, errors="replace") as f:
+                source = f.read()
+        except OSError:
+            return [None, []]
+        match = package_pattern.search(source)
+        class_name = os.path.basename(rel)[: -len(".java")]
+        if match:
+            class_name = match.group(1) + "." + class_name
+        imports = []
+        for static, imported in import_pattern.findall(source):
+            if static:
+                imported = imported.rpartition(".")[0]
+            imports.append(imported)
+        return [class_name, imports]
+
+    def __load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"files": {}, "baselines": {}}
+
+    def __save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
@@ -1,50 +1,370 @@
 import argparse
+import importlib
 import os
 import sys
+import time
 import traceback
 from pathlib import Path
-
-import yaml
+from typing import TYPE_CHECKING
 
 import constants as const
+import src.config_cache as config_cache
 from example_cfg import CFG_FILE_CONTENT
-from executor import Executor, TaskBuilder
-from module import ModulesConfigBuilder
-from src.config import AppConfig
+from src.client import forward
+from src.tracing import Tracer
+
+# Modules pulling in pydantic, yaml, asyncio, sqlite3 or ElementTree are
+# imported where they are used, so forwarding to a build server and
+# module-agnostic targets start without loading them.
+if TYPE_CHECKING:
+    from src.config import AppConfig
+    from src.history import History
 
 
 def main():
-    app_cfg = init_app_cfg()
-    arguments = parse_args()
+    if is_forwarded(sys.argv[1:]):
+        returncode = forward(server_socket_path(), sys.argv[1:])
+        if returncode is not None:
+            sys.exit(returncode)
+    tracer = Tracer()
+    with tracer.phase("load config"):
+        app_cfg = init_app_cfg()
+        arguments = parse_args()
+    if arguments["serve"]:
+        serve()
+        return
+    invoke(app_cfg, arguments, tracer)
+
+
+def invoke(app_cfg: "AppConfig", arguments: dict, tracer: Tracer, config=None):
+    from src.history import History
+
+    history = History("%s/history.db" % app_cfg_dir())
+    if arguments["stats"]:
+        print_stats(history)
+        return
+
+    try:
+        run(app_cfg, arguments, history, tracer, config)
+    finally:
+        if arguments["trace"]:
+            tracer.write(arguments["trace"])
+
+
+def serve():
+    from module import ModulesConfigBuilder
+    from src.server import BuildServer, WarmState
+
+    # imported once here, forked requests inherit them
+    for name in ("src.executor", "src.history", "src.planner"):
+        importlib.import_module(name)
+
+    state = WarmState(
+        cfg_file_path(),
+        init_app_cfg,
+        lambda app_cfg: ModulesConfigBuilder(app_cfg, modules_cache_path()),
+    )
+
+    def handle(argv: list):
+        tracer = Tracer()
+        with tracer.phase("load config"):
+            arguments = parse_args()
+        invoke(state.app_cfg, arguments, tracer, state.config)
+
+    BuildServer(server_socket_path(), state, handle).serve()
+
+
+def is_forwarded(argv: list) -> bool:
+    # fd:N targets refer to descriptors of this process, the server gets only 0-2
+    return not (
+        "--serve" in argv
+        or "--no-server" in argv
+        or any(arg.startswith("fd:") for arg in argv)
+    )
+
+
+def run(
+    app_cfg: "AppConfig",
+    arguments: dict,
+    history: "History",
+    tracer: Tracer,
+    config=None,
+):
+    from module import ModulesConfig, ModulesConfigBuilder
+    from src.events import EventLog, run_report, write_report
+    from src.executor import (
+        ExecutionOptions,
+        ExecutorException,
+        TaskBuilder,
+        command_records,
+    )
+    from src.planner import Planner, export_plan, print_plan
+
+    if config is None and not requires_modules(arguments):
+        config = ModulesConfig({})
+    if config is None:
+        with tracer.phase("build modules config"):
+            config = ModulesConfigBuilder(app_cfg, modules_cache_path()).build()
+
+    planning = arguments["plan"] or arguments["plan_json"]
+    events = EventLog(arguments["events"]) if arguments["events"] else None
+    options = ExecutionOptions(
+        jobs=arguments["jobs"],
+        fingerprints=init_fingerprints(app_cfg),
+        force=arguments["force"],
+        backend=arguments["backend"],
+        log_dir="%s/logs/%s" % (app_cfg_dir(), time.strftime("%Y%m%d-%H%M%S")),
+        history=history,
+        shards=1 if planning else arguments["shards"],
+        impact_dir=(
+            "%s/impact" % app_cfg_dir()
+            if arguments["affected"] and not planning
+            else None
+        ),
+        events=events,
+        tracer=tracer,
+        artifacts=init_artifacts(app_cfg),
+        daemon_dir="%s/daemon" % app_cfg_dir(),
+    )
+    with tracer.phase("build tasks"):
+        task_builder = TaskBuilder(app_cfg, config, options)
+        tasks = task_builder.build_tasks(arguments)
+        if app_cfg.batching is not None and app_cfg.batching.enabled:
+            task_builder.coalesce_commands(tasks)
+    if planning:
+        plan = Planner(app_cfg, options).plan(tasks)
+        if arguments["plan_json"]:
+            export_plan(plan, arguments["plan_json"])
+        else:
+            print_plan(plan)
+        return
+    start_time = time.time()
+    try:
+        try:
+            execute(app_cfg, config, options, tasks, tracer)
+            print_summary(tasks)
+        except ExecutorException as e:
+            if not arguments["watch"]:
+                raise
+            print("Application finished with error %s" % e.message)
+        finally:
+            print_failures(tasks)
+            if arguments["report"]:
+                report = run_report(command_records(tasks), start_time, time.time())
+                write_report(report, arguments["report"])
+        if arguments["watch"]:
+            watch(app_cfg, config, options, tasks, task_builder, tracer)
+    finally:
+        if events is not None:
+            events.close()
+
+
+def requires_modules(arguments: dict) -> bool:
+    return any(arguments[target] for target in const.Target.module_dependent())
 
-    config = ModulesConfigBuilder(app_cfg).build()
 
-    tasks = TaskBuilder(app_cfg, config).build_tasks(arguments)
-    Executor(app_cfg, config).run_tasks(tasks)
+def execute(app_cfg: "AppConfig", config, options, tasks, tracer):
+    from src.executor import Executor
 
+    with tracer.phase("execute"):
+        Executor(app_cfg, config, options).run_tasks(tasks)
+
+
+def print_summary(tasks: list):
     print("-" * const.COMMAND_SIZE + "\n")
     print("Application finished successfully\n")
     for task in tasks:
         for command in task.commands:
-            print(f"{command.status} in {command.time:.2f}s - {command.command}")
+            for part in command.parts or [command]:
+                print(
+                    f"{part.status} in {part.time:.2f}s{format_usage(part.usage)}"
+                    f" - {part.command}"
+                )
+
+
+def print_failures(tasks: list):
+    """Prints compiler errors and last output lines of failed captured commands."""
+    from src.executor import ExecutionStatus
+
+    for task in tasks:
+        for command in task.commands:
+            for part in command.shards or [command]:
+                if part.status is not ExecutionStatus.FAILED or not part.tail:
+                    continue
+                print("-" * const.COMMAND_SIZE)
+                print(
+                    "Command %s failed%s"
+                    % (
+                        part.command,
+                        ", log %s" % part.log_path if part.log_path else "",
+                    )
+                )
+                if part.errors:
+                    print("Compiler errors:")
+                    for error in part.errors:
+                        location = (
+                            "%s:%s: " % (error["file"], error["line"])
+                            if error["file"]
+                            else ""
+                        )
+                        print("    %s%s" % (location, error["message"]))
+                print("Last %d lines of output:" % len(part.tail))
+                for line in part.tail:
+                    print("    " + line)
 
 
-def init_app_cfg() -> AppConfig:
-    app_cfg_dir = "%s/.wc_builder" % str(Path.home())
-    cfg_path = "%s/cfg.yml" % app_cfg_dir
+def watch(app_cfg: "AppConfig", config, options, tasks, task_builder, tracer):
+    from src.executor import ExecutorException
+    from src.watch import WatchSession, create_watcher
 
+    def rebuild(affected: list):
+        if app_cfg.batching is not None and app_cfg.batching.enabled:
+            task_builder.coalesce_commands(affected)
+        try:
+            execute(app_cfg, config, options, affected, tracer)
+            print_summary(affected)
+        except ExecutorException as e:
+            print("Application finished with error %s" % e.message)
+        finally:
+            print_failures(affected)
+
+    session = WatchSession(tasks, task_builder, rebuild)
+    watcher = create_watcher(session.directories())
     try:
-        stream = open(cfg_path)
-    except OSError:
+        session.watch(watcher)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+
+
+def print_stats(history: "History"):
+    header = "%-32s %-28s %5s %5s %9s %9s %9s %6s %9s" % (
+        "MODULE",
+        "TARGET",
+        "RUNS",
+        "FAILS",
+        "P50",
+        "P95",
+        "LAST",
+        "CPU",
+        "IO",
+    )
+    print(header)
+    print("-" * len(header))
+    for stats in history.stats():
+        print(
+            "%-32s %-28s %5d %5d %9s %9s %9s %6s %9s%s"
+            % (
+                stats.module or "-",
+                stats.target,
+                stats.runs,
+                stats.failures,
+                format_seconds(stats.p50),
+                format_seconds(stats.p95),
+                format_seconds(stats.last),
+                "-" if stats.cpu is None else "%.2fx" % stats.cpu,
+                format_bytes(stats.io),
+                (
+                    " SLOWER than baseline %s" % format_seconds(stats.baseline)
+                    if stats.is_regression()
+                    else ""
+                ),
+            )
+        )
+
+
+def format_seconds(value) -> str:
+    return "-" if value is None else "%.2fs" % value
+
+
+def format_bytes(value) -> str:
+    return "-" if value is None else "%.1fMB" % (value / 1024 / 1024)
+
+
+def format_usage(usage) -> str:
+    if not usage:
+        return ""
+    return " (cpu %.2fs user %.2fs sys, rss %s, io %s read %s written)" % (
+        usage["user_time"],
+        usage["system_time"],
+        format_bytes((usage.get("tree_rss") or usage["max_rss"]) * 1024),
+        format_bytes(usage["read_bytes"]),
+        format_bytes(usage["write_bytes"]),
+    )
+
+
+def init_fingerprints(app_cfg: "AppConfig"):
+    from src.fingerprint import FingerprintStore
+
+    if app_cfg.incremental is None or not app_cfg.incremental.enabled:
+        return None
+    return FingerprintStore(
+        "%s/fingerprints.json" % app_cfg_dir(), app_cfg.incremental.content_hash
+    )
+
+
+def init_artifacts(app_cfg: "AppConfig"):
+    from src.artifacts import LINK_MODES, ArtifactCache
+
+    artifacts = app_cfg.artifacts
+    if artifacts is None or not artifacts.enabled:
+        return None
+    if artifacts.link not in LINK_MODES:
+        raise ValueError(
+            "Unknown artifacts link mode %s, expected one of %s"
+            % (artifacts.link, ", ".join(LINK_MODES))
+        )
+    return ArtifactCache(
+        artifacts.path, int(artifacts.max_size_gb * 1024**3), artifacts.link
+    )
+
+
+def app_cfg_dir() -> str:
+    return "%s/.wc_builder" % str(Path.home())
+
+
+def cfg_file_path() -> str:
+    return "%s/cfg.yml" % app_cfg_dir()
+
+
+def modules_cache_path() -> str:
+    return "%s/modules_cache.json" % app_cfg_dir()
+
+
+def server_socket_path() -> str:
+    return "%s/server.sock" % app_cfg_dir()
+
+
+def cfg_cache_path() -> str:
+    return "%s/cfg_cache.json" % app_cfg_dir()
+
+
+def init_app_cfg() -> "AppConfig":
+    """Validated config, restored from cache while cfg.yml is unchanged."""
+    cfg_dir = app_cfg_dir()
+    cfg_path = cfg_file_path()
+
+    if not os.path.exists(cfg_path):
         print("Config does not exists : " + cfg_path)
-        os.makedirs(app_cfg_dir, exist_ok=True)
-        print("Created config directory : " + app_cfg_dir)
+        os.makedirs(cfg_dir, exist_ok=True)
+        print("Created config directory : " + cfg_dir)
         with open(cfg_path, "a") as stream:
             stream.write(CFG_FILE_CONTENT)
-        stream = open(cfg_path)
 
-    app_cfg = yaml.safe_load(stream)
-    return AppConfig(**app_cfg)
+    key = config_cache.cache_key(cfg_path)
+    app_cfg = config_cache.load(cfg_cache_path(), key)
+    if app_cfg is not None:
+        return app_cfg
+
+    import yaml
+
+    from src.config import AppConfig
+
+    with open(cfg_path) as stream:
+        app_cfg = AppConfig(**yaml.safe_load(stream))
+    config_cache.store(cfg_cache_path(), key, app_cfg)
+    return app_cfg
 
 
 def parse_args() -> dict:
@@ -77,6 +397,84 @@ def parse_args() -> dict:
         action="store_true",
         help="Restarts MethodServer (configure cmd in CFG)",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of independent module tasks executed concurrently",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split tests of a module into N shards by test class, executed "
+        "concurrently with -j",
+    )
+    parser.add_argument(
+        "--affected",
+        action="store_true",
+        help="Execute only tests affected by sources changed since the last "
+        "successful test run of the module",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print tasks, dependencies and estimated durations without executing",
+    )
+    parser.add_argument(
+        "--plan-json",
+        metavar="FILE",
+        help="Export the plan as JSON to FILE (- for stdout) without executing",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Execute build commands even when sources are up to date",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print p50/p95 durations of commands from history and flag regressions",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["async", "subprocess", "daemon", "remote"],
+        help="Command runner. async prefixes output and writes per command logs, "
+        "default for -j > 1. daemon runs ant commands in resident ant JVMs, "
+        "remote sends module commands to build workers configured in CFG",
+    )
+
+    parser.add_argument(
+        "--events",
+        metavar="TARGET",
+        help="Write command lifecycle events as JSON lines to a file or fd:N",
+    )
+    parser.add_argument(
+        "--report", metavar="FILE", help="Write JSON report of the run to FILE"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and execute commands of module src directories again "
+        "when their files change",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Start a resident build server keeping config and modules loaded, "
+        "later invocations are executed by it",
+    )
+    parser.add_argument(
+        "--no-server",
+        action="store_true",
+        help="Execute in this process even when a build server is running",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write Chrome trace of the run to FILE, viewable in Perfetto",
+    )
 
     if len(sys.argv) == 1:
         parser.print_help()
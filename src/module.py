@@ -1,9 +1,13 @@
+import json
 import os
 import re
-import xml.etree.ElementTree as Et
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
 
 import src.constants as const
-from src.config import AppConfig
+
+if TYPE_CHECKING:
+    from src.config import AppConfig
 
 
 class ModuleInfo:
@@ -33,55 +37,186 @@ class ModulesConfig:
         self.modules: dict = modules
 
 
+class LazyModules(Mapping):
+    """Read-only mapping of module name to ModuleInfo resolved on first access."""
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.resolved = {}
+
+    def __getitem__(self, name: str) -> ModuleInfo:
+        module = self.resolved.get(name)
+        if module is None:
+            module = self.builder.resolve(name)
+            if module is None:
+                raise KeyError(name)
+            self.resolved[name] = module
+        return module
+
+    def __iter__(self):
+        return iter(self.builder.module_names())
+
+    def __len__(self) -> int:
+        return len(self.builder.module_names())
+
+
 class ModulesConfigBuilder:
     order_pattern = re.compile("^#? ?(\\w+)/(\\w+)\n?")
 
-    def __init__(self, app_cfg: AppConfig):
+    def __init__(self, app_cfg: "AppConfig", cache_path: str = None):
         self.app_cfg = app_cfg
+        self.cache_path = cache_path
+        self.cache = None
+        self.registry_stream = None
+        self.order_stream = None
+        self.dirty = False
 
     def build(self) -> ModulesConfig:
-        modules = self.__create_modules_by_registry()
-        self.__set_build_order(modules)
-        self.__set_srcs(modules)
-        return modules
+        self.cache = self.__load_cache(self.__cache_key())
+        self.registry_stream = self.__stream_registry()
+        self.order_stream = self.__stream_build_order()
+        return ModulesConfig(LazyModules(self))
+
+    def resolve(self, name: str):
+        entry = self.__lookup(
+            self.cache["registry"], "registry_complete", self.registry_stream, name
+        )
+        if entry is None:
+            self.__save_cache()
+            return None
+        order = self.__lookup(
+            self.cache["orders"], "orders_complete", self.order_stream, name
+        )
+        module = ModuleInfo(
+            name=entry["name"],
+            location=entry["location"],
+            order=order,
+            srcs=self.__get_srcs(name, entry["location"]),
+        )
+        self.__save_cache()
+        return module
+
+    def module_names(self) -> list:
+        self.__lookup(
+            self.cache["registry"], "registry_complete", self.registry_stream, None
+        )
+        self.__save_cache()
+        return list(self.cache["registry"])
+
+    def preload(self):
+        """Reads the whole registry and build order and scans srcs of all modules."""
+        names = self.module_names()
+        self.__lookup(self.cache["orders"], "orders_complete", self.order_stream, None)
+        for name in names:
+            self.__get_srcs(name, self.cache["registry"][name]["location"])
+        self.__save_cache()
+
+    def is_stale(self) -> bool:
+        """True when the registry or build order changed since build."""
+        try:
+            return self.cache is None or self.cache["key"] != self.__cache_key()
+        except OSError:
+            return True
 
-    def __set_build_order(self, modules: ModulesConfig):
+    def __lookup(self, entries: dict, complete_flag: str, stream, name):
+        if name in entries:
+            return entries[name]
+        if not self.cache[complete_flag]:
+            self.dirty = True
+            for key, value in stream:
+                entries[key] = value
+                if key == name:
+                    return value
+            self.cache[complete_flag] = True
+        return entries.get(name)
+
+    def __stream_registry(self):
+        import xml.etree.ElementTree as Et
+
+        module_registry_path = self.app_cfg.input.module_registry
+        for event, element in Et.iterparse(module_registry_path):
+            if element.tag == "Module":
+                abs_location = "%s/%s" % (self.app_cfg.root, element.attrib["location"])
+                yield element.attrib["name"].split("/")[1], {
+                    "name": element.attrib["name"],
+                    "location": abs_location,
+                }
+                element.clear()
+
+    def __stream_build_order(self):
         idx = 0
         order_path = self.app_cfg.input.build_order
         with open(order_path) as f:
-            for line_number, line in enumerate(f, 1):
+            for line in f:
                 if self.order_pattern.fullmatch(line):
                     sanitized_string = line.replace("#", "").strip().split("/")[1]
                     idx += 1
-                    module = modules.modules.get(sanitized_string)
-                    if module is not None:
-                        module.order = idx
+                    yield sanitized_string, idx
 
-    def __create_modules_by_registry(self) -> ModulesConfig:
-        module_registry_path = self.app_cfg.input.module_registry
-        tree = Et.parse(module_registry_path)
-        root = tree.getroot()
-        modules = root.findall(".//Module")
-        result = {}
-        for module in modules:
-            abs_location = "%s/%s" % (self.app_cfg.root, module.attrib["location"])
-            result[module.attrib["name"].split("/")[1]] = ModuleInfo(
-                name=module.attrib["name"], location=abs_location
-            )
-        return ModulesConfig(result)
-
-    def __set_srcs(self, modules: ModulesConfig):
+    def __get_srcs(self, name: str, location: str) -> list:
         if self.app_cfg.profile == "test":
-            for name, module in modules.modules.items():
-                module.srcs = list(const.SRC_ALIASES.values())
-        else:
-            for name, module in modules.modules.items():
-                try:
-                    module.srcs = [
-                        f.name
-                        for f in os.scandir(module.location)
-                        if f.is_dir() and "src" in f.name
-                    ]
-                except FileNotFoundError:
-                    pass
-        pass
+            return list(const.SRC_ALIASES.values())
+        mtime = self.__location_mtime(location)
+        cached = self.cache["srcs"].get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        srcs = self.__scan_srcs(location)
+        self.cache["srcs"][name] = [mtime, srcs]
+        self.dirty = True
+        return srcs
+
+    def __cache_key(self) -> dict:
+        key = {"root": self.app_cfg.root, "profile": self.app_cfg.profile}
+        for name, path in [
+            ("build_order", self.app_cfg.input.build_order),
+            ("module_registry", self.app_cfg.input.module_registry),
+        ]:
+            stat = os.stat(path)
+            key[name] = [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+        return key
+
+    def __load_cache(self, cache_key: dict) -> dict:
+        empty = {
+            "key": cache_key,
+            "registry": {},
+            "registry_complete": False,
+            "orders": {},
+            "orders_complete": False,
+            "srcs": {},
+        }
+        if self.cache_path is None:
+            return empty
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        if cache.get("key") != cache_key:
+            return empty
+        return cache
+
+    def __save_cache(self):
+        if self.cache_path is None or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = "%s.%d.tmp" % (self.cache_path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(self.cache, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+    @staticmethod
+    def __scan_srcs(location: str) -> list:
+        try:
+            return [
+                f.name for f in os.scandir(location) if f.is_dir() and "src" in f.name
+            ]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def __location_mtime(location: str):
+        try:
+            return os.stat(location).st_mtime_ns
+        except OSError:
+            return None
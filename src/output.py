@@ -0,0 +1,63 @@
+import collections
+import gzip
+import re
+
+TAIL_LINES = 50
+MAX_ERRORS = 100
+# ant output compresses well already at the fastest level
+COMPRESS_LEVEL = 1
+
+compiler_error_pattern = re.compile(
+    "^\\s*(?:\\[\\w+\\]\\s+)?(?:(?P<file>\\S+\\.java):(?P<line>\\d+): )?"
+    "error: (?P<message>.+)$"
+)
+
+
+class OutputCapture:
+    """Processes output lines of a command with memory bounded by its limits.
+
+    Lines are written to a gzip compressed log when log_path is given, the
+    last tail_lines lines and up to MAX_ERRORS compiler errors (javac
+    "File.java:12: error: ..." lines) are kept and stored in the command on
+    close.
+    """
+
+    def __init__(self, command, log_path: str = None, tail_lines: int = TAIL_LINES):
+        self.command = command
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.errors = []
+        self.log = None
+        if log_path is not None:
+            self.log = gzip.open(log_path, "wt", compresslevel=COMPRESS_LEVEL)
+            self.log.write(command.command + "\n")
+            command.log_path = log_path
+
+    def write_lines(self, lines: list):
+        self.tail.extend(lines)
+        if self.log is not None:
+            self.log.write("".join(line + "\n" for line in lines))
+        for line in lines:
+            if len(self.errors) < MAX_ERRORS and "error: " in line:
+                match = compiler_error_pattern.match(line)
+                if match:
+                    number = match.group("line")
+                    self.errors.append(
+                        {
+                            "file": match.group("file"),
+                            "line": int(number) if number else None,
+                            "message": match.group("message"),
+                        }
+                    )
+
+    def close(self):
+        self.command.tail = list(self.tail)
+        self.command.errors = self.errors
+        if self.log is not None:
+            self.log.close()
+
+
+def open_log(path: str):
+    """Opens a command log for reading as text, compressed or not."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="replace")
+    return open(path, errors="replace")
@@ -0,0 +1,145 @@
+import json
+from typing import TYPE_CHECKING
+
+import src.constants as const
+from src.executor import (
+    ExecutionOptions,
+    ExecutionStatus,
+    command_label,
+    estimate_command,
+)
+from src.scheduler import TaskGraph, module_key
+
+if TYPE_CHECKING:
+    from src.config import AppConfig
+
+
+class Planner:
+    """Resolves the execution plan of tasks without executing anything.
+
+    Only cached metadata is used: durations from history and recorded source
+    fingerprints. Build steps with a recorded fingerprint and no clobber are
+    reported as skippable, sources are not scanned to confirm it.
+    """
+
+    def __init__(self, app_cfg: "AppConfig", options: ExecutionOptions):
+        self.app_cfg = app_cfg
+        self.options = options
+        self.clobbered = set()
+
+    def plan(self, tasks: list) -> dict:
+        graph = TaskGraph(tasks, self.app_cfg.dependencies, self.app_cfg.aliases)
+        self.clobbered = {
+            command.fingerprint_key()
+            for task in tasks
+            for command in task.commands
+            for part in command.parts or [command]
+            if part.ant_target == "clobber"
+        }
+        estimates = {}
+        steps = {}
+        for task in tasks:
+            steps[task] = [self.__step(task, command) for command in task.commands]
+            estimates[task] = sum(step["estimate"] for step in steps[task])
+        graph.set_estimates(estimates)
+        ids = {task: idx for idx, task in enumerate(tasks)}
+        return {
+            "jobs": self.options.jobs,
+            "predicted_wall_time": graph.predict_wall_time(self.options.jobs),
+            "critical_path": graph.critical_path(),
+            "sequential_time": sum(estimates.values()),
+            "tasks": [
+                {
+                    "id": ids[task],
+                    "target": task.target.value,
+                    "module": module_key(task.module) if task.module else None,
+                    "targets": task.targets,
+                    "depends_on": sorted(ids[other] for other in graph.edges[task]),
+                    "estimate": estimates[task],
+                    "critical_path": graph.paths[task],
+                    "commands": steps[task],
+                }
+                for task in graph.topological_order
+            ],
+        }
+
+    def __step(self, task, command) -> dict:
+        estimate = 0
+        if self.options.history is not None:
+            estimate = estimate_command(self.options.history, task, command)
+        return {
+            "command": command.command,
+            "label": command_label(task, command),
+            "status": command.status.value,
+            "may_skip": self.__may_skip(command),
+            "estimate": estimate,
+            "history": bool(estimate),
+            "parts": [part.command for part in command.parts],
+            "shards": [shard.command for shard in command.shards],
+        }
+
+    def __may_skip(self, command) -> bool:
+        if command.status is ExecutionStatus.UP_TO_DATE:
+            return True
+        store = self.options.fingerprints
+        key = command.fingerprint_key()
+        if store is None or key is None or self.options.force:
+            return False
+        if key in self.clobbered:
+            return False
+        parts = command.parts or [command]
+        if any(part.ant_target is not None for part in parts):
+            return False
+        return store.contains(key)
+
+
+def print_plan(plan: dict):
+    print("-" * const.COMMAND_SIZE)
+    for task in plan["tasks"]:
+        depends_on = ", ".join(str(idx) for idx in task["depends_on"]) or "-"
+        print(
+            "[%d] %s %s %s (depends on: %s, estimate %.2fs, critical path %.2fs)"
+            % (
+                task["id"],
+                task["target"],
+                task["module"] or "",
+                task["targets"] or "",
+                depends_on,
+                task["estimate"],
+                task["critical_path"],
+            )
+        )
+        for step in task["commands"]:
+            notes = []
+            if step["status"] != ExecutionStatus.PREPARED.value:
+                notes.append(step["status"])
+            if step["may_skip"]:
+                notes.append("skipped when sources unchanged")
+            if step["shards"]:
+                notes.append("%d shards" % len(step["shards"]))
+            print(
+                "    %s %s%s"
+                % (
+                    "%.2fs" % step["estimate"] if step["history"] else "    ?",
+                    step["command"],
+                    " (%s)" % ", ".join(notes) if notes else "",
+                )
+            )
+    print("-" * const.COMMAND_SIZE)
+    print(
+        "Predicted wall time %.2fs with %d jobs (critical path %.2fs, sequential %.2fs)"
+        % (
+            plan["predicted_wall_time"],
+            plan["jobs"],
+            plan["critical_path"],
+            plan["sequential_time"],
+        )
+    )
+
+
+def export_plan(plan: dict, path: str):
+    if path == "-":
+        print(json.dumps(plan, indent=2))
+        return
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=2)
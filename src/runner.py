@@ -0,0 +1,191 @@
+import asyncio
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.output import OutputCapture
+from src.usage import ProcessTreeSampler, rusage_usage
+
+CHUNK_SIZE = 64 * 1024
+LINE_LIMIT = 1024 * 1024
+# seconds output is still read after the process exited, background children
+# may keep the pipes open much longer
+DRAIN_TIMEOUT = 1
+
+
+def wait_process(process: subprocess.Popen, command) -> int:
+    """Waits for the process and stores its pid and resource usage in command.
+
+    Usage of the child covers its waited-for descendants, e.g. the JVM
+    started by the shell. The process tree is sampled from /proc meanwhile
+    when available.
+    """
+    sampler = None
+    if ProcessTreeSampler.available():
+        sampler = ProcessTreeSampler(process.pid).start()
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    finally:
+        sampled = sampler.stop() if sampler is not None else {}
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    command.pid = process.pid
+    command.usage = rusage_usage(rusage)
+    command.usage.update(sampled)
+    return process.returncode
+
+
+def start_command(command, pid, started=None):
+    """Stores pid and start time of a command whose process was just started.
+
+    started is called with the command afterwards, e.g. to report it RUNNING.
+    """
+    command.pid = pid
+    command.start_time = time.time()
+    if started is not None:
+        started(command)
+
+
+def kill_process_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class SubprocessRunner:
+    """Runs commands with blocking subprocess calls, child inherits the terminal.
+
+    Every command runs in its own process group which is killed on cancellation.
+    """
+
+    def __init__(self, jobs: int = 1):
+        self.pool = ThreadPoolExecutor(max_workers=jobs)
+        self.processes = set()
+
+    async def run(self, command, prefix: str, started=None) -> int:
+        loop = asyncio.get_event_loop()
+        process = subprocess.Popen(command.command, shell=True, start_new_session=True)
+        self.processes.add(process)
+        start_command(command, process.pid, started)
+        try:
+            return await loop.run_in_executor(self.pool, wait_process, process, command)
+        finally:
+            if process.poll() is None:
+                kill_process_group(process.pid)
+            self.processes.discard(process)
+
+    def close(self):
+        for process in self.processes:
+            kill_process_group(process.pid)
+        self.pool.shutdown()
+
+
+class AsyncRunner:
+    """Runs commands with asyncio, printing their output line by line with prefix.
+
+    Output is processed in chunks as it arrives, full output of every command
+    is written to a separate compressed file in log_dir and its last lines
+    and compiler errors are kept in the command (see OutputCapture).
+    Every command runs in its own process group which is killed on cancellation.
+    """
+
+    def __init__(self, log_dir: str = None):
+        self.log_dir = log_dir
+        self.counter = 0
+        self.processes = set()
+
+    async def run(self, command, prefix: str, started=None) -> int:
+        loop = asyncio.get_event_loop()
+        process = subprocess.Popen(
+            command.command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self.processes.add(process)
+        start_command(command, process.pid, started)
+        capture = self.open_capture(command, prefix)
+        pumps = asyncio.ensure_future(
+            asyncio.gather(
+                self.__pump(process.stdout, prefix, capture, sys.stdout),
+                self.__pump(process.stderr, prefix, capture, sys.stderr),
+            )
+        )
+        waiting = loop.run_in_executor(None, wait_process, process, command)
+        try:
+            code = await asyncio.shield(waiting)
+            try:
+                await asyncio.wait_for(pumps, DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            return code
+        except asyncio.CancelledError:
+            kill_process_group(process.pid)
+            await waiting
+            raise
+        finally:
+            pumps.cancel()
+            await asyncio.gather(pumps, return_exceptions=True)
+            self.processes.discard(process)
+            process.stdout.close()
+            process.stderr.close()
+            capture.close()
+
+    def close(self):
+        for process in self.processes:
+            kill_process_group(process.pid)
+
+    def open_capture(self, command, prefix: str) -> OutputCapture:
+        if self.log_dir is None:
+            return OutputCapture(command)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.counter += 1
+        file_name = "%03d-%s.log.gz" % (
+            self.counter,
+            re.sub("[^\\w.-]+", "_", prefix),
+        )
+        return OutputCapture(command, os.path.join(self.log_dir, file_name))
+
+    @staticmethod
+    async def __pump(pipe, prefix: str, capture, output):
+        loop = asyncio.get_event_loop()
+        stream = asyncio.StreamReader(limit=LINE_LIMIT)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(stream), pipe
+        )
+        try:
+            await AsyncRunner.__copy_lines(stream, prefix, capture, output)
+        finally:
+            transport.close()
+
+    @staticmethod
+    async def __copy_lines(stream, prefix: str, capture, output):
+        pending = b""
+        while True:
+            chunk = await stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > LINE_LIMIT:
+                lines.append(pending)
+                pending = b""
+            AsyncRunner.write_lines(lines, prefix, capture, output)
+        if pending:
+            AsyncRunner.write_lines([pending], prefix, capture, output)
+
+    @staticmethod
+    def write_lines(lines: list, prefix: str, capture, output):
+        """Writes lines of a chunk prefixed to output at once and to the capture."""
+        texts = [line.decode(errors="replace").rstrip("\r") for line in lines]
+        output.write("".join("[%s] %s\n" % (prefix, text) for text in texts))
+        output.flush()
+        capture.write_lines(texts)
@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+
+from src.constants import Target
+
+
+class SchedulerException(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+class TaskGraph:
+    """Dependency graph of tasks used by the parallel executor.
+
+    Tasks of the same module keep their relative order, module tasks wait for
+    the tasks of their upstream modules, custom commands wait for everything
+    listed before them and restart always runs last.
+    """
+
+    def __init__(self, tasks: list, dependencies: dict = None, aliases: dict = None):
+        self.tasks = tasks
+        self.aliases = aliases or {}
+        self.explicit = self.__resolve_explicit(dependencies or {})
+        self.edges = {}
+        for idx, task in enumerate(tasks):
+            self.edges[task] = self.__task_dependencies(idx, task)
+        self.topological_order = self.__topological_order()
+        self.estimates = {task: 0 for task in tasks}
+        self.paths = {task: 0 for task in tasks}
+
+    def ready(self, pending: list, done: set) -> list:
+        ready = [task for task in pending if self.edges[task] <= done]
+        return sorted(ready, key=self.__priority)
+
+    def is_sequential(self) -> bool:
+        """True when no two tasks can ever run at the same time."""
+        pending = list(self.tasks)
+        done = set()
+        while pending:
+            ready = [task for task in pending if self.edges[task] <= done]
+            if len(ready) > 1:
+                return False
+            pending.remove(ready[0])
+            done.add(ready[0])
+        return True
+
+    def dependents(self, task) -> list:
+        return [other for other in self.tasks if task in self.edges[other]]
+
+    def set_estimates(self, estimates: dict):
+        """Sets estimated durations of tasks and computes their critical paths.
+
+        Critical path of a task is its own duration plus the longest path among
+        tasks depending on it. Ready tasks with longer paths are started first.
+        """
+        self.estimates = {task: estimates.get(task, 0) for task in self.tasks}
+        self.paths = {}
+        for task in reversed(self.topological_order):
+            downstream = [self.paths[other] for other in self.dependents(task)]
+            self.paths[task] = self.estimates[task] + max(downstream, default=0)
+
+    def critical_path(self) -> float:
+        return max(self.paths.values(), default=0)
+
+    def predict_wall_time(self, jobs: int) -> float:
+        pending = list(self.tasks)
+        done = set()
+        running = []
+        now = 0
+        while pending or running:
+            for task in self.ready(pending, done):
+                if len(running) >= jobs:
+                    break
+                pending.remove(task)
+                heapq.heappush(
+                    running, (now + self.estimates[task], self.tasks.index(task), task)
+                )
+            now, _, task = heapq.heappop(running)
+            done.add(task)
+        return now
+
+    def __priority(self, task) -> tuple:
+        order = task.module.order if task.module is not None else None
+        return (
+            -self.paths[task],
+            order if order is not None else float("inf"),
+            self.tasks.index(task),
+        )
+
+    def __topological_order(self) -> list:
+        result = []
+        done = set()
+        pending = list(self.tasks)
+        while pending:
+            ready = [task for task in pending if self.edges[task] <= done]
+            if not ready:
+                raise SchedulerException(
+                    "Dependency cycle detected between tasks %s" % pending
+                )
+            for task in ready:
+                pending.remove(task)
+                done.add(task)
+                result.append(task)
+        return result
+
+    def __task_dependencies(self, idx: int, task) -> set:
+        if task.target in [Target.RESTART, Target.CUSTOM]:
+            return set(self.tasks[:idx])
+        result = set()
+        for other_idx, other in enumerate(self.tasks):
+            if other is task:
+                continue
+            if other.target in [Target.RESTART, Target.CUSTOM]:
+                if other_idx < idx:
+                    result.add(other)
+            elif module_key(other.module) == module_key(task.module):
+                if other_idx < idx:
+                    result.add(other)
+            elif self.__is_upstream(other.module, task.module):
+                result.add(other)
+        return result
+
+    def __is_upstream(self, candidate, module) -> bool:
+        name = module_key(module)
+        if name in self.explicit:
+            return module_key(candidate) in self.explicit[name]
+        if candidate.order is None or module.order is None:
+            return False
+        return candidate.order < module.order
+
+    def __resolve_explicit(self, dependencies: dict) -> dict:
+        direct = {}
+        for module, upstream in dependencies.items():
+            direct[self.aliases.get(module, module)] = [
+                self.aliases.get(name, name) for name in upstream or []
+            ]
+        result = {}
+        for module in direct:
+            visited = set()
+            stack = list(direct[module])
+            while stack:
+                name = stack.pop()
+                if name in visited:
+                    continue
+                visited.add(name)
+                stack.extend(direct.get(name, []))
+            result[module] = visited
+        return result
+
+
+class ResourcePool:
+    """Named resource pools shared by concurrently running commands.
+
+    A command is admitted only when every resource of its cost is free. Costs
+    are capped at pool capacity so that any command can run alone, resources
+    without a pool are not limited.
+    """
+
+    def __init__(self, capacities: dict):
+        self.capacities = dict(capacities)
+        self.free = dict(capacities)
+        self.condition = None
+
+    def admit(self, cost: dict) -> dict:
+        return {
+            name: min(amount, self.capacities[name])
+            for name, amount in cost.items()
+            if name in self.capacities and amount > 0
+        }
+
+    async def acquire(self, cost: dict):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.__fits(cost))
+            for name, amount in cost.items():
+                self.free[name] -= amount
+
+    async def release(self, cost: dict):
+        async with self.condition:
+            for name, amount in cost.items():
+                self.free[name] += amount
+            self.condition.notify_all()
+
+    def __fits(self, cost: dict) -> bool:
+        return all(self.free[name] >= amount for name, amount in cost.items())
+
+
+def module_key(module) -> str:
+    return module.name.split("/")[-1]
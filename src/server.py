@@ -0,0 +1,219 @@
+"""Resident build server answering requests of src.client over a unix socket.
+
+The server keeps the validated app config and the modules config loaded and
+executes every request in a forked child inheriting them, so an invocation
+starts without importing, validating and indexing anything. The child
+takes over the standard descriptors passed by the client, its working
+directory, environment and arguments, and exits with the code of the
+request.
+"""
+
+import array
+import json
+import os
+import signal
+import socket
+import sys
+import traceback
+
+REQUEST_LIMIT = 1024 * 1024
+REQUEST_TIMEOUT = 5
+REAP_INTERVAL = 1
+
+
+class WarmState:
+    """Config and modules config kept loaded between requests.
+
+    App config is loaded again when cfg.yml changes, modules config when the
+    app config, the module registry or the build order change.
+    """
+
+    def __init__(self, cfg_path: str, load_app_cfg, create_builder):
+        self.cfg_path = cfg_path
+        self.load_app_cfg = load_app_cfg
+        self.create_builder = create_builder
+        self.cfg_stat = None
+        self.app_cfg = None
+        self.builder = None
+        self.config = None
+
+    def refresh(self):
+        cfg_stat = file_stat(self.cfg_path)
+        if self.app_cfg is None or cfg_stat != self.cfg_stat:
+            self.app_cfg = self.load_app_cfg()
+            self.cfg_stat = cfg_stat
+            self.builder = None
+        if self.builder is None or self.builder.is_stale():
+            self.builder = self.create_builder(self.app_cfg)
+            self.config = self.builder.build()
+            self.builder.preload()
+
+
+class BuildServer:
+    def __init__(self, path: str, state: WarmState, handle):
+        self.path = path
+        self.state = state
+        self.handle = handle
+        self.children = set()
+
+    def serve(self):
+        self.state.refresh()
+        listener = self.__listen()
+        signal.signal(signal.SIGTERM, stop)
+        print("Build server listening on %s" % self.path)
+        sys.stdout.flush()
+        try:
+            while True:
+                self.__reap()
+                try:
+                    connection, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                with connection:
+                    self.__accept(listener, connection)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            os.unlink(self.path)
+            print("Build server stopped")
+
+    def __listen(self):
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise OSError("Build server already running on %s" % self.path)
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # created private, other users cannot connect before the chmod
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        listener.listen(16)
+        listener.settimeout(REAP_INTERVAL)
+        return listener
+
+    def __accept(self, listener, connection):
+        connection.settimeout(REQUEST_TIMEOUT)
+        try:
+            request, fds = receive_request(connection)
+        except (OSError, ValueError):
+            return
+        try:
+            self.state.refresh()
+        except Exception as e:
+            os.write(fds[2], ("Build server failed to load config: %s\n" % e).encode())
+            send(connection, {"exit": 1})
+            close_all(fds)
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            close_all(fds)
+            return
+        listener.close()
+        os._exit(self.__execute(connection, request, fds))
+
+    def __execute(self, connection, request: dict, fds: list) -> int:
+        code = 1
+        try:
+            os.setsid()
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            for target, fd in zip([0, 1, 2], fds):
+                os.dup2(fd, target)
+            close_all(fds)
+            sys.stdout = os.fdopen(1, "w", 1, closefd=False)
+            sys.stderr = os.fdopen(2, "w", 1, closefd=False)
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            sys.argv = sys.argv[:1] + request["argv"]
+            connection.settimeout(None)
+            send(connection, {"pid": os.getpid()})
+            code = self.__handle(request["argv"])
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                send(connection, {"exit": code})
+            except OSError:
+                pass
+        return code
+
+    def __handle(self, argv: list) -> int:
+        try:
+            self.handle(argv)
+            return 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            return 130
+        except Exception as e:
+            print("Application finished with error")
+            print(e)
+            traceback.print_exc()
+            return 1
+
+    def __reap(self):
+        for pid in list(self.children):
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished = pid
+            if finished:
+                self.children.discard(pid)
+
+
+def receive_request(connection) -> tuple:
+    fds = array.array("i")
+    data, ancdata, _, _ = connection.recvmsg(
+        REQUEST_LIMIT, socket.CMSG_LEN(3 * fds.itemsize)
+    )
+    for level, kind, payload in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[: len(payload) - len(payload) % fds.itemsize])
+    if len(fds) != 3:
+        close_all(fds)
+        raise ValueError("Expected stdin, stdout and stderr of the client")
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(REQUEST_LIMIT)
+        if not chunk or len(data) > REQUEST_LIMIT:
+            close_all(fds)
+            raise ValueError("Incomplete request")
+        data += chunk
+    return json.loads(data.decode()), list(fds)
+
+
+def send(connection, response: dict):
+    connection.sendall((json.dumps(response) + "\n").encode())
+
+
+def close_all(fds):
+    for fd in fds:
+        os.close(fd)
+
+
+def file_stat(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
@@ -0,0 +1,68 @@
+import heapq
+import os
+import re
+
+from src.output import open_log
+
+TEST_CLASS_SUFFIX = "Test.java"
+
+testsuite_pattern = re.compile("^\\s*(?:\\[junit\\]\\s*)?Testsuite: (\\S+)")
+elapsed_pattern = re.compile("Time elapsed: ([\\d.,]+) sec")
+
+
+def discover_test_classes(location: str) -> list:
+    classes = []
+    for root, dirs, files in os.walk(location):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(TEST_CLASS_SUFFIX):
+                classes.append(name[: -len(".java")])
+    return classes
+
+
+def partition(classes: list, shards: int, durations: dict = None) -> list:
+    """Splits test classes into balanced shards, longest classes first.
+
+    Classes without known duration weigh the average of known durations, so
+    without any history the shards are balanced by number of classes. Ties,
+    e.g. durations of 0 reported by junit, go to the shard with fewer classes,
+    so no shard is left empty.
+    """
+    durations = durations or {}
+    known = [durations[name] for name in classes if name in durations]
+    default = sum(known) / len(known) if known else 1
+    weights = {name: durations.get(name, default) for name in classes}
+    heap = [(0, 0, idx, []) for idx in range(min(shards, len(classes)))]
+    for name in sorted(classes, key=lambda name: (-weights[name], name)):
+        total, count, idx, shard = heapq.heappop(heap)
+        shard.append(name)
+        heapq.heappush(heap, (total + weights[name], count + 1, idx, shard))
+    return [
+        sorted(shard)
+        for _, _, _, shard in sorted(heap, key=lambda entry: entry[2])
+        if shard
+    ]
+
+
+def includes(classes: list) -> str:
+    return ",".join("**/%s.class" % name for name in classes)
+
+
+def parse_test_durations(log_path: str) -> dict:
+    """Reads durations of test classes from junit plain formatter output."""
+    durations = {}
+    current = None
+    try:
+        with open_log(log_path) as f:
+            for line in f:
+                match = testsuite_pattern.match(line)
+                if match:
+                    current = match.group(1).split(".")[-1]
+                    continue
+                match = elapsed_pattern.search(line)
+                if match and current is not None:
+                    durations[current] = float(match.group(1).replace(",", "."))
+                    current = None
+    except OSError:
+        pass
+    return durations
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TOOL_LANE = 0
+
+
+class Tracer:
+    """Collects spans of a run and writes them in Chrome Trace Event format.
+
+    Phases of the tool itself are placed in lane 0, tasks and their commands
+    in the lane of the job slot executing them. The file can be opened in
+    Perfetto or chrome://tracing.
+    """
+
+    def __init__(self, origin: float = None):
+        self.origin = origin if origin is not None else time.time()
+        self.lock = threading.Lock()
+        self.events = []
+        self.lanes = {TOOL_LANE: "wc_builder"}
+
+    def span(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: float,
+        lane: int,
+        args: dict = None,
+    ):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1000000),
+            "dur": round(max(end - start, 0) * 1000000),
+            "pid": 1,
+            "tid": lane,
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.span(name, "tool", start, time.time(), TOOL_LANE)
+
+    def name_lane(self, lane: int, name: str):
+        with self.lock:
+            self.lanes[lane] = name
+
+    def write(self, path: str):
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": 1,
+                "args": {"name": "wc_builder"},
+            }
+        ]
+        for lane, name in sorted(self.lanes.items()):
+            metadata.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": lane,
+                    "args": {"name": name},
+                }
+            )
+            metadata.append(
+                {
+                    "name": "thread_sort_index",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": lane,
+                    "args": {"sort_index": lane},
+                }
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f
+            )
@@ -0,0 +1,241 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+import src.constants as const
+from src.constants import Target
+
+DEBOUNCE_SECONDS = 0.3
+POLL_INTERVAL = 1.0
+READ_SIZE = 64 * 1024
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+inotify_event = struct.Struct("iIII")
+# directories removed or unreadable while being added are not watched
+SKIPPED_ERRORS = [errno.ENOENT, errno.ENOTDIR, errno.EACCES]
+
+
+class InotifyWatcher:
+    """Reports changed root directories using inotify watches on every subdirectory.
+
+    Creating the watcher fails with OSError when a directory cannot be watched,
+    e.g. with ENOSPC above fs.inotify.max_user_watches.
+    """
+
+    def __init__(self, roots: list):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = list(roots)
+        self.watches = {}
+        try:
+            for root in self.roots:
+                self.__add_tree(root, root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    @staticmethod
+    def available() -> bool:
+        libc = ctypes.util.find_library("c")
+        return libc is not None and hasattr(ctypes.CDLL(libc), "inotify_init1")
+
+    def wait(self, timeout: float = None) -> set:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = inotify_event.unpack_from(data, offset)
+            name = data[
+                offset + inotify_event.size : offset + inotify_event.size + length
+            ]
+            offset += inotify_event.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.roots)
+                continue
+            if wd not in self.watches:
+                continue
+            root, path = self.watches[wd]
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                directory = os.path.join(path, os.fsdecode(name.rstrip(b"\0")))
+                try:
+                    self.__add_tree(root, directory)
+                except OSError as error:
+                    print(f"Warning: changes in {directory} are not seen, {error}")
+            changed.add(root)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+    def __add_tree(self, root: str, path: str):
+        for directory, _, _ in os.walk(path):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd >= 0:
+                self.watches[wd] = (root, directory)
+                continue
+            code = ctypes.get_errno()
+            if code not in SKIPPED_ERRORS:
+                raise OSError(code, os.strerror(code), directory)
+
+
+class PollingWatcher:
+    """Reports changed root directories by comparing mtimes and sizes of their files."""
+
+    def __init__(self, roots: list, interval: float = POLL_INTERVAL):
+        self.roots = list(roots)
+        self.interval = interval
+        self.snapshots = {root: snapshot(root) for root in self.roots}
+
+    def wait(self, timeout: float = None) -> set:
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0, min(delay, deadline - time.time()))
+            time.sleep(delay)
+            changed = set()
+            for root in self.roots:
+                current = snapshot(root)
+                if current != self.snapshots[root]:
+                    self.snapshots[root] = current
+                    changed.add(root)
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def snapshot(root: str) -> dict:
+    result = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result[path] = (stat.st_mtime_ns, stat.st_size)
+    return result
+
+
+def create_watcher(roots: list):
+    if InotifyWatcher.available():
+        try:
+            return InotifyWatcher(roots)
+        except OSError as error:
+            print(f"Cannot use inotify ({error}), polling for changes")
+    return PollingWatcher(roots)
+
+
+class WatchSession:
+    """Re-runs commands of module tasks whose source directories changed.
+
+    Modules and tasks resolved for the first run are kept, every change only
+    creates fresh commands of the affected module src directories. Clobber is
+    not repeated and test commands are affected by changes of src and
+    src_test. Restart is executed again after every rebuild when it was
+    requested.
+    """
+
+    def __init__(self, tasks: list, task_builder, run, debounce=DEBOUNCE_SECONDS):
+        self.tasks = tasks
+        self.task_builder = task_builder
+        self.run = run
+        self.debounce = debounce
+
+    def directories(self) -> list:
+        result = set()
+        for task in self.tasks:
+            for command in task.commands:
+                for part in command.parts or [command]:
+                    result.update(watched_directories(part))
+        return sorted(path for path in result if os.path.isdir(path))
+
+    def watch(self, watcher, iterations: int = None):
+        print(
+            "Watching %d directories for changes, press Ctrl+C to stop"
+            % len(self.directories())
+        )
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            changed = self.wait_for_changes(watcher)
+            tasks = self.affected_tasks(changed)
+            if tasks:
+                print("Changes in %s" % ", ".join(sorted(changed)))
+                self.run(tasks)
+            iteration += 1
+
+    def wait_for_changes(self, watcher) -> set:
+        changed = set()
+        while not changed:
+            changed = watcher.wait()
+        while True:
+            more = watcher.wait(self.debounce)
+            if not more:
+                return changed
+            changed |= more
+
+    def affected_tasks(self, changed: set) -> list:
+        result = []
+        for task in self.tasks:
+            if task.module is None:
+                continue
+            fresh = self.task_builder.build_single_task(
+                task.target, task.module, task.targets
+            )
+            fresh.commands = [
+                command
+                for command in fresh.commands
+                if command.ant_target != "clobber"
+                and watched_directories(command) & changed
+            ]
+            if fresh.commands:
+                result.append(fresh)
+        if result and any(task.target == Target.RESTART for task in self.tasks):
+            result.append(self.task_builder.build_single_task(Target.RESTART))
+        return result
+
+
+def watched_directories(command) -> set:
+    if command.module is None or command.src is None:
+        return set()
+    result = {os.path.join(command.module.location, command.src)}
+    if command.src == const.SRC_TEST:
+        result.add(os.path.join(command.module.location, const.SRC))
+    return result
@@ -0,0 +1,101 @@
+import os
+import threading
+
+from src.artifacts import ArtifactCache
+from src.config import AppConfig, Artifacts
+from src.constants import Target
+from src.executor import Command, ExecutionOptions, ExecutionStatus, Executor, Task
+from src.module import ModuleInfo, ModulesConfig
+
+BUILD = "mkdir -p {0}/out && cp {0}/src/A.java {0}/out/A.class && echo built"
+
+
+def create_workspace(tmpdir, name: str) -> ModuleInfo:
+    location = tmpdir.mkdir(name)
+    location.mkdir("src").join("A.java").write("class A {}")
+    location.join("src", "build.xml").write("<project/>")
+    return ModuleInfo(name="nameA", location=location.strpath, order=1)
+
+
+def build(
+    app_config: AppConfig, module: ModuleInfo, cache: ArtifactCache, jobs: int = 1
+) -> Command:
+    task = Task(Target.BUILD, module, "s")
+    task.commands = [Command(BUILD.format(module.location), module=module, src="src")]
+    Executor(
+        app_config, ModulesConfig({}), ExecutionOptions(artifacts=cache, jobs=jobs)
+    ).run_tasks([task])
+    return task.commands[0]
+
+
+def test_should_restore_outputs_built_in_other_workspace(
+    app_config: AppConfig, tmpdir, capsys
+):
+    app_config.artifacts = Artifacts(outputs={"nameA": {"src": ["out"]}})
+    cache = ArtifactCache(tmpdir.join("cache").strpath, 1024 * 1024)
+    first = create_workspace(tmpdir, "root1")
+    second = create_workspace(tmpdir, "root2")
+
+    assert build(app_config, first, cache).status == ExecutionStatus.COMPLETED
+    command = build(app_config, second, cache)
+
+    assert command.status == ExecutionStatus.CACHED
+    assert "outputs restored from artifact cache" in capsys.readouterr().out
+    with open(os.path.join(second.location, "out", "A.class")) as f:
+        assert f.read() == "class A {}"
+
+    tmpdir.join("root2", "src", "A.java").write("class A { int a; }")
+    assert build(app_config, second, cache).status == ExecutionStatus.COMPLETED
+
+
+def test_should_store_outputs_outside_event_loop(
+    app_config: AppConfig, tmpdir, monkeypatch
+):
+    app_config.artifacts = Artifacts(outputs={"nameA": {"src": ["out"]}})
+    cache = ArtifactCache(tmpdir.join("cache").strpath, 1024 * 1024)
+    threads = []
+    store = cache.store
+
+    def recording_store(*args):
+        threads.append(threading.current_thread())
+        store(*args)
+
+    monkeypatch.setattr(cache, "store", recording_store)
+
+    command = build(app_config, create_workspace(tmpdir, "root1"), cache, jobs=2)
+
+    assert command.status == ExecutionStatus.COMPLETED
+    assert threads and threads[0] is not threading.main_thread()
+    second = build(app_config, create_workspace(tmpdir, "root2"), cache, jobs=2)
+    assert second.status == ExecutionStatus.CACHED
+
+
+def test_should_evict_least_recently_used_entries(tmpdir):
+    cache = ArtifactCache(tmpdir.join("cache").strpath, 20)
+    location = tmpdir.mkdir("module")
+    location.mkdir("src")
+    out = location.mkdir("out")
+    keys = []
+    for content in ["first-10b", "second-10", "third-10b"]:
+        out.join("A.class").write(content)
+        keys.append(cache.key(location.strpath, "src", content, ["out"]))
+        cache.store(keys[-1], location.strpath, ["out"])
+        assert cache.restore(keys[0], location.strpath)
+
+    assert out.join("A.class").read() == "first-10b"
+    assert not cache.restore(keys[1], location.strpath)
+    assert cache.restore(keys[2], location.strpath)
+    assert cache.size() == 18
+
+
+def test_should_restore_outputs_as_hardlinks(tmpdir):
+    cache = ArtifactCache(tmpdir.join("cache").strpath, 1024, "hardlink")
+    location = tmpdir.mkdir("module")
+    location.mkdir("src")
+    location.mkdir("out").join("A.class").write("class")
+    key = cache.key(location.strpath, "src", "ant", ["out"])
+    cache.store(key, location.strpath, ["out"])
+    location.join("out").remove()
+
+    assert cache.restore(key, location.strpath)
+    assert os.stat(location.join("out", "A.class").strpath).st_nlink == 2
@@ -0,0 +1,91 @@
+import json
+
+from benchmarks import harness, planning, throughput
+
+
+def test_should_run_planning_benchmarks_on_small_registry(tmpdir):
+    results_path = tmpdir.join("results.json").strpath
+
+    returncode = planning.main(
+        ["--modules", "40", "--tasks", "8", "--repeat", "1", "--save", results_path]
+    )
+
+    assert returncode == 0
+    with open(results_path) as f:
+        results = {entry["benchmark"]: entry for entry in json.load(f)}
+    assert sorted(results) == [
+        "alias_resolution",
+        "modules_config_cold",
+        "modules_config_preload",
+        "modules_config_warm",
+        "plan",
+        "suite_expansion",
+    ]
+    assert results["alias_resolution"]["metrics"]["tasks"] == 8
+    assert results["plan"]["metrics"]["tasks"] == 9
+
+
+def test_should_report_regressions_against_baseline(tmpdir):
+    baseline_path = tmpdir.join("baseline.json").strpath
+    harness.save_results(
+        [
+            harness.Result(benchmark="plan", size=10, seconds=0.1),
+            harness.Result(benchmark="plan", size=20, seconds=0.1),
+        ],
+        baseline_path,
+    )
+    results = [
+        harness.Result(benchmark="plan", size=10, seconds=0.3),
+        harness.Result(benchmark="plan", size=20, seconds=0.12),
+        harness.Result(benchmark="plan", size=30, seconds=5),
+    ]
+
+    slower = harness.regressions(results, baseline_path)
+
+    assert [(result.key(), previous) for result, previous in slower] == [
+        ("plan[10]", 0.1)
+    ]
+
+
+def test_should_run_executor_benchmarks_with_fake_ant(tmpdir):
+    results_path = tmpdir.join("results.json").strpath
+
+    returncode = throughput.main(
+        [
+            "--jobs",
+            "1",
+            "2",
+            "--modules",
+            "4",
+            "--output-mb",
+            "1",
+            "--workload",
+            "overhead",
+            "output",
+            "failure",
+            "--backend",
+            "async",
+            "--repeat",
+            "1",
+            "--save",
+            results_path,
+        ]
+    )
+
+    assert returncode == 0
+    with open(results_path) as f:
+        results = {
+            "%s[%s]" % (entry["benchmark"], entry["size"]): entry["metrics"]
+            for entry in json.load(f)
+        }
+    assert sorted(results) == [
+        "failure/async[2]",
+        "failure/sequential[1]",
+        "output/async[2]",
+        "output/sequential[1]",
+        "overhead/async[2]",
+        "overhead/sequential[1]",
+    ]
+    assert results["overhead/sequential[1]"]["commands"] == 8
+    assert results["output/async[2]"]["mb_per_s"] > 0
+    assert results["failure/sequential[1]"]["statuses"] == "COMPLETED=3 FAILED=1"
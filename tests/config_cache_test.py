@@ -0,0 +1,35 @@
+from src import config_cache
+from src.config import AppConfig, Batching
+
+
+def test_should_restore_cached_config_with_attribute_access(
+    app_config: AppConfig, tmpdir
+):
+    app_config.batching = Batching(enabled=False)
+    cfg_path = tmpdir.join("cfg.yml")
+    cfg_path.write("root: x")
+    cache_path = tmpdir.join("cfg_cache.json").strpath
+    key = config_cache.cache_key(cfg_path.strpath)
+
+    config_cache.store(cache_path, key, app_config)
+    cached = config_cache.load(cache_path, key)
+
+    assert cached.root == app_config.root
+    assert cached.commands.ootb.restart == app_config.commands.ootb.restart
+    assert cached.aliases == app_config.aliases
+    assert cached.batching.enabled is False
+    assert cached.batching.default_target == "all"
+    assert cached.daemon is None
+
+
+def test_should_ignore_cached_config_when_cfg_changed(app_config: AppConfig, tmpdir):
+    cfg_path = tmpdir.join("cfg.yml")
+    cfg_path.write("root: x")
+    cache_path = tmpdir.join("cfg_cache.json").strpath
+    config_cache.store(cache_path, config_cache.cache_key(cfg_path.strpath), app_config)
+
+    cfg_path.write("root: changed")
+
+    assert (
+        config_cache.load(cache_path, config_cache.cache_key(cfg_path.strpath)) is None
+    )
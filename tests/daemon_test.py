@@ -0,0 +1,206 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.config import AppConfig, Daemon
+from src.constants import Target
+from src.executor import (
+    Command,
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    ExecutorException,
+    Task,
+)
+from src.module import ModulesConfig
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def worker_socket(tmpdir):
+    socket = tmpdir.join("ant.sock").strpath
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "src.daemon", "--socket", socket, "--ant", "echo"],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+    )
+    worker.stdout.readline()
+    yield socket
+    worker.kill()
+    worker.wait()
+
+
+@pytest.fixture
+def local_ant(tmpdir, monkeypatch):
+    bin_dir = tmpdir.mkdir("bin")
+    ant = bin_dir.join("ant")
+    ant.write("#!/bin/sh\necho local $@\n")
+    ant.chmod(0o755)
+    monkeypatch.setenv("PATH", bin_dir.strpath + os.pathsep + os.environ["PATH"])
+
+
+FAKE_JAVAC = """#!/bin/sh
+echo compiled >> "$(dirname "$0")/javac.calls"
+while [ "$1" != "-d" ]; do shift; done
+touch "$2/AntWorker.class"
+"""
+# runs the stand-in worker in place of the resident JVM
+FAKE_JAVA = """#!/bin/sh
+while [ "$1" != "AntWorker" ]; do shift; done
+echo $$ >> "$(dirname "$0")/java.pids"
+cd "%s" && exec "%s" -m src.daemon --socket "$2" --ant echo
+"""
+
+
+@pytest.fixture
+def fake_jdk(tmpdir):
+    bin_dir = tmpdir.mkdir("jdk").mkdir("bin")
+    for name, content in [
+        ("javac", FAKE_JAVAC),
+        ("java", FAKE_JAVA % (ROOT_DIR, sys.executable)),
+    ]:
+        bin_dir.join(name).write(content)
+        bin_dir.join(name).chmod(0o755)
+    tmpdir.mkdir("ant").mkdir("lib").join("ant.jar").write("")
+    yield tmpdir.join("jdk")
+    if bin_dir.join("java.pids").exists():
+        for pid in bin_dir.join("java.pids").read().split():
+            kill_worker(int(pid))
+
+
+def kill_worker(pid: int):
+    try:
+        os.kill(pid, 9)
+    except OSError:
+        pass
+
+
+def build_tasks(modules_config: ModulesConfig) -> list:
+    build = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    build.commands = [
+        Command("ant -f not/here1/src/build.xml", module=build.module, src="src")
+    ]
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("echo Full")]
+    return [build, custom]
+
+
+def test_should_execute_ant_commands_in_worker(
+    app_config: AppConfig, modules_config: ModulesConfig, worker_socket, capsys
+):
+    app_config.daemon = Daemon(sockets=[worker_socket])
+    tasks = build_tasks(modules_config)
+
+    Executor(app_config, modules_config, ExecutionOptions(backend="daemon")).run_tasks(
+        tasks
+    )
+
+    output = capsys.readouterr().out
+    assert "[nameA:src] -f not/here1/src/build.xml\n" in output
+    assert "[custom:full] Full\n" in output
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+    assert tasks[1].commands[0].status == ExecutionStatus.COMPLETED
+    assert os.stat(worker_socket).st_mode & 0o077 == 0
+
+
+def test_should_fall_back_to_local_ant_when_worker_not_available(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, local_ant, capsys
+):
+    app_config.daemon = Daemon(sockets=[tmpdir.join("missing.sock").strpath])
+    tasks = build_tasks(modules_config)
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(backend="daemon", jobs=2)
+    ).run_tasks(tasks)
+
+    output = capsys.readouterr().out
+    assert "is not available, falling back" in output
+    assert "[nameA:src] local -f not/here1/src/build.xml\n" in output
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_kill_ant_in_worker_cancelled_on_first_failure(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    ant = tmpdir.join("slow_ant")
+    ant.write('#!/bin/sh\nsleep 1 && touch "$1"\n')
+    ant.chmod(0o755)
+    socket = tmpdir.join("ant.sock").strpath
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "src.daemon", "--socket", socket, "--ant", ant.strpath],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+    )
+    worker.stdout.readline()
+    marker = tmpdir.join("marker")
+    app_config.fail_on_error = True
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    app_config.daemon = Daemon(sockets=[socket])
+    failing = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    failing.commands = [Command("sleep 0.2; exit 3", module=failing.module)]
+    slow = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    slow.commands = [Command("ant " + marker.strpath, module=slow.module, src="src")]
+    try:
+        with pytest.raises(ExecutorException):
+            Executor(
+                app_config, modules_config, ExecutionOptions(backend="daemon", jobs=2)
+            ).run_tasks([failing, slow])
+
+        assert slow.commands[0].status == ExecutionStatus.CANCELLED
+        time.sleep(1.5)
+        assert not marker.exists()
+    finally:
+        worker.kill()
+        worker.wait()
+
+
+def test_should_start_resident_workers_and_reuse_them(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, fake_jdk, capsys
+):
+    app_config.daemon = Daemon(
+        workers=2, java_home=fake_jdk.strpath, ant_home=tmpdir.join("ant").strpath
+    )
+    options = ExecutionOptions(
+        backend="daemon", jobs=2, daemon_dir=tmpdir.join("daemon").strpath
+    )
+
+    def run() -> str:
+        tasks = build_tasks(modules_config)
+        Executor(app_config, modules_config, options).run_tasks(tasks)
+        assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+        return capsys.readouterr().out
+
+    output = run()
+    assert output.count("Starting resident ant worker") == 1
+    assert "[nameA:src] -f not/here1/src/build.xml\n" in output
+    assert "Starting resident ant worker" not in run()
+    assert fake_jdk.join("bin", "javac.calls").read() == "compiled\n"
+    assert os.stat(tmpdir.join("daemon", "ant-1.sock").strpath).st_mode & 0o077 == 0
+
+    kill_worker(int(fake_jdk.join("bin", "java.pids").read().split()[0]))
+    time.sleep(0.1)
+    output = run()
+    assert output.count("Starting resident ant worker") == 1
+    assert "[nameA:src] -f not/here1/src/build.xml\n" in output
+
+
+def test_should_fall_back_when_resident_worker_cannot_start(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, local_ant, capsys
+):
+    app_config.daemon = Daemon(java_home=tmpdir.mkdir("no_jdk").strpath)
+    tasks = build_tasks(modules_config)
+
+    Executor(
+        app_config,
+        modules_config,
+        ExecutionOptions(backend="daemon", daemon_dir=tmpdir.join("daemon").strpath),
+    ).run_tasks(tasks)
+
+    output = capsys.readouterr().out
+    assert "Cannot start resident ant worker" in output
+    assert "[nameA:src] local -f not/here1/src/build.xml\n" in output
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src import distributed
+from src.config import AppConfig, Workers
+from src.constants import Target
+from src.executor import (
+    Command,
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    ExecutorException,
+    Task,
+)
+from src.module import ModulesConfig
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_worker(*args) -> tuple:
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "src.distributed", "--host", "127.0.0.1", *args],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+    )
+    address = worker.stdout.readline().decode().split()[-1]
+    return worker, address
+
+
+@pytest.fixture
+def workers():
+    started = [start_worker(), start_worker()]
+    yield started
+    for worker, _ in started:
+        worker.kill()
+        worker.wait()
+
+
+def unused_address() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "127.0.0.1:%d" % sock.getsockname()[1]
+
+
+def build_task(modules_config: ModulesConfig, name: str, command: str) -> Task:
+    task = Task(Target.BUILD, modules_config.modules[name], "s")
+    task.commands = [Command(command, module=task.module, src="src")]
+    return task
+
+
+def test_should_execute_module_commands_in_workers(
+    app_config: AppConfig, modules_config: ModulesConfig, workers, capsys
+):
+    app_config.fail_on_error = False
+    app_config.workers = Workers(addresses=[address for _, address in workers])
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("echo Full")]
+    tasks = [
+        custom,
+        build_task(modules_config, "nameA", "echo remote A"),
+        build_task(modules_config, "nameB", "echo remote B >&2; exit 3"),
+    ]
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(backend="remote", jobs=2)
+    ).run_tasks(tasks)
+
+    captured = capsys.readouterr()
+    assert "[nameA:src] remote A\n" in captured.out
+    assert "[nameB:src] remote B\n" in captured.err
+    assert "[custom:full] Full\n" in captured.out
+    assert [task.commands[0].status for task in tasks] == [
+        ExecutionStatus.COMPLETED,
+        ExecutionStatus.COMPLETED,
+        ExecutionStatus.FAILED,
+    ]
+
+
+def test_should_reassign_command_of_dead_worker(
+    app_config: AppConfig, modules_config: ModulesConfig, workers, capsys
+):
+    (first, first_address), (_, second_address) = workers
+    app_config.workers = Workers(
+        addresses=[unused_address(), first_address, second_address]
+    )
+    tasks = [build_task(modules_config, "nameA", "sleep 1 && echo done")]
+    timer = threading.Timer(0.5, first.kill)
+    timer.start()
+
+    Executor(app_config, modules_config, ExecutionOptions(backend="remote")).run_tasks(
+        tasks
+    )
+
+    timer.join()
+    output = capsys.readouterr().out
+    assert output.count("is not available, reassigning its work") == 2
+    assert output.count("[nameA:src] done\n") == 1
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_run_locally_when_no_worker_is_available(
+    app_config: AppConfig, modules_config: ModulesConfig, capsys
+):
+    app_config.workers = Workers(addresses=[unused_address()])
+    tasks = [build_task(modules_config, "nameA", "echo local")]
+
+    Executor(app_config, modules_config, ExecutionOptions(backend="remote")).run_tasks(
+        tasks
+    )
+
+    output = capsys.readouterr().out
+    assert "is not available, falling back" in output
+    assert "[nameA:src] local\n" in output
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_refuse_commands_without_worker_token(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    token_file = tmpdir.join("worker.token")
+    token_file.write("secret\n")
+    worker, address = start_worker("--token-file", token_file.strpath)
+    marker = tmpdir.join("marker")
+    try:
+        app_config.workers = Workers(addresses=[address], token="wrong")
+        tasks = [build_task(modules_config, "nameA", "echo local")]
+        Executor(
+            app_config, modules_config, ExecutionOptions(backend="remote")
+        ).run_tasks(tasks)
+
+        output = capsys.readouterr().out
+        assert "refused the command: invalid token" in output
+        assert "[nameA:src] local\n" in output
+
+        app_config.workers = Workers(addresses=[address], token="secret")
+        tasks = [build_task(modules_config, "nameA", "touch %s; echo remote" % marker)]
+        Executor(
+            app_config, modules_config, ExecutionOptions(backend="remote")
+        ).run_tasks(tasks)
+
+        assert "[nameA:src] remote\n" in capsys.readouterr().out
+        assert marker.check()
+    finally:
+        worker.kill()
+        worker.wait()
+
+
+def test_should_not_listen_on_other_interfaces_without_token():
+    worker = subprocess.run(
+        [sys.executable, "-m", "src.distributed", "--host", "0.0.0.0"],
+        cwd=ROOT_DIR,
+        stderr=subprocess.PIPE,
+    )
+
+    assert worker.returncode == 1
+    assert b"requires --token-file" in worker.stderr
+
+
+def test_should_report_command_not_started_by_worker_as_failed(
+    app_config: AppConfig, modules_config: ModulesConfig, workers, capsys
+):
+    app_config.fail_on_error = False
+    app_config.workers = Workers(addresses=[workers[0][1]])
+    # longer than a single argument of sh -c may be
+    tasks = [
+        build_task(modules_config, "nameA", "echo " + "x" * 200000),
+        build_task(modules_config, "nameB", "echo remote B"),
+    ]
+
+    for task in tasks:
+        Executor(
+            app_config, modules_config, ExecutionOptions(backend="remote")
+        ).run_tasks([task])
+
+    output = capsys.readouterr()
+    assert "[nameA:src] Cannot execute command" in output.err
+    assert "is not available" not in output.out
+    assert "[nameB:src] remote B\n" in output.out
+    assert tasks[0].commands[0].returncode == 127
+    assert tasks[1].commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_kill_worker_command_cancelled_on_first_failure(
+    app_config: AppConfig, modules_config: ModulesConfig, workers, tmpdir
+):
+    app_config.fail_on_error = True
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    app_config.workers = Workers(addresses=[address for _, address in workers])
+    marker = tmpdir.join("marker")
+    tasks = [
+        build_task(modules_config, "nameA", "sleep 0.2; exit 3"),
+        build_task(modules_config, "nameB", "sleep 1 && touch %s" % marker.strpath),
+    ]
+
+    with pytest.raises(ExecutorException):
+        Executor(
+            app_config, modules_config, ExecutionOptions(backend="remote", jobs=2)
+        ).run_tasks(tasks)
+
+    assert tasks[1].commands[0].status == ExecutionStatus.CANCELLED
+    time.sleep(1.5)
+    assert not marker.exists()
+
+
+def test_should_send_heartbeats_while_waiting_for_a_slot(monkeypatch):
+    monkeypatch.setattr(distributed, "HEARTBEAT_INTERVAL", 0.1)
+    loop = asyncio.new_event_loop()
+    worker = distributed.BuildWorker(1)
+
+    async def submit(port: int, command: str) -> list:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write((json.dumps({"command": command}) + "\n").encode())
+        responses = []
+        while not responses or "exit" not in responses[-1]:
+            responses.append(json.loads((await reader.readline()).decode()))
+        writer.close()
+        return responses
+
+    async def saturate() -> tuple:
+        server = await asyncio.start_server(worker.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        busy = asyncio.ensure_future(submit(port, "sleep 0.5; echo first"))
+        await asyncio.sleep(0.1)
+        queued = await submit(port, "echo second")
+        server.close()
+        return await busy, queued
+
+    try:
+        busy, queued = loop.run_until_complete(saturate())
+    finally:
+        loop.close()
+
+    first_output = queued.index({"stream": "stdout", "line": "second"})
+    assert {"heartbeat": True} in queued[:first_output]
+    assert {"stream": "stdout", "line": "first"} in busy
+    assert queued[-1] == {"exit": 0}
@@ -0,0 +1,117 @@
+import json
+
+from src.config import AppConfig
+from src.constants import Target
+from src.events import EventLog, run_report, write_report
+from src.executor import (
+    Command,
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    Task,
+    command_records,
+)
+from src.module import ModulesConfig
+
+
+def read_events(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def build_tasks(modules_config: ModulesConfig) -> list:
+    build = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    build.commands = [
+        Command("exit 2", module=build.module, src="src"),
+        Command("echo test", module=build.module, src="src_test"),
+    ]
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("echo Full")]
+    return [custom, build]
+
+
+def test_should_emit_command_lifecycle_events(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    app_config.fail_on_error = False
+    path = tmpdir.join("events.jsonl").strpath
+    events = EventLog(path)
+    tasks = build_tasks(modules_config)
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(jobs=2, events=events)
+    ).run_tasks(tasks)
+    events.close()
+
+    records = read_events(path)
+    assert records[0]["event"] == "run_started"
+    assert records[0]["commands"] == 3
+    assert records[-1]["event"] == "run_finished"
+    assert records[-1]["statuses"] == {"COMPLETED": 1, "FAILED": 1, "SKIPPED": 1}
+    transitions = [
+        (record["label"], record["status"])
+        for record in records
+        if record["event"] == "command"
+    ]
+    assert transitions == [
+        ("custom:full", "PREPARED"),
+        ("nameA:src", "PREPARED"),
+        ("nameA:src_test", "PREPARED"),
+        ("custom:full", "RUNNING"),
+        ("custom:full", "COMPLETED"),
+        ("nameA:src", "RUNNING"),
+        ("nameA:src", "FAILED"),
+        ("nameA:src_test", "SKIPPED"),
+    ]
+    running = [record for record in records if record.get("status") == "RUNNING"]
+    assert all(record["pid"] > 0 for record in running)
+    assert all(record["start_time"] <= record["timestamp"] for record in running)
+    failed = records[-3]
+    assert failed["returncode"] == 2
+    assert failed["pid"] == running[-1]["pid"]
+    assert failed["max_rss"] > 0
+    assert failed["user_time"] >= 0
+
+
+def test_should_emit_pid_of_running_command_when_sequential(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    path = tmpdir.join("events.jsonl").strpath
+    events = EventLog(path)
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("echo Full")]
+
+    Executor(app_config, modules_config, ExecutionOptions(events=events)).run_tasks(
+        [custom]
+    )
+    events.close()
+
+    running, completed = [
+        record for record in read_events(path) if record["event"] == "command"
+    ][-2:]
+    assert running["status"] == "RUNNING"
+    assert running["pid"] == completed["pid"] > 0
+    assert running["start_time"] == completed["start_time"]
+
+
+def test_should_write_run_report(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    app_config.fail_on_error = False
+    tasks = build_tasks(modules_config)
+    Executor(app_config, modules_config).run_tasks(tasks)
+
+    path = tmpdir.join("reports", "report.json").strpath
+    write_report(run_report(command_records(tasks), 10, 12.5), path)
+
+    with open(path) as f:
+        report = json.load(f)
+    assert report["duration"] == 2.5
+    assert report["statuses"] == {"COMPLETED": 2, "FAILED": 1}
+    assert [command["status"] for command in report["commands"]] == [
+        ExecutionStatus.COMPLETED,
+        ExecutionStatus.FAILED,
+        ExecutionStatus.COMPLETED,
+    ]
+    assert report["commands"][1]["target"] == "src"
+    assert report["commands"][1]["pid"] is not None
@@ -1,6 +1,6 @@
 import pytest
 
-from src.config import AppConfig
+from src.config import AppConfig, Batching
 from src.constants import Target
 from src.executor import Executor, ExecutionStatus, TaskBuilder
 from src.module import ModulesConfig
@@ -294,3 +294,48 @@ def test_should_not_execute_custom_suite_command_when_command_not_defined(
 
     assert exc_info.value.__class__.__name__ == "ExecutorException"
     assert exc_info.value.message == 'Command "full" not found in custom commands'
+
+
+def test_should_coalesce_commands_using_same_build_file(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    app_config.fail_on_error = False
+    app_config.batching = Batching()
+
+    builder = TaskBuilder(app_config, modules_config)
+    tasks = builder.coalesce_commands(
+        builder.build_tasks(
+            build_args(
+                {
+                    "build": ["a_cst", "b_s"],
+                    "test_unit": ["a"],
+                    "test_integration": ["a", "b_Custom.class"],
+                }
+            )
+        )
+    )
+    Executor(app_config, modules_config).run_tasks(tasks)
+
+    assert [command.command for command in tasks[0].commands] == [
+        "ant clobber all -f not/here1/src/build.xml",
+        "ant clobber all -f not/here1/src_test/build.xml",
+    ]
+    assert [command.command for command in tasks[1].commands] == [
+        "ant -f not/here2/src/build.xml"
+    ]
+    assert [command.command for command in tasks[2].commands] == [
+        "ant test.unit test.integration -f not/here1/src_test/build.xml"
+    ]
+    assert tasks[3].commands == []
+    assert [command.command for command in tasks[4].commands] == [
+        "ant test.integration -f not/here2/src_test/build.xml -Dtest.includes=**/Custom.class"
+    ]
+
+    batch = tasks[0].commands[0]
+    assert [part.command for part in batch.parts] == [
+        "ant clobber -f not/here1/src/build.xml",
+        "ant -f not/here1/src/build.xml",
+    ]
+    assert batch.status == ExecutionStatus.FAILED
+    assert [part.status for part in batch.parts] == [ExecutionStatus.FAILED] * 2
+    assert batch.parts[0].time == batch.time
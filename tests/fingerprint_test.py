@@ -0,0 +1,131 @@
+import os
+
+from src.config import AppConfig, Batching
+from src.constants import Target
+from src.executor import (
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    TaskBuilder,
+)
+from src.fingerprint import FingerprintStore
+from src.module import ModuleInfo, ModulesConfig
+
+
+def test_should_detect_changed_sources(tmpdir):
+    src_dir = tmpdir.mkdir("module").mkdir("src")
+    src_dir.join("A.java").write("class A {}")
+    store = FingerprintStore(tmpdir.join("fingerprints.json").strpath)
+
+    fingerprint = store.compute(src_dir.strpath, "ant")
+    store.update("key", fingerprint)
+
+    assert store.is_up_to_date("key", store.compute(src_dir.strpath, "ant"))
+    assert not store.is_up_to_date("key", store.compute(src_dir.strpath, "ant x"))
+
+    src_dir.join("B.java").write("class B {}")
+    assert not store.is_up_to_date("key", store.compute(src_dir.strpath, "ant"))
+
+
+def test_should_persist_and_invalidate_fingerprints(tmpdir):
+    path = tmpdir.join("store").join("fingerprints.json").strpath
+    FingerprintStore(path).update("key", "value")
+
+    store = FingerprintStore(path)
+    assert store.is_up_to_date("key", "value")
+
+    store.invalidate("key")
+    assert not FingerprintStore(path).is_up_to_date("key", "value")
+
+
+def test_should_detect_content_change_when_content_hash(tmpdir):
+    src_dir = tmpdir.mkdir("src")
+    source = src_dir.join("A.java")
+    source.write("class A {}")
+    store = FingerprintStore(tmpdir.join("fingerprints.json").strpath, True)
+    fingerprint = store.compute(src_dir.strpath, "ant")
+
+    stat = os.stat(source.strpath)
+    source.write("class B {}")
+    os.utime(source.strpath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert store.compute(src_dir.strpath, "ant") != fingerprint
+
+
+def build_module_task(app_config: AppConfig, targets: str) -> list:
+    module = ModuleInfo(name="nameA", location=app_config.root + "/not/here1")
+    config = ModulesConfig({"nameA": module})
+    task = TaskBuilder(app_config, config).build_single_task(
+        Target.BUILD, module, targets
+    )
+    for command in task.commands:
+        command.command = command.command.replace("ant", "echo ant", 1)
+    return [task]
+
+
+def test_should_skip_build_when_sources_up_to_date(app_config: AppConfig, tmpdir):
+    app_config.fail_on_error = False
+    store = FingerprintStore(tmpdir.join("fingerprints.json").strpath)
+    options = ExecutionOptions(fingerprints=store)
+
+    first_run = build_module_task(app_config, "s")
+    Executor(app_config, None, options).run_tasks(first_run)
+    second_run = build_module_task(app_config, "s")
+    Executor(app_config, None, options).run_tasks(second_run)
+    forced_run = build_module_task(app_config, "s")
+    Executor(
+        app_config, None, ExecutionOptions(fingerprints=store, force=True)
+    ).run_tasks(forced_run)
+    clobber_run = build_module_task(app_config, "cs")
+    Executor(app_config, None, options).run_tasks(clobber_run)
+
+    assert first_run[0].commands[0].status == ExecutionStatus.COMPLETED
+    assert second_run[0].commands[0].status == ExecutionStatus.UP_TO_DATE
+    assert forced_run[0].commands[0].status == ExecutionStatus.COMPLETED
+    assert clobber_run[0].commands[0].status == ExecutionStatus.COMPLETED
+    assert clobber_run[0].commands[1].status == ExecutionStatus.COMPLETED
+
+
+def test_should_run_tests_batched_with_up_to_date_build(app_config: AppConfig, tmpdir):
+    app_config.batching = Batching(enabled=True, default_target="all")
+    module = ModuleInfo(name="nameA", location=app_config.root + "/not/here1")
+    store = FingerprintStore(tmpdir.join("fingerprints.json").strpath)
+    options = ExecutionOptions(fingerprints=store)
+    builder = TaskBuilder(app_config, ModulesConfig({"nameA": module}), options)
+    runs = []
+    for _ in range(2):
+        tasks = [
+            builder.build_single_task(Target.BUILD, module, "t"),
+            builder.build_single_task(Target.TEST_UNIT, module, ""),
+        ]
+        builder.coalesce_commands(tasks)
+        batch = tasks[0].commands[0]
+        batch.command = batch.command.replace("ant", "echo ant", 1)
+        Executor(app_config, None, options).run_tasks(tasks)
+        runs.append(batch)
+
+    assert [part.ant_target for part in runs[1].parts] == [None, "test.unit"]
+    assert runs[0].status == ExecutionStatus.COMPLETED
+    assert runs[1].status == ExecutionStatus.COMPLETED
+    assert store.contains(runs[1].fingerprint_key())
+
+
+def test_should_update_fingerprints_from_concurrent_processes(tmpdir):
+    path = tmpdir.join("fingerprints.json").strpath
+    pids = []
+    for worker in range(4):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                store = FingerprintStore(path)
+                for idx in range(50):
+                    store.update("key%d" % worker, str(idx))
+            except Exception:
+                code = 1
+            os._exit(code)
+        pids.append(pid)
+
+    assert [os.waitpid(pid, 0)[1] for pid in pids] == [0] * 4
+    assert FingerprintStore(path).fingerprints
+    assert not [name for name in os.listdir(tmpdir.strpath) if name.endswith(".tmp")]
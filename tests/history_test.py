@@ -0,0 +1,108 @@
+import pytest
+
+from src.config import AppConfig
+from src.constants import Target
+from src.executor import (
+    BatchCommand,
+    Command,
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    Task,
+    estimate_command,
+)
+from src.history import History, percentile
+from src.module import ModulesConfig
+
+
+def entry(duration: float, status: str = "COMPLETED") -> dict:
+    return {
+        "command": "ant -f a/src/build.xml",
+        "module": "nameA",
+        "target": "src",
+        "duration": duration,
+        "status": status,
+    }
+
+
+def test_should_calculate_percentiles():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([5], 95) == 5
+
+
+def test_should_report_stats_and_flag_regression(tmpdir):
+    history = History(tmpdir.join("history.db").strpath)
+    history.record([entry(10) for _ in range(10)] + [entry(1, "FAILED"), entry(30)])
+
+    stats = history.stats()
+
+    assert len(stats) == 1
+    assert stats[0].runs == 12
+    assert stats[0].failures == 1
+    assert stats[0].p50 == 10
+    assert stats[0].p95 == 30
+    assert stats[0].baseline == 10
+    assert stats[0].is_regression()
+    assert history.durations("nameA", "src", 2) == [30, 10]
+
+
+def test_should_not_flag_regression_when_duration_stable(tmpdir):
+    history = History(tmpdir.join("history.db").strpath)
+    history.record([entry(10), entry(11), entry(12)])
+
+    assert not history.stats()[0].is_regression()
+
+
+def test_should_record_executed_commands(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    app_config.fail_on_error = False
+    history = History(tmpdir.join("history.db").strpath)
+    build = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    build.commands = [
+        Command("exit 1", module=build.module, src="src", ant_target="clobber"),
+        Command("echo", module=build.module, src="src"),
+    ]
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("full", ExecutionStatus.FAILED)]
+
+    Executor(app_config, modules_config, ExecutionOptions(history=history)).run_tasks(
+        [build, custom]
+    )
+
+    stats = history.stats()
+    assert [(s.module, s.target, s.runs, s.failures) for s in stats] == [
+        ("nameA", "src", 1, 0),
+        ("nameA", "src:clobber", 1, 1),
+    ]
+
+
+def test_should_record_merged_commands_per_part(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    history = History(tmpdir.join("history.db").strpath)
+    history.record([entry(3), dict(entry(1), target="src:clobber")])
+    build = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    parts = [
+        Command("ant clobber", module=build.module, src="src", ant_target="clobber"),
+        Command("ant", module=build.module, src="src"),
+    ]
+    build.commands = [BatchCommand(parts, "all")]
+    build.commands[0].command = "sleep 0.2"
+
+    assert estimate_command(history, build, build.commands[0]) == 4
+    Executor(app_config, modules_config, ExecutionOptions(history=history)).run_tasks(
+        [build]
+    )
+
+    stats = history.stats()
+    assert [(s.module, s.target, s.runs) for s in stats] == [
+        ("nameA", "src", 2),
+        ("nameA", "src:clobber", 2),
+    ]
+    clobber, src = history.durations("nameA", "src:clobber", 1) + history.durations(
+        "nameA", "src", 1
+    )
+    assert src == pytest.approx(3 * clobber)
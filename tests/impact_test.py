@@ -0,0 +1,95 @@
+import os
+
+from src.config import AppConfig
+from src.constants import Target
+from src.executor import ExecutionOptions, ExecutionStatus, Executor, TaskBuilder
+from src.impact import DependencyIndex
+from src.module import ModuleInfo, ModulesConfig
+
+
+def write_source(module_dir, rel: str, content: str):
+    path = module_dir.join(rel)
+    path.dirpath().ensure(dir=True)
+    path.write(content)
+    stat = os.stat(path.strpath)
+    os.utime(path.strpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+def create_module(tmpdir):
+    module_dir = tmpdir.mkdir("module")
+    write_source(module_dir, "src/build.xml", "<project/>")
+    write_source(module_dir, "src/com/core/Util.java", "package com.core;")
+    write_source(
+        module_dir,
+        "src/com/app/Service.java",
+        "package com.app;\nimport com.core.Util;\nclass Service {}",
+    )
+    write_source(
+        module_dir,
+        "src_test/com/test/ServiceTest.java",
+        "package com.test;\nimport static com.app.Service.create;",
+    )
+    write_source(
+        module_dir,
+        "src_test/com/other/OtherTest.java",
+        "package com.other;\nimport com.core.*;",
+    )
+    write_source(module_dir, "src_test/com/unit/UnitTest.java", "package com.unit;")
+    return module_dir
+
+
+def test_should_select_tests_affected_by_changed_sources(tmpdir):
+    module_dir = create_module(tmpdir)
+    cache_dir = tmpdir.join("impact").strpath
+
+    selection = DependencyIndex(cache_dir, module_dir.strpath).select("test_unit")
+    assert selection.tests is None
+    selection.commit()
+
+    index = DependencyIndex(cache_dir, module_dir.strpath)
+    assert index.select("test_unit").tests == []
+
+    write_source(module_dir, "src/com/app/Service.java", "package com.app;")
+    assert index.select("test_unit").tests == ["ServiceTest"]
+
+    write_source(module_dir, "src/com/core/Util.java", "package com.core;")
+    assert index.select("test_unit").tests == ["OtherTest", "ServiceTest"]
+
+    module_dir.join("src/com/app/Service.java").remove()
+    assert index.select("test_unit").tests == ["OtherTest", "ServiceTest"]
+
+
+def test_should_select_all_tests_when_build_file_changed(tmpdir):
+    module_dir = create_module(tmpdir)
+    cache_dir = tmpdir.join("impact").strpath
+    DependencyIndex(cache_dir, module_dir.strpath).select("test_unit").commit()
+
+    write_source(module_dir, "src/build.xml", "<project name='x'/>")
+
+    index = DependencyIndex(cache_dir, module_dir.strpath)
+    assert index.select("test_unit").tests is None
+    assert index.select("test_integration").tests is None
+
+
+def test_should_execute_only_affected_tests(app_config: AppConfig, tmpdir):
+    module_dir = create_module(tmpdir)
+    module = ModuleInfo(name="a/nameA", location=module_dir.strpath)
+    config = ModulesConfig({"nameA": module})
+    options = ExecutionOptions(impact_dir=tmpdir.join("impact").strpath)
+
+    def run_unit_tests():
+        task = TaskBuilder(app_config, config, options).build_single_task(
+            Target.TEST_UNIT, module, ""
+        )
+        task.commands[0].command = "true"
+        Executor(app_config, config, options).run_tasks([task])
+        return task.commands[0]
+
+    assert run_unit_tests().properties is None
+    assert run_unit_tests().status == ExecutionStatus.UP_TO_DATE
+
+    write_source(module_dir, "src_test/com/unit/UnitTest.java", "package com.unit;")
+    command = run_unit_tests()
+    assert command.properties == "-Dtest.includes=**/UnitTest.class"
+    assert command.status == ExecutionStatus.COMPLETED
+    assert run_unit_tests().status == ExecutionStatus.UP_TO_DATE
@@ -1,3 +1,6 @@
+import json
+import os
+
 from src.module import ModulesConfigBuilder, ModuleInfo
 
 
@@ -78,3 +81,94 @@ def test_should_correctly_convert_module_info_to_repr():
         name="name", location="location", order=1, srcs=["src1", "src2"]
     )
     assert repr(module_info) == "ModuleInfo(name=name)"
+
+
+def test_should_reuse_cached_module_config_when_inputs_unchanged(app_config, tmpdir):
+    app_config.profile = "prod"
+    cache_path = tmpdir.join("modules_cache.json").strpath
+    modules = ModulesConfigBuilder(app_config, cache_path).build().modules
+    assert modules["nameA"].order == 1
+    assert modules["nameB"].order == 2
+
+    with open(cache_path) as f:
+        cache = json.load(f)
+    cache["orders"]["nameA"] = 10
+    with open(cache_path, "w") as f:
+        json.dump(cache, f)
+
+    config = ModulesConfigBuilder(app_config, cache_path).build()
+
+    assert config.modules["nameA"].order == 10
+    assert config.modules["nameB"].srcs == ["src"]
+
+
+def test_should_rebuild_cached_module_config_when_registry_changed(app_config, tmpdir):
+    cache_path = tmpdir.join("modules_cache.json").strpath
+    assert len(ModulesConfigBuilder(app_config, cache_path).build().modules) == 2
+
+    with open(app_config.input.module_registry, "w") as f:
+        f.write(
+            '<ModuleRegistry><Module location="x" name="c/nameC"/></ModuleRegistry>'
+        )
+
+    config = ModulesConfigBuilder(app_config, cache_path).build()
+
+    assert list(config.modules) == ["nameC"]
+    assert config.modules["nameC"].location == f"{app_config.root}/x"
+
+
+def test_should_rescan_cached_srcs_when_module_directory_changed(app_config, tmpdir):
+    app_config.profile = "prod"
+    cache_path = tmpdir.join("modules_cache.json").strpath
+    modules = ModulesConfigBuilder(app_config, cache_path).build().modules
+    assert modules["nameB"].srcs == ["src"]
+
+    os.mkdir(f"{app_config.root}/not/here2/src_web")
+    config = ModulesConfigBuilder(app_config, cache_path).build()
+
+    assert sorted(config.modules["nameB"].srcs) == ["src", "src_web"]
+    assert config.modules["nameA"].srcs == ["src", "src_test", "src_web"]
+
+
+def test_should_resolve_only_requested_modules(app_config, tmpdir):
+    app_config.profile = "prod"
+    cache_path = tmpdir.join("modules_cache.json").strpath
+
+    modules = ModulesConfigBuilder(app_config, cache_path).build().modules
+
+    assert modules["nameB"].order == 2
+    assert modules.get("nameX") is None
+    with open(cache_path) as f:
+        cache = json.load(f)
+    assert list(cache["srcs"]) == ["nameB"]
+    assert cache["registry_complete"]
+    assert cache["orders"] == {"nameA": 1, "nameB": 2}
+
+
+def test_should_stop_reading_registry_when_module_found(app_config):
+    with open(app_config.input.module_registry, "a") as f:
+        f.write(" " * 100000 + "<broken")
+
+    modules = ModulesConfigBuilder(app_config).build().modules
+
+    assert modules["nameB"].location == f"{app_config.root}/not/here2"
+
+
+def test_should_preload_all_modules_and_detect_changed_inputs(app_config, tmpdir):
+    app_config.profile = "prod"
+    cache_path = tmpdir.join("modules_cache.json").strpath
+    builder = ModulesConfigBuilder(app_config, cache_path)
+    builder.build()
+
+    builder.preload()
+
+    with open(cache_path) as f:
+        cache = json.load(f)
+    assert sorted(cache["srcs"]) == ["nameA", "nameB"]
+    assert cache["orders_complete"]
+    assert not builder.is_stale()
+
+    with open(app_config.input.build_order, "a") as f:
+        f.write("c/nameC\n")
+
+    assert builder.is_stale()
@@ -0,0 +1,47 @@
+import gzip
+
+from src.executor import Command
+from src.output import MAX_ERRORS, OutputCapture, open_log
+
+
+def test_should_write_compressed_log_and_keep_bounded_tail(tmpdir):
+    command = Command("ant -f build.xml")
+    log_path = tmpdir.join("001-build.log.gz").strpath
+    capture = OutputCapture(command, log_path, tail_lines=3)
+
+    for idx in range(100):
+        capture.write_lines(["line %d" % idx, "next %d" % idx])
+    capture.close()
+
+    assert command.log_path == log_path
+    assert command.tail == ["next 98", "line 99", "next 99"]
+    with gzip.open(log_path, "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[:2] == ["ant -f build.xml", "line 0"]
+    assert len(lines) == 201
+    with open_log(log_path) as f:
+        assert f.readline() == "ant -f build.xml\n"
+
+
+def test_should_extract_compiler_errors():
+    command = Command("ant")
+    capture = OutputCapture(command)
+
+    capture.write_lines(
+        [
+            "    [javac] /src/com/A.java:7: error: ';' expected",
+            "    [javac] /src/com/A.java:8: warning: [deprecation] old()",
+            "    [javac] error: invalid source release: 99",
+            "BUILD FAILED",
+            "/src/B.java:1: error: class B is public",
+        ]
+        + ["x.java:1: error: more"] * MAX_ERRORS
+    )
+    capture.close()
+
+    assert command.errors[:3] == [
+        {"file": "/src/com/A.java", "line": 7, "message": "';' expected"},
+        {"file": None, "line": None, "message": "invalid source release: 99"},
+        {"file": "/src/B.java", "line": 1, "message": "class B is public"},
+    ]
+    assert len(command.errors) == MAX_ERRORS
@@ -0,0 +1,55 @@
+import json
+
+from src.config import AppConfig
+from src.executor import ExecutionOptions, TaskBuilder
+from src.fingerprint import FingerprintStore
+from src.history import History
+from src.module import ModulesConfig
+from src.planner import Planner, export_plan, print_plan
+
+from tests.executor_test import build_args
+
+
+def test_should_plan_tasks_without_executing(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    history = History(tmpdir.join("history.db").strpath)
+    history.record(
+        [
+            {
+                "command": "ant",
+                "module": "nameA",
+                "target": "src",
+                "duration": 30,
+                "status": "COMPLETED",
+            }
+        ]
+    )
+    fingerprints = FingerprintStore(tmpdir.join("fingerprints.json").strpath)
+    fingerprints.update("not/here1/src", "abc")
+    fingerprints.update("not/here2/src", "abc")
+    options = ExecutionOptions(jobs=2, history=history, fingerprints=fingerprints)
+    tasks = TaskBuilder(app_config, modules_config, options).build_tasks(
+        build_args({"build": ["a_s", "b_cs"], "restart": True})
+    )
+
+    plan = Planner(app_config, options).plan(tasks)
+
+    assert plan["predicted_wall_time"] == 30
+    assert plan["critical_path"] == 30
+    assert [task["depends_on"] for task in plan["tasks"]] == [[], [], [0, 1]]
+    assert plan["tasks"][0]["commands"][0]["may_skip"]
+    assert plan["tasks"][0]["commands"][0]["estimate"] == 30
+    assert [step["may_skip"] for step in plan["tasks"][1]["commands"]] == [False] * 2
+    assert all(
+        command.status == "PREPARED" for task in tasks for command in task.commands
+    )
+
+    print_plan(plan)
+    assert "Predicted wall time 30.00s with 2 jobs" in capsys.readouterr().out
+
+    path = tmpdir.join("plan.json").strpath
+    export_plan(plan, path)
+    with open(path) as f:
+        assert json.load(f) == plan
@@ -0,0 +1,113 @@
+import gzip
+import os
+import time
+
+from src.config import AppConfig
+from src.constants import Target
+from src.executor import (
+    Command,
+    ExecutionOptions,
+    ExecutionStatus,
+    Executor,
+    Task,
+    command_record,
+)
+from src.module import ModulesConfig
+
+
+def test_should_prefix_output_and_write_command_log(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    app_config.fail_on_error = False
+    task = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task.commands = [
+        Command("echo out; echo err >&2; exit 2", module=task.module, src="src")
+    ]
+    custom = Task(Target.CUSTOM, None, "full")
+    custom.commands = [Command("printf 'no newline'")]
+    options = ExecutionOptions(backend="async", log_dir=tmpdir.strpath)
+
+    Executor(app_config, modules_config, options).run_tasks([custom, task])
+
+    captured = capsys.readouterr()
+    assert "[nameA:src] out\n" in captured.out
+    assert "[nameA:src] err\n" in captured.err
+    assert "[custom:full] no newline\n" in captured.out
+    assert task.commands[0].status == ExecutionStatus.FAILED
+    assert custom.commands[0].status == ExecutionStatus.COMPLETED
+    assert os.path.basename(task.commands[0].log_path) == "002-nameA_src.log.gz"
+    with gzip.open(task.commands[0].log_path, "rt") as f:
+        assert sorted(f.read().splitlines()[1:]) == ["err", "out"]
+    assert sorted(task.commands[0].tail) == ["err", "out"]
+
+
+def test_should_handle_long_output_lines(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    task = Task(Target.CUSTOM, None, "long")
+    task.commands = [Command("head -c 3000000 /dev/zero | tr '\\0' x; echo; echo end")]
+    options = ExecutionOptions(backend="async", log_dir=tmpdir.strpath)
+
+    Executor(app_config, modules_config, options).run_tasks([task])
+
+    assert task.commands[0].status == ExecutionStatus.COMPLETED
+    assert "[custom:long] end\n" in capsys.readouterr().out
+    with gzip.open(task.commands[0].log_path, "rt") as f:
+        assert len(f.read()) > 3000000
+    assert task.commands[0].tail[-1] == "end"
+
+
+def test_should_not_wait_for_background_children(
+    app_config: AppConfig, modules_config: ModulesConfig, capsys
+):
+    task = Task(Target.CUSTOM, None, "restart")
+    task.commands = [Command("(sleep 8 &); echo started")]
+    options = ExecutionOptions(backend="async")
+    start = time.time()
+
+    Executor(app_config, modules_config, options).run_tasks([task])
+
+    assert time.time() - start < 5
+    assert task.commands[0].status == ExecutionStatus.COMPLETED
+    assert "[custom:restart] started\n" in capsys.readouterr().out
+
+
+def test_should_run_with_subprocess_backend(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    task = Task(Target.CUSTOM, None, "full")
+    task.commands = [Command("echo Full")]
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(backend="subprocess")
+    ).run_tasks([task])
+
+    assert task.commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_keep_last_lines_and_compiler_errors_of_failed_command(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    app_config.fail_on_error = False
+    task = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task.commands = [
+        Command(
+            "seq 1 1000; "
+            "echo '    [javac] /m/src/A.java:12: error: cannot find symbol'; "
+            "echo '    [javac] 1 error'; exit 1",
+            module=task.module,
+            src="src",
+        )
+    ]
+    options = ExecutionOptions(backend="async", log_dir=tmpdir.strpath)
+
+    Executor(app_config, modules_config, options).run_tasks([task])
+
+    command = task.commands[0]
+    assert command.status == ExecutionStatus.FAILED
+    assert len(command.tail) == 50
+    assert command.tail[0] == "953"
+    assert command.errors == [
+        {"file": "/m/src/A.java", "line": 12, "message": "cannot find symbol"}
+    ]
+    assert command_record(task, command)["errors"] == command.errors
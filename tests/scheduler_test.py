@@ -0,0 +1,280 @@
+import time
+
+import pytest
+
+from src.config import AppConfig, Resources
+from src.constants import Target
+from src.executor import (
+    BatchCommand,
+    Command,
+    ExecutionOptions,
+    Executor,
+    ExecutionStatus,
+    ExecutorException,
+    Task,
+    command_cost,
+)
+from src.module import ModulesConfig
+from src.history import History
+from src.scheduler import ResourcePool, SchedulerException, TaskGraph
+
+
+def test_should_order_module_tasks_by_build_order(modules_config: ModulesConfig):
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    restart = Task(Target.RESTART)
+
+    graph = TaskGraph([task_b, task_a, restart])
+
+    assert graph.edges[task_a] == set()
+    assert graph.edges[task_b] == {task_a}
+    assert graph.edges[restart] == {task_a, task_b}
+    assert graph.ready([task_b, task_a, restart], set()) == [task_a]
+
+
+def test_should_run_independent_modules_when_explicit_dependencies(
+    modules_config: ModulesConfig,
+):
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    task_c = Task(Target.BUILD, modules_config.modules["nameC"], "s")
+
+    graph = TaskGraph(
+        [task_a, task_b, task_c], {"nameB": [], "c": ["nameA"]}, {"c": "nameC"}
+    )
+
+    assert graph.edges[task_a] == set()
+    assert graph.edges[task_b] == set()
+    assert graph.edges[task_c] == {task_a}
+
+
+def test_should_keep_task_order_within_module(modules_config: ModulesConfig):
+    build = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    test = Task(Target.TEST_UNIT, modules_config.modules["nameA"], None)
+    custom = Task(Target.CUSTOM, None, "full")
+
+    graph = TaskGraph([build, test, custom])
+
+    assert graph.edges[test] == {build}
+    assert graph.edges[custom] == {build, test}
+
+
+def test_should_raise_exception_when_dependency_cycle(modules_config: ModulesConfig):
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+
+    with pytest.raises(SchedulerException):
+        TaskGraph([task_a, task_b], {"nameA": ["nameB"]})
+
+
+def test_should_execute_independent_tasks_in_parallel(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    app_config.fail_on_error = False
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    tasks = []
+    for name in ["nameA", "nameB"]:
+        task = Task(Target.BUILD, modules_config.modules[name], "s")
+        task.commands = [Command("sleep 0.5")]
+        tasks.append(task)
+
+    start_time = time.time()
+    Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(tasks)
+
+    assert time.time() - start_time < 0.9
+    assert tasks[0].commands[0].status == ExecutionStatus.COMPLETED
+    assert tasks[1].commands[0].status == ExecutionStatus.COMPLETED
+
+
+def test_should_hint_at_dependencies_when_jobs_run_sequentially(
+    app_config: AppConfig, modules_config: ModulesConfig, capsys
+):
+    tasks = []
+    for name in ["nameA", "nameB"]:
+        task = Task(Target.BUILD, modules_config.modules[name], "s")
+        task.commands = [Command("true")]
+        tasks.append(task)
+
+    Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(tasks)
+    assert "Hint: -j 2 runs nothing concurrently" in capsys.readouterr().out
+
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    for task in tasks:
+        task.commands = [Command("true")]
+    Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(tasks)
+    assert "Hint:" not in capsys.readouterr().out
+    assert not TaskGraph(tasks, app_config.dependencies).is_sequential()
+
+
+def test_should_not_overlap_commands_exceeding_resource_pools(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    app_config.fail_on_error = False
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    app_config.resources = Resources(
+        pools={"cpu": 8, "methodserver": 1},
+        costs={"build": {"cpu": 2}, "test_integration": {"cpu": 2, "methodserver": 1}},
+    )
+    tasks = []
+    for name in ["nameA", "nameB"]:
+        task = Task(Target.TEST_INTEGRATION, modules_config.modules[name])
+        command = Command(
+            "sleep 0.3", module=task.module, ant_target="test.integration"
+        )
+        task.commands = [command]
+        tasks.append(task)
+
+    Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(tasks)
+
+    first, second = sorted(
+        (task.commands[0] for task in tasks), key=lambda command: command.start_time
+    )
+    assert second.start_time >= first.start_time + first.time
+    assert first.status == ExecutionStatus.COMPLETED
+    assert second.status == ExecutionStatus.COMPLETED
+
+
+def test_should_compute_command_cost_from_targets(modules_config: ModulesConfig):
+    costs = {
+        "build": {"cpu": 2, "mem_gb": 1},
+        "test_unit": {"cpu": 1, "mem_gb": 4},
+        "restart": {"methodserver": 1},
+        "custom": {"full": {"cpu": 8}},
+    }
+    module = modules_config.modules["nameA"]
+    build = Command("ant -f build.xml", module=module, src="src")
+    test = Command("ant test.unit -f build.xml", module=module, ant_target="test.unit")
+    batch = BatchCommand([build, test], "all")
+    pool = ResourcePool({"cpu": 4, "mem_gb": 32})
+
+    assert command_cost(costs, Task(Target.BUILD, module, "s"), batch) == {
+        "cpu": 2,
+        "mem_gb": 4,
+    }
+    assert command_cost(costs, Task(Target.RESTART), Command("restart")) == {
+        "methodserver": 1
+    }
+    assert command_cost(costs, Task(Target.CUSTOM, None, "full"), Command("f")) == {
+        "cpu": 8
+    }
+    assert command_cost(costs, Task(Target.CUSTOM, None, "other"), Command("o")) == {}
+    assert pool.admit({"cpu": 8, "methodserver": 1}) == {"cpu": 4}
+
+
+def test_should_raise_exception_when_parallel_command_failed(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    app_config.fail_on_error = True
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_a.commands = [Command("exit 3")]
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    task_b.commands = [Command("echo B")]
+
+    with pytest.raises(ExecutorException):
+        Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(
+            [task_a, task_b]
+        )
+
+    assert task_a.commands[0].status == ExecutionStatus.FAILED
+    assert task_b.commands[0].status == ExecutionStatus.SKIPPED
+
+
+def test_should_cancel_running_commands_on_first_failure(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    app_config.fail_on_error = True
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    marker = tmpdir.join("marker")
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_a.commands = [Command("sleep 0.2; exit 3")]
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    task_b.commands = [Command("sleep 3; touch %s" % marker.strpath)]
+    restart = Task(Target.RESTART)
+    restart.commands = [Command("echo restart")]
+
+    start_time = time.time()
+    with pytest.raises(ExecutorException):
+        Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(
+            [task_a, task_b, restart]
+        )
+
+    assert time.time() - start_time < 2
+    assert task_a.commands[0].status == ExecutionStatus.FAILED
+    assert task_b.commands[0].status == ExecutionStatus.CANCELLED
+    assert restart.commands[0].status == ExecutionStatus.SKIPPED
+    time.sleep(0.2)
+    assert not marker.exists()
+
+
+def test_should_skip_tasks_downstream_of_failure_and_keep_going(
+    app_config: AppConfig, modules_config: ModulesConfig
+):
+    app_config.fail_on_error = False
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "st")
+    task_a.commands = [Command("exit 3"), Command("echo A")]
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    task_b.commands = [Command("sleep 0.2")]
+    restart = Task(Target.RESTART)
+    restart.commands = [Command("echo restart")]
+
+    Executor(app_config, modules_config, ExecutionOptions(jobs=2)).run_tasks(
+        [task_a, task_b, restart]
+    )
+
+    assert [command.status for command in task_a.commands] == [
+        ExecutionStatus.FAILED,
+        ExecutionStatus.SKIPPED,
+    ]
+    assert task_b.commands[0].status == ExecutionStatus.COMPLETED
+    assert restart.commands[0].status == ExecutionStatus.SKIPPED
+
+
+def test_should_prioritize_tasks_on_critical_path(modules_config: ModulesConfig):
+    task_a = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task_b = Task(Target.BUILD, modules_config.modules["nameB"], "s")
+    task_c = Task(Target.BUILD, modules_config.modules["nameC"], "s")
+    graph = TaskGraph(
+        [task_b, task_a, task_c], {"nameA": [], "nameB": [], "nameC": ["nameB"]}
+    )
+    assert graph.ready([task_b, task_a, task_c], set()) == [task_a, task_b]
+
+    graph.set_estimates({task_a: 10, task_b: 1, task_c: 20})
+
+    assert graph.paths == {task_a: 10, task_b: 21, task_c: 20}
+    assert graph.critical_path() == 21
+    assert graph.ready([task_b, task_a, task_c], set()) == [task_b, task_a]
+    assert graph.predict_wall_time(1) == 31
+    assert graph.predict_wall_time(2) == 21
+
+
+def test_should_print_predicted_wall_time_when_history_available(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir, capsys
+):
+    history = History(tmpdir.join("history.db").strpath)
+    history.record(
+        [
+            {
+                "command": "echo",
+                "module": name,
+                "target": "src",
+                "duration": duration,
+                "status": "COMPLETED",
+            }
+            for name, duration in [("nameA", 4), ("nameB", 2)]
+        ]
+    )
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    tasks = []
+    for name in ["nameA", "nameB"]:
+        task = Task(Target.BUILD, modules_config.modules[name], "s")
+        task.commands = [Command("true", module=task.module, src="src")]
+        tasks.append(task)
+    options = ExecutionOptions(jobs=2, history=history)
+
+    Executor(app_config, modules_config, options).run_tasks(tasks)
+
+    assert (
+        "Predicted wall time 4.00s (critical path 4.00s, sequential 6.00s)"
+        in capsys.readouterr().out
+    )
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.client import forward
+from src.server import WarmState
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = """
+import os, sys
+from src.server import BuildServer, WarmState
+
+class Builder:
+    def build(self):
+        return "config"
+
+    def preload(self):
+        pass
+
+    def is_stale(self):
+        return False
+
+def handle(argv):
+    print("%s %s %s" % (os.getcwd(), os.environ["SERVER_TEST"], " ".join(argv)))
+    sys.exit(int(argv[0]))
+
+state = WarmState(sys.argv[2], lambda: "app_cfg", lambda app_cfg: Builder())
+BuildServer(sys.argv[1], state, handle).serve()
+"""
+
+
+@pytest.fixture
+def server_socket(tmpdir):
+    socket = tmpdir.join("server.sock").strpath
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER, socket, tmpdir.join("cfg.yml").strpath],
+        cwd=ROOT_DIR,
+        stdout=subprocess.PIPE,
+    )
+    server.stdout.readline()
+    yield socket
+    server.terminate()
+    server.wait()
+
+
+class CountingBuilder:
+    builds = 0
+
+    def __init__(self):
+        self.stale = False
+
+    def build(self):
+        CountingBuilder.builds += 1
+        return "config %d" % CountingBuilder.builds
+
+    def preload(self):
+        pass
+
+    def is_stale(self):
+        return self.stale
+
+
+def test_should_not_forward_when_server_not_running(tmpdir):
+    assert forward(tmpdir.join("missing.sock").strpath, ["-r"]) is None
+
+
+def test_should_execute_request_in_server_with_client_cwd_and_env(
+    server_socket, tmpdir, monkeypatch, capfd
+):
+    monkeypatch.chdir(tmpdir)
+    monkeypatch.setenv("SERVER_TEST", "value")
+
+    returncode = forward(server_socket, ["3", "-r"])
+
+    assert returncode == 3
+    assert os.stat(server_socket).st_mode & 0o077 == 0
+    assert capfd.readouterr().out == "%s value 3 -r\n" % tmpdir.strpath
+    assert forward(server_socket, ["0"]) == 0
+
+
+def test_should_reload_state_when_cfg_or_modules_changed(tmpdir):
+    cfg_path = tmpdir.join("cfg.yml")
+    cfg_path.write("root: a")
+    loads = []
+    state = WarmState(
+        cfg_path.strpath,
+        lambda: loads.append(1) or len(loads),
+        lambda app_cfg: CountingBuilder(),
+    )
+
+    state.refresh()
+    state.refresh()
+    assert (state.app_cfg, state.config) == (1, "config %d" % CountingBuilder.builds)
+
+    builds = CountingBuilder.builds
+    state.builder.stale = True
+    state.refresh()
+    assert (state.app_cfg, CountingBuilder.builds) == (1, builds + 1)
+
+    cfg_path.write("root: changed")
+    state.refresh()
+    assert (state.app_cfg, CountingBuilder.builds) == (2, builds + 2)
@@ -0,0 +1,121 @@
+from src.config import AppConfig
+from src.executor import ExecutionOptions, ExecutionStatus, Executor, TaskBuilder
+from src.history import History
+from src.module import ModuleInfo, ModulesConfig
+from src.sharding import discover_test_classes, parse_test_durations, partition
+
+JUNIT_OUTPUT = """
+    [junit] Testsuite: com.ptc.ATest
+    [junit] Tests run: 2, Failures: 0, Errors: 0, Skipped: 0, Time elapsed: 12.5 sec
+Testsuite: com.ptc.BTest
+Tests run: 1, Failures: 1, Errors: 0, Skipped: 0, Time elapsed: 0,75 sec
+"""
+
+
+def create_test_sources(tmpdir, names: list) -> str:
+    module_dir = tmpdir.mkdir("module")
+    package_dir = module_dir.mkdir("src_test").mkdir("com").mkdir("ptc")
+    for name in names:
+        package_dir.join(name + ".java").write("class %s {}" % name)
+    package_dir.join("Helper.java").write("class Helper {}")
+    return module_dir.strpath
+
+
+def test_should_discover_test_classes(tmpdir):
+    location = create_test_sources(tmpdir, ["BTest", "ATest"])
+
+    assert discover_test_classes(location + "/src_test") == ["ATest", "BTest"]
+
+
+def test_should_partition_by_count_when_no_durations():
+    shards = partition(["A", "B", "C", "D", "E"], 2)
+
+    assert sorted(len(shard) for shard in shards) == [2, 3]
+    assert sorted(sum(shards, [])) == ["A", "B", "C", "D", "E"]
+
+
+def test_should_partition_by_durations():
+    durations = {"A": 10, "B": 6, "C": 4, "D": 1}
+
+    shards = partition(["A", "B", "C", "D", "E"], 2, durations)
+
+    assert shards == [["A", "C"], ["B", "D", "E"]]
+    assert partition(["A"], 4) == [["A"]]
+
+
+def test_should_not_leave_shards_empty_when_durations_are_zero():
+    durations = {"ATest": 0.0, "BTest": 0.0, "CTest": 0.0, "DTest": 0.0}
+
+    shards = partition(["ATest", "BTest", "CTest", "DTest"], 3, durations)
+
+    assert shards == [["ATest", "DTest"], ["BTest"], ["CTest"]]
+    assert partition(["ATest", "BTest"], 3, {"ATest": 0.0}) == [["ATest"], ["BTest"]]
+
+
+def test_should_parse_test_durations(tmpdir):
+    log = tmpdir.join("test.log")
+    log.write(JUNIT_OUTPUT)
+
+    assert parse_test_durations(log.strpath) == {"ATest": 12.5, "BTest": 0.75}
+
+
+def test_should_run_shards_concurrently_and_aggregate_status(
+    app_config: AppConfig, tmpdir
+):
+    app_config.fail_on_error = False
+    location = create_test_sources(tmpdir, ["ATest", "BTest", "CTest"])
+    module = ModuleInfo(name="a/nameA", location=location)
+    history = History(tmpdir.join("history.db").strpath)
+    history.record_test_durations("nameA", {"ATest": 10, "BTest": 1})
+    options = ExecutionOptions(
+        jobs=2, shards=2, history=history, log_dir=tmpdir.join("logs").strpath
+    )
+    builder = TaskBuilder(app_config, ModulesConfig({"nameA": module}), options)
+    task = builder.build_single_task("test_unit", module, "")
+    command = task.commands[0]
+    for shard in command.shards:
+        shard.command = "echo " + shard.command
+
+    Executor(app_config, None, options).run_tasks([task])
+
+    assert [shard.properties for shard in command.shards] == [
+        "-Dtest.includes=**/ATest.class",
+        "-Dtest.includes=**/BTest.class,**/CTest.class",
+    ]
+    assert command.status == ExecutionStatus.COMPLETED
+    durations = history.test_durations("nameA")
+    assert sorted(durations) == ["ATest", "BTest", "CTest"]
+    assert durations["BTest"] == durations["CTest"]
+
+    command.shards[1].command = "exit 1"
+    for shard in command.shards:
+        shard.status = ExecutionStatus.PREPARED
+    Executor(app_config, None, options).run_tasks([task])
+
+    assert command.shards[0].status == ExecutionStatus.COMPLETED
+    assert command.status == ExecutionStatus.FAILED
+
+
+def test_should_run_shards_with_zero_durations(app_config: AppConfig, tmpdir):
+    location = create_test_sources(tmpdir, ["ATest", "BTest", "CTest"])
+    module = ModuleInfo(name="a/nameA", location=location)
+    history = History(tmpdir.join("history.db").strpath)
+    history.record_test_durations("nameA", {"ATest": 0, "BTest": 0, "CTest": 0})
+    options = ExecutionOptions(
+        jobs=3, shards=3, history=history, log_dir=tmpdir.join("logs").strpath
+    )
+    builder = TaskBuilder(app_config, ModulesConfig({"nameA": module}), options)
+    task = builder.build_single_task("test_unit", module, "")
+    command = task.commands[0]
+    for shard in command.shards:
+        shard.command = "true " + shard.command
+
+    Executor(app_config, None, options).run_tasks([task])
+
+    assert [shard.test_classes for shard in command.shards] == [
+        ["ATest"],
+        ["BTest"],
+        ["CTest"],
+    ]
+    assert command.status == ExecutionStatus.COMPLETED
+    assert sorted(history.test_durations("nameA")) == ["ATest", "BTest", "CTest"]
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+HEAVY_MODULES = ["pydantic", "yaml", "xml.etree.ElementTree", "src.config"]
+IMPORT_BUDGET_US = 200000
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="-X importtime requires Python 3.7"
+)
+
+
+def import_times(*args, home: str = None) -> tuple:
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + SRC_DIR)
+    if home is not None:
+        env["HOME"] = home
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + list(args),
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return result, times
+
+
+def test_should_import_main_without_heavy_modules():
+    result, times = import_times("-c", "import src.main")
+
+    assert result.returncode == 0, result.stderr
+    assert [name for name in HEAVY_MODULES if name in times] == []
+    print("src.main imported in %.1fms" % (times["src.main"] / 1000))
+    assert times["src.main"] < IMPORT_BUDGET_US
+
+
+def test_should_restart_from_cached_config_without_modules_config(tmpdir):
+    main = os.path.join(SRC_DIR, "main.py")
+    first, times = import_times(main, "--no-server", "-r", home=tmpdir.strpath)
+    assert first.returncode == 0, first.stderr
+    assert "pydantic" in times
+    assert tmpdir.join(".wc_builder", "cfg_cache.json").check()
+
+    result, times = import_times(main, "--no-server", "-r", home=tmpdir.strpath)
+
+    assert result.returncode == 0, result.stderr
+    assert "Restarting" in result.stdout
+    assert [name for name in HEAVY_MODULES if name in times] == []
+    assert not tmpdir.join(".wc_builder", "modules_cache.json").check()
@@ -0,0 +1,49 @@
+import json
+
+from src.config import AppConfig
+from src.constants import Target
+from src.executor import Command, ExecutionOptions, Executor, Task
+from src.module import ModulesConfig
+from src.tracing import Tracer
+
+
+def test_should_write_spans_of_tasks_and_commands_per_lane(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    app_config.dependencies = {"nameA": [], "nameB": []}
+    tasks = []
+    for name in ["nameA", "nameB"]:
+        task = Task(Target.BUILD, modules_config.modules[name], "s")
+        task.commands = [Command("sleep 0.1", module=task.module, src="src")]
+        tasks.append(task)
+    tracer = Tracer()
+    with tracer.phase("build tasks"):
+        pass
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(jobs=2, tracer=tracer)
+    ).run_tasks(tasks)
+    path = tmpdir.join("trace.json").strpath
+    tracer.write(path)
+
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["build tasks"]["tid"] == 0
+    assert {spans["nameA:src"]["tid"], spans["nameB:src"]["tid"]} == {1, 2}
+    for name in ["nameA", "nameB"]:
+        task_span = spans["build %s s" % name]
+        command_span = spans["%s:src" % name]
+        assert task_span["tid"] == command_span["tid"]
+        assert task_span["ts"] <= command_span["ts"]
+        assert (
+            command_span["ts"] + command_span["dur"]
+            <= task_span["ts"] + task_span["dur"]
+        )
+        assert command_span["args"]["status"] == "COMPLETED"
+    lanes = {
+        event["tid"]: event["args"]["name"]
+        for event in events
+        if event["name"] == "thread_name"
+    }
+    assert lanes == {0: "wc_builder", 1: "job 1", 2: "job 2"}
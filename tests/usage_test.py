@@ -0,0 +1,63 @@
+import subprocess
+import time
+
+from src.config import AppConfig
+from src.constants import Target
+from src.executor import Command, ExecutionOptions, ExecutionStatus, Executor, Task
+from src.history import History
+from src.module import ModulesConfig
+from src.usage import ProcessTreeSampler, process_tree, read_parents
+
+
+def test_should_find_descendants_of_process():
+    process = subprocess.Popen(["sh", "-c", "sleep 1 & sleep 1 & wait"])
+    try:
+        time.sleep(0.2)
+        tree = process_tree(process.pid)
+        parents = read_parents()
+    finally:
+        process.kill()
+        process.wait()
+
+    assert tree[0] == process.pid
+    assert len(tree) == 3
+    assert all(parents[pid] == process.pid for pid in tree[1:])
+
+
+def test_should_sample_memory_and_io_of_process_tree():
+    process = subprocess.Popen(
+        ["sh", "-c", "head -c 5000000 /dev/zero | cat > /dev/null; sleep 0.3"]
+    )
+    sampler = ProcessTreeSampler(process.pid, interval=0.05).start()
+    process.wait()
+    usage = sampler.stop()
+
+    assert usage["tree_rss"] > 0
+    assert usage["write_chars"] >= 5000000
+
+
+def test_should_record_resource_usage_of_commands(
+    app_config: AppConfig, modules_config: ModulesConfig, tmpdir
+):
+    history = History(tmpdir.join("history.db").strpath)
+    task = Task(Target.BUILD, modules_config.modules["nameA"], "s")
+    task.commands = [
+        Command(
+            "i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done",
+            module=task.module,
+            src="src",
+        )
+    ]
+
+    Executor(
+        app_config, modules_config, ExecutionOptions(backend="async", history=history)
+    ).run_tasks([task])
+
+    command = task.commands[0]
+    assert command.status == ExecutionStatus.COMPLETED
+    assert command.usage["user_time"] + command.usage["system_time"] > 0
+    assert command.usage["max_rss"] > 0
+    assert command.usage["read_bytes"] >= 0
+    stats = history.stats()[0]
+    assert stats.cpu > 0
+    assert stats.io is not None
@@ -0,0 +1,114 @@
+import ctypes
+import errno
+import threading
+
+import pytest
+
+from src.config import AppConfig
+from src.executor import TaskBuilder
+from src.module import ModuleInfo, ModulesConfig
+from src.watch import InotifyWatcher, PollingWatcher, WatchSession, create_watcher
+
+from tests.executor_test import build_args
+
+
+def touch_later(path, content: str = "changed"):
+    timer = threading.Timer(0.1, lambda: path.write(content))
+    timer.start()
+    return timer
+
+
+@pytest.fixture
+def workspace(tmpdir) -> ModulesConfig:
+    modules = {}
+    for name in ["nameA", "nameB"]:
+        location = tmpdir.mkdir(name)
+        for src in ["src", "src_test"]:
+            location.mkdir(src).mkdir("pkg").join("A.java").write("class A {}")
+        modules[name] = ModuleInfo(name=name, location=location.strpath, order=1)
+    return ModulesConfig(modules)
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="inotify not available")
+def test_should_report_changed_roots_with_inotify(tmpdir):
+    roots = [tmpdir.mkdir("a").strpath, tmpdir.mkdir("b").strpath]
+    watcher = InotifyWatcher(roots)
+    try:
+        assert watcher.wait(0.05) == set()
+        tmpdir.join("b").mkdir("new")
+        assert watcher.wait(2) == {roots[1]}
+        timer = touch_later(tmpdir.join("b", "new", "File.java"))
+        assert watcher.wait(2) == {roots[1]}
+        timer.join()
+    finally:
+        watcher.close()
+
+
+class ExhaustedLibc:
+    """libc whose inotify_add_watch fails as above fs.inotify.max_user_watches."""
+
+    def __init__(self, libc):
+        self.libc = libc
+
+    def inotify_init1(self, flags: int) -> int:
+        return self.libc.inotify_init1(flags)
+
+    def inotify_add_watch(self, fd: int, path: bytes, mask: int) -> int:
+        ctypes.set_errno(errno.ENOSPC)
+        return -1
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="inotify not available")
+def test_should_poll_when_directories_cannot_be_watched(tmpdir, monkeypatch, capsys):
+    cdll = ctypes.CDLL
+    monkeypatch.setattr(
+        ctypes, "CDLL", lambda name, **kwargs: ExhaustedLibc(cdll(name, **kwargs))
+    )
+
+    with pytest.raises(OSError):
+        InotifyWatcher([tmpdir.strpath])
+    watcher = create_watcher([tmpdir.strpath])
+
+    assert isinstance(watcher, PollingWatcher)
+    assert "No space left on device" in capsys.readouterr().out
+
+
+def test_should_report_changed_roots_with_polling(tmpdir):
+    roots = [tmpdir.mkdir("a").strpath, tmpdir.mkdir("b").strpath]
+    tmpdir.join("a", "File.java").write("class File {}")
+    watcher = PollingWatcher(roots, interval=0.05)
+
+    assert watcher.wait(0.1) == set()
+    tmpdir.join("a", "File.java").write("class File { int a; }")
+    assert watcher.wait(0.5) == {roots[0]}
+
+
+def test_should_rebuild_only_affected_src_directories(
+    app_config: AppConfig, workspace: ModulesConfig, tmpdir
+):
+    app_config.aliases = {"a": "nameA", "b": "nameB"}
+    task_builder = TaskBuilder(app_config, workspace)
+    tasks = task_builder.build_tasks(
+        build_args({"build": ["a_cst", "b_s"], "test_unit": ["a"], "restart": True})
+    )
+    runs = []
+    session = WatchSession(tasks, task_builder, runs.append, debounce=0.05)
+    watcher = PollingWatcher(session.directories(), interval=0.05)
+    timer = touch_later(tmpdir.join("nameA", "src", "pkg", "A.java"))
+
+    session.watch(watcher, iterations=1)
+    timer.join()
+
+    assert len(session.directories()) == 3
+    assert len(runs) == 1
+    assert [[command.command for command in task.commands] for task in runs[0]] == [
+        [
+            "ant -f %s/src/build.xml" % workspace.modules["nameA"].location,
+            "ant -f %s/src_test/build.xml" % workspace.modules["nameA"].location,
+        ],
+        [
+            "ant test.unit -f %s/src_test/build.xml"
+            % workspace.modules["nameA"].location
+        ],
+        [app_config.commands.ootb.restart],
+    ]